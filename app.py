@@ -1,3 +1,33 @@
 import streamlit as st
 
+import cache
+import figures
+import profiling
+import utils
+import warmup
+
 st.header("Аматьорски, ама футболен портал")
+
+with st.expander("Figure cache"):
+    st.write(figures.get_figure_cache().stats())
+
+with st.expander("Shared cache"):
+    shared = cache.get_cache()
+    st.caption(f"Budget {shared.budget / 2**20:.0f} MiB")
+    st.dataframe(shared.stats(), use_container_width=True)
+
+warmup.show_status(warmup.get_warmup())
+utils.show_sync_status()
+
+# hidden admin panel: open the app with ?admin
+if "admin" in st.experimental_get_query_params():
+    st.header("Profiling")
+    if not profiling.ENABLED:
+        st.caption("Start the app with FOOTBALL_PROFILE=time (or memory) to record")
+    records = profiling.read_log()
+    st.write(f"{len(records)} recent records")
+    if not records.empty:
+        st.subheader("Per rerun")
+        st.dataframe(profiling.run_totals(records), use_container_width=True)
+        st.subheader("Per stage")
+        st.dataframe(profiling.summarize(records), use_container_width=True)
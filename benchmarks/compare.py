@@ -0,0 +1,45 @@
+import argparse
+import json
+from pathlib import Path
+
+THRESHOLD = 1.2  # slowdown ratio reported as a regression
+
+
+def compare(baseline: dict, current: dict, threshold: float = THRESHOLD) -> list:
+    # Median time and peak memory ratios for every (benchmark, scale) in both runs.
+    before = {(r["benchmark"], r["scale"]): r for r in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        old = before.get((result["benchmark"], result["scale"]))
+        if old is None:
+            continue
+        time_ratio = result["median_s"] / old["median_s"]
+        memory_ratio = result["peak_bytes"] / max(old["peak_bytes"], 1)
+        rows.append(
+            {
+                "benchmark": result["benchmark"],
+                "scale": result["scale"],
+                "time_ratio": time_ratio,
+                "memory_ratio": memory_ratio,
+                "regression": max(time_ratio, memory_ratio) > threshold,
+            }
+        )
+    return rows
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Compare two benchmark runs")
+    arg_parser.add_argument("baseline", type=Path)
+    arg_parser.add_argument("current", type=Path)
+    arg_parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    args = arg_parser.parse_args()
+
+    baseline = json.loads(args.baseline.read_text())
+    current = json.loads(args.current.read_text())
+    print(f"{baseline['commit']} -> {current['commit']}")
+    for row in compare(baseline, current, args.threshold):
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(
+            f"{row['benchmark']:40} {row['scale']:>4}x"
+            f" time {row['time_ratio']:6.2f}x memory {row['memory_ratio']:6.2f}x{flag}"
+        )
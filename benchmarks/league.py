@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+import utils
+
+# Roughly the size of the real sheet: one game a week since autumn 2023.
+DEFAULT_PLAYERS = 40
+DEFAULT_SEASONS = 2
+DEFAULT_MATCHES_PER_WEEK = 1
+DEFAULT_SQUAD_SIZE = 7
+WEEKS_PER_SEASON = 46
+
+
+def generate_league(
+    n_players: int = DEFAULT_PLAYERS,
+    seasons: int = DEFAULT_SEASONS,
+    matches_per_week: int = DEFAULT_MATCHES_PER_WEEK,
+    squad_size: int = DEFAULT_SQUAD_SIZE,
+    start: str = "2023-10-05",
+    seed: int = 0,
+) -> pd.DataFrame:
+    # Match data shaped like utils.get_match_data: one row per player per match
+    # plus an "Other" row per team for goals nobody claimed, newest first.
+    if squad_size < 1:
+        raise ValueError(f"squad_size must be at least 1, got {squad_size}")
+    if n_players < 2 * squad_size:
+        raise ValueError(
+            f"{n_players} players cannot field two squads of {squad_size}; "
+            f"pass n_players >= {2 * squad_size} or a smaller squad_size"
+        )
+    if seasons < 1:
+        raise ValueError(f"seasons must be at least 1, got {seasons}")
+    if not 1 <= matches_per_week <= 7:
+        raise ValueError(
+            f"matches_per_week must be between 1 and 7, got {matches_per_week}"
+        )
+    rng = np.random.default_rng(seed)
+    names = np.array([f"Player {i:04d}" for i in range(n_players)], dtype=object)
+    attendance = rng.dirichlet(np.full(n_players, 2.0))  # some players are regulars
+    skill = rng.gamma(2.0, 0.25, n_players)
+
+    n_weeks = seasons * WEEKS_PER_SEASON
+    weeks = pd.date_range(start, periods=n_weeks, freq="7D")
+    dates = (
+        weeks.repeat(matches_per_week)
+        + pd.to_timedelta(np.tile(np.arange(matches_per_week), n_weeks), unit="D")
+    ).to_numpy()
+    n_matches = len(dates)
+
+    # weighted sampling without replacement: the largest log(u) / weight keys
+    keys = np.log(rng.random((n_matches, n_players))) / attendance
+    picks = np.argsort(-keys, axis=1)[:, : 2 * squad_size]
+    player = picks.ravel()
+    team = np.tile(np.repeat(["A", "B"], squad_size), n_matches)
+    goals = rng.poisson(skill[player])
+    assists = rng.poisson(skill[player] / 2)
+    other_goals = rng.poisson(0.5, 2 * n_matches)
+
+    match_data = pd.concat(
+        [
+            pd.DataFrame(
+                {
+                    "date": np.repeat(dates, 2 * squad_size),
+                    "team": team,
+                    "name": names[player],
+                    "goals": goals,
+                    "assists": assists,
+                }
+            ),
+            pd.DataFrame(
+                {
+                    "date": np.repeat(dates, 2),
+                    "team": np.tile(["A", "B"], n_matches),
+                    "name": "Other",
+                    "goals": other_goals,
+                    "assists": 0,
+                }
+            ),
+        ],
+        ignore_index=True,
+    )
+    match_data = match_data.sort_values("date", ascending=False, kind="stable")
+    return match_data.reset_index(drop=True).astype(utils.match_dtypes)
@@ -0,0 +1,213 @@
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+import chemistry
+import facts
+import ratings
+import simulate
+import splits
+import utils
+from benchmarks.league import (
+    DEFAULT_MATCHES_PER_WEEK,
+    DEFAULT_PLAYERS,
+    DEFAULT_SEASONS,
+    DEFAULT_SQUAD_SIZE,
+    generate_league,
+)
+
+RESULTS_DIR = Path(__file__).parent / "results"
+SCALES = [1, 10, 100]
+HEATMAP_START = pd.Timestamp("2024-01-01")
+
+
+def measure(fn: Callable, setup: Callable | None = None, repeat: int = 5) -> dict:
+    # One untimed warm-up call, `repeat` timed calls, then one more call under
+    # tracemalloc for the peak memory (numpy reports its buffers to it too).
+    def call():
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        fn(*args)
+        return time.perf_counter() - start
+
+    call()
+    times = [call() for _ in range(repeat)]
+    args = setup() if setup else ()
+    tracemalloc.start()
+    try:
+        fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "min_s": min(times),
+        "median_s": statistics.median(times),
+        "mean_s": statistics.fmean(times),
+        "repeat": repeat,
+        "peak_bytes": peak,
+    }
+
+
+def benchmarks(
+    match_data: pd.DataFrame, workdir: str
+) -> dict[str, tuple[Callable, Callable | None]]:
+    outcomes = utils.get_match_outcome(match_data)
+    match_facts = facts.build_match_facts(outcomes)
+    player_ratings = ratings.calculate_player_ratings(outcomes, None)
+    regulars = match_facts.player_totals.drop("Other")["apps"].nlargest(24).index
+    latest = outcomes["date"].max()
+    rating_history = ratings.build_rating_history(
+        ratings.get_rating_history(match_facts.player_matches, None)
+    )
+    score_model = simulate.fit_score_model(
+        match_facts.matches,
+        simulate.rating_gaps(match_facts.player_matches, rating_history),
+    )
+    top_splits = splits.best_splits(player_ratings[regulars[:14]], k=3)
+
+    def checkpoint_before_latest():
+        # rating checkpoint covering everything but the newest match
+        directory = Path(tempfile.mkdtemp(dir=workdir))
+        ratings.get_rating_history(outcomes[outcomes["date"] < latest], directory)
+        return (directory,)
+
+    def facts_before_latest():
+        return (facts.build_match_facts(outcomes[outcomes["date"] < latest]),)
+
+    def heatmap_slice():
+        return facts.results_since(match_facts.results, HEATMAP_START)
+
+    return {
+        "get_match_outcome": (lambda: utils.get_match_outcome(match_data), None),
+        "build_match_facts": (lambda: facts.build_match_facts(outcomes), None),
+        "build_match_facts_incremental": (
+            lambda previous: facts.build_match_facts(outcomes, previous),
+            facts_before_latest,
+        ),
+        "heatmap_slice": (heatmap_slice, None),
+        "totals_between": (
+            lambda: facts.totals_between(match_facts.player_matches, HEATMAP_START),
+            None,
+        ),
+        "outcome_summary": (
+            lambda: facts.outcome_summary(match_facts.player_totals),
+            None,
+        ),
+        "calculate_player_ratings": (
+            lambda: ratings.calculate_player_ratings(outcomes, None),
+            None,
+        ),
+        "rating_history_incremental": (
+            lambda directory: ratings.get_rating_history(outcomes, directory),
+            checkpoint_before_latest,
+        ),
+        "best_splits_14": (
+            lambda: splits.best_splits(player_ratings[regulars[:14]], k=3),
+            None,
+        ),
+        "best_splits_24": (
+            lambda: splits.best_splits(player_ratings[regulars[:24]], k=3),
+            None,
+        ),
+        "build_chemistry": (
+            lambda: chemistry.build_chemistry(match_facts.player_matches),
+            None,
+        ),
+        "simulate_splits": (
+            lambda: simulate.simulate_splits(score_model, top_splits, rating_history),
+            None,
+        ),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(
+    scales: list = SCALES,
+    repeat: int = 5,
+    only: list | None = None,
+    seasons: int = DEFAULT_SEASONS,
+    **league,
+) -> dict:
+    # Scaling lengthens the history: 10x is ten times as many seasons.
+    results = []
+    for scale in scales:
+        match_data = generate_league(seasons=seasons * scale, **league)
+        with tempfile.TemporaryDirectory() as workdir:
+            cases = benchmarks(match_data, workdir)
+            for name, (fn, setup) in cases.items():
+                if only and name not in only:
+                    continue
+                result = measure(fn, setup, repeat)
+                results.append(
+                    {"benchmark": name, "scale": scale, "rows": len(match_data)}
+                    | result
+                )
+                print(
+                    f"{name:40} {scale:>4}x {result['median_s'] * 1000:10.2f} ms"
+                    f" {result['peak_bytes'] / 2**20:8.1f} MiB"
+                )
+    return {
+        "commit": git_commit(),
+        "created": pd.Timestamp.now(tz="UTC").isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "league": {"seasons": seasons, **league},
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Time the data pipeline on synthetic leagues of growing size"
+    )
+    arg_parser.add_argument("--scales", type=int, nargs="+", default=SCALES)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--only", nargs="+", help="benchmark names to run")
+    arg_parser.add_argument("--players", type=int, default=DEFAULT_PLAYERS)
+    arg_parser.add_argument("--seasons", type=int, default=DEFAULT_SEASONS)
+    arg_parser.add_argument(
+        "--matches-per-week", type=int, default=DEFAULT_MATCHES_PER_WEEK
+    )
+    arg_parser.add_argument("--squad-size", type=int, default=DEFAULT_SQUAD_SIZE)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--output", type=Path, default=RESULTS_DIR)
+    args = arg_parser.parse_args()
+
+    report = run(
+        args.scales,
+        args.repeat,
+        args.only,
+        n_players=args.players,
+        seasons=args.seasons,
+        matches_per_week=args.matches_per_week,
+        squad_size=args.squad_size,
+        seed=args.seed,
+    )
+    args.output.mkdir(parents=True, exist_ok=True)
+    path = args.output / f"{time.strftime('%Y%m%d-%H%M%S')}-{report['commit']}.json"
+    path.write_text(json.dumps(report, indent=2))
+    print(f"Saved {path}")
@@ -0,0 +1,259 @@
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from streamlit_gsheets import GSheetsConnection
+
+import facts
+import ratings
+import sheets
+import utils
+
+EXPORT_COMPRESSION = "zstd"
+
+# Import files hold game_data rows (date, team, name, goals, assists) for any
+# number of matches, and a score column with the team's final score: goals
+# nobody on the sheet scored then go to an "Other" row, as in the edit form.
+# Files without scores (e.g. an exported game_data) are only taken with
+# without_score, as they are, "Other" rows included and no score checked.
+import_columns = ["date", "team", "name", "goals", "assists"]
+
+
+class ImportProblems(ValueError):
+    def __init__(self, problems: list[str]):
+        super().__init__(f"{len(problems)} problem(s):\n" + "\n".join(problems))
+        self.problems = problems
+
+
+def read_files(paths: list[Path]) -> pd.DataFrame:
+    frames = []
+    for path in paths:
+        if path.suffix == ".parquet":
+            frame = pd.read_parquet(path)
+        else:
+            frame = pd.read_csv(path, dtype={"team": str, "name": str})
+        # line in the file, header included, for error messages
+        line = np.arange(len(frame)) + (2 if path.suffix == ".csv" else 1)
+        frames.append(frame.assign(source=path.name, line=line))
+    return pd.concat(frames, ignore_index=True)
+
+
+def parse_rows(raw: pd.DataFrame) -> tuple[pd.DataFrame, list[str]]:
+    # Types the columns the way the sheet reader does; unparseable cells are
+    # reported with their file and row instead of being dropped.
+    missing = [col for col in import_columns if col not in raw.columns]
+    if missing:
+        return raw, [f"missing columns: {', '.join(missing)}"]
+    rows = raw.copy()
+    rows["date"] = pd.to_datetime(rows["date"], errors="coerce")
+    rows["name"] = rows["name"].astype(object).where(rows["name"].notnull())
+    rows["name"] = rows["name"].str.strip()
+    rows["team"] = rows["team"].astype(str).str.strip().str.upper()
+    bad = {
+        "date": rows["date"].isnull(),
+        "name": rows["name"].isnull() | (rows["name"] == ""),
+        "team": ~rows["team"].isin(["A", "B"]),
+    }
+    for col in ["goals", "assists"]:
+        # empty cells are 0, as in the sheet; anything else has to be a count
+        values = pd.to_numeric(rows[col], errors="coerce")
+        bad[col] = (values.isnull() & rows[col].notnull()) | (values < 0)
+        rows[col] = values.fillna(0)
+    if "score" in rows:
+        rows["score"] = pd.to_numeric(rows["score"], errors="coerce")
+        # "Other" rows are recomputed from the score, theirs is not needed
+        bad["score"] = (rows["name"] != "Other") & (
+            rows["score"].isnull() | (rows["score"] < 0)
+        )
+    problems = []
+    for col, mask in bad.items():
+        for i in rows.index[mask]:
+            where = f"{rows.at[i, 'source']} line {rows.at[i, 'line']}"
+            problems.append(f"{where}: bad {col} {raw.at[i, col]!r}")
+    return rows, problems
+
+
+def with_other_rows(rows: pd.DataFrame) -> pd.DataFrame:
+    # With a score column: one "Other" row per team for the goals its players
+    # did not score, replacing any in the file.
+    if "score" not in rows:
+        return rows[import_columns]
+    players = rows[rows["name"] != "Other"]
+    teams = players.groupby(["date", "team"]).agg(
+        goals=("goals", "sum"), score=("score", "first")
+    )
+    other = pd.DataFrame(
+        {
+            "date": teams.index.get_level_values("date"),
+            "team": teams.index.get_level_values("team"),
+            "name": "Other",
+            "goals": (teams["score"] - teams["goals"]).to_numpy(),
+            "assists": 0,
+        }
+    )
+    return pd.concat([players[import_columns], other], ignore_index=True)
+
+
+def validate(
+    rows: pd.DataFrame, players: list, match_data: pd.DataFrame, replace: bool
+) -> list[str]:
+    day = rows["date"].dt.strftime("%Y-%m-%d")
+    if "score" in rows:
+        scores = rows[rows["name"] != "Other"].groupby([day, "team"])["score"]
+        problems = [
+            f"{date}: team {team} has more than one score"
+            for date, team in scores.nunique().loc[lambda count: count > 1].index
+        ]
+        problems += utils.team_sheet_problems(rows.assign(total_goals=rows["score"]))
+    else:
+        # nothing to check the goals against: lineups only
+        problems = utils.team_sheet_problems(rows)
+    teams = rows.groupby(day)["team"].nunique()
+    problems += [f"{date}: only one team" for date in teams.index[teams < 2]]
+    unknown = ~rows["name"].isin(set(players) | {"Other"})
+    for name, dates in day[unknown].groupby(rows["name"][unknown]):
+        problems.append(
+            f"{name!r} is not on the Players sheet ({', '.join(sorted(set(dates)))})"
+        )
+    if not replace:
+        existing = sorted(set(day[rows["date"].isin(match_data["date"].unique())]))
+        if existing:
+            problems.append(
+                f"matches already in game_data (use --replace): {', '.join(existing)}"
+            )
+    return problems
+
+
+def import_matches(
+    conn: GSheetsConnection | sheets.SheetBackend,
+    paths: list[Path],
+    replace: bool = False,
+    dry_run: bool = False,
+    without_score: bool = False,
+) -> pd.DataFrame:
+    # Validates every match in the files together and merges them into
+    # game_data with one write; nothing is written if any check fails or
+    # game_data changed since it was read.
+    backend = utils.get_sheet_backend(conn)
+    token = backend.version("game_data")
+    utils.invalidate_worksheet("game_data")
+    sheet_data = utils.load_sheets(backend, ("players", "match_data"))
+    players, match_data = sheet_data.players, sheet_data.match_data
+    assert players is not None and match_data is not None
+    rows, problems = parse_rows(read_files(paths))
+    if "score" not in rows and not without_score:
+        problems.append(
+            "no score column: add each team's final score, or import without"
+            " scores to take the rows as they are, unchecked"
+        )
+    if problems:
+        raise ImportProblems(problems)
+    problems = validate(rows, players, match_data, replace)
+    if problems:
+        raise ImportProblems(problems)
+    rows = with_other_rows(rows).astype({"goals": int, "assists": int})
+    if dry_run:
+        return rows
+
+    merged = pd.concat(
+        [match_data[~match_data["date"].isin(rows["date"].unique())], rows],
+        ignore_index=True,
+    ).sort_values("date", ascending=False, kind="stable")
+    with backend.write_lock:
+        _check_unchanged(backend, token, match_data)
+        backend.update("game_data", merged[utils.column_names])
+    utils.invalidate_worksheet("game_data")
+    return rows
+
+
+def _check_unchanged(
+    backend: sheets.SheetBackend, token: str | None, match_data: pd.DataFrame
+):
+    # The write replaces the whole worksheet, so it has to still hold the rows
+    # the import was merged into. A token is spreadsheet-wide (or missing), so
+    # a new one is settled by reading game_data again.
+    if token is not None and backend.version("game_data") == token:
+        return
+    current = utils.read_match_data(backend)
+    if facts.data_version(current) != facts.data_version(match_data):
+        raise sheets.StaleDataError(
+            "game_data changed during the import, nothing was written; run it again"
+        )
+
+
+def export_tables(
+    conn: GSheetsConnection | sheets.SheetBackend,
+) -> dict[str, pd.DataFrame]:
+    sheet_data = utils.load_sheets(conn, ("players", "match_data", "funds"))
+    match_facts = utils.get_match_facts(sheet_data.match_data)
+    history = ratings.get_rating_history(match_facts.player_matches, None)
+    final = ratings.final_ratings(history, match_facts.player_totals.index)
+    return {
+        "game_data": sheet_data.match_data,
+        "players": pd.DataFrame({"name": sheet_data.players}),
+        "funds": sheet_data.funds,
+        "player_totals": match_facts.player_totals.join(final.rename("rating"))
+        .rename_axis("name")
+        .reset_index(),
+        "rating_history": history,
+    }
+
+
+def export_archive(
+    conn: GSheetsConnection | sheets.SheetBackend,
+    directory: Path,
+    fmt: str = "parquet",
+) -> list[Path]:
+    # One file per table: zstd Parquet, or gzipped CSV for spreadsheets.
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for name, table in export_tables(conn).items():
+        if fmt == "parquet":
+            path = directory / f"{name}.parquet"
+            table.to_parquet(path, index=False, compression=EXPORT_COMPRESSION)
+        else:
+            path = directory / f"{name}.csv.gz"
+            table.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Import matches into game_data or export the league"
+    )
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="CSV / Parquet match files")
+    import_parser.add_argument("files", type=Path, nargs="+")
+    import_parser.add_argument(
+        "--replace", action="store_true", help="overwrite matches already stored"
+    )
+    import_parser.add_argument(
+        "--dry-run", action="store_true", help="validate without writing"
+    )
+    import_parser.add_argument(
+        "--without-score",
+        action="store_true",
+        help="files have no score column: import rows as they are, scores unchecked",
+    )
+    export_parser = commands.add_parser("export", help="archive every table")
+    export_parser.add_argument("directory", type=Path)
+    export_parser.add_argument(
+        "--format", choices=["parquet", "csv"], default="parquet"
+    )
+    args = arg_parser.parse_args()
+
+    conn = utils.get_connection()
+    if args.command == "import":
+        try:
+            imported = import_matches(
+                conn, args.files, args.replace, args.dry_run, args.without_score
+            )
+        except (ImportProblems, sheets.StaleDataError) as error:
+            arg_parser.exit(1, f"{error}\n")
+        verb = "Checked" if args.dry_run else "Imported"
+        print(f"{verb} {imported['date'].nunique()} matches, {len(imported)} rows")
+    else:
+        for path in export_archive(conn, args.directory, args.format):
+            print(path)
@@ -0,0 +1,234 @@
+import functools
+import inspect
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Callable, NamedTuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# One in-memory cache per server process, shared by every session. Entries
+# live in a namespace and are keyed on (function, version, parameters); the
+# least recently used ones are dropped once the namespaces together go over
+# FOOTBALL_CACHE_MB. Frames are stored read-only and every caller gets a
+# shallow view of the same arrays: adding columns to it is fine, writing into
+# it raises.
+NAMESPACES = ("sheets", "derived", "ratings", "statsbomb", "figures")
+MEMORY_BUDGET = int(os.environ.get("FOOTBALL_CACHE_MB", 512)) * 2**20
+
+stats_columns = ["entries", "bytes", "hits", "misses", "evictions"]
+
+
+class Entry(NamedTuple):
+    value: object
+    nbytes: int
+    namespace: str
+    version: str | None
+
+
+def _arrays(frame: pd.DataFrame | pd.Series) -> list:
+    # the numpy arrays behind a frame's blocks (categorical codes included)
+    arrays = []
+    for block in frame._mgr.blocks:
+        values = block.values
+        if isinstance(values, pd.Categorical):
+            values = values.codes
+        values = getattr(values, "_ndarray", values)
+        if isinstance(values, np.ndarray):
+            arrays.append(values)
+    return arrays
+
+
+def freeze(value):
+    # Marks the arrays inside value read-only, in place, and returns it.
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        for array in _arrays(value):
+            array.flags.writeable = False
+    elif isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    elif isinstance(value, tuple):
+        for item in value:
+            freeze(item)
+    return value
+
+
+def share(value):
+    # What a caller gets: shallow views, so new columns stay private to it.
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=False)
+    if isinstance(value, tuple) and hasattr(value, "_fields"):
+        return type(value)(*(share(item) for item in value))
+    if isinstance(value, tuple):
+        return tuple(share(item) for item in value)
+    return value
+
+
+def nbytes(value, depth: int = 0) -> int:
+    # Rough size; strings in object columns are counted too.
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True, index=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(value, np.ndarray):
+        if value.dtype == object:
+            return value.nbytes + sum(sys.getsizeof(item) for item in value.flat)
+        return value.nbytes
+    if sparse.issparse(value):
+        value = value.tocsr()
+        return value.data.nbytes + value.indices.nbytes + value.indptr.nbytes
+    if isinstance(value, (bytes, str)):
+        return sys.getsizeof(value)
+    if depth > 3:
+        return sys.getsizeof(value)
+    if isinstance(value, (tuple, list, set)):
+        return sum(nbytes(item, depth + 1) for item in value)
+    if isinstance(value, dict):
+        return sum(
+            nbytes(key, depth + 1) + nbytes(item, depth + 1)
+            for key, item in value.items()
+        )
+    if hasattr(value, "__dict__"):
+        return nbytes(vars(value), depth + 1)
+    return sys.getsizeof(value)
+
+
+class CacheManager:
+    def __init__(self, budget: int = MEMORY_BUDGET):
+        self.budget = budget
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()  # least recently used first
+        self._building: dict = {}  # key -> lock, so concurrent misses build once
+        self._latest: dict = {}  # name -> key of the last entry built under it
+        self._bytes = 0
+        self._stats = {
+            namespace: dict.fromkeys(stats_columns, 0) for namespace in NAMESPACES
+        }
+
+    def _lookup(self, key: tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats[entry.namespace]["hits"] += 1
+            return entry
+
+    def get_or_build(
+        self,
+        namespace: str,
+        key: tuple,
+        build: Callable,
+        version: str | None = None,
+        latest: str | None = None,
+    ):
+        key = (namespace, *key)
+        entry = self._lookup(key)
+        if entry is None:
+            with self._lock:
+                building = self._building.setdefault(key, threading.Lock())
+            try:
+                with building:
+                    entry = self._lookup(key)
+                    if entry is None:
+                        value = freeze(build())
+                        entry = Entry(value, nbytes(value), namespace, version)
+                        self._put(key, entry, latest)
+            finally:
+                with self._lock:
+                    self._building.pop(key, None)
+        return share(entry.value)
+
+    def _put(self, key: tuple, entry: Entry, latest: str | None = None):
+        with self._lock:
+            stats = self._stats[entry.namespace]
+            stats["misses"] += 1
+            if entry.nbytes > self.budget:
+                return  # served once, never kept
+            if latest is not None:
+                self._latest[latest] = key
+            self._entries[key] = entry
+            stats["entries"] += 1
+            stats["bytes"] += entry.nbytes
+            self._bytes += entry.nbytes
+            while self._bytes > self.budget:
+                _, evicted = self._entries.popitem(last=False)
+                self._forget(evicted)
+                self._stats[evicted.namespace]["evictions"] += 1
+
+    def _forget(self, entry: Entry):
+        stats = self._stats[entry.namespace]
+        stats["entries"] -= 1
+        stats["bytes"] -= entry.nbytes
+        self._bytes -= entry.nbytes
+
+    def latest(self, name: str):
+        # The last value built with get_or_build(..., latest=name), whatever
+        # its version: the starting point of an incremental build. It lives
+        # in the cache like any entry, so None once evicted or invalidated.
+        with self._lock:
+            entry = self._entries.get(self._latest.get(name))
+        return None if entry is None else entry.value
+
+    def invalidate(self, namespace: str, version: str | None = None) -> int:
+        # Drops the namespace's entries, or only those built for one version.
+        with self._lock:
+            stale = [
+                key
+                for key, entry in self._entries.items()
+                if entry.namespace == namespace
+                and (version is None or entry.version == version)
+            ]
+            for key in stale:
+                self._forget(self._entries.pop(key))
+        return len(stale)
+
+    def stats(self) -> pd.DataFrame:
+        with self._lock:
+            stats = pd.DataFrame.from_dict(self._stats, orient="index")
+        stats["hit_rate"] = stats["hits"] / (stats["hits"] + stats["misses"]).where(
+            lambda calls: calls > 0
+        )
+        return stats
+
+
+# a module global rather than st.cache_resource, so scripts and benchmarks
+# running outside Streamlit share one manager too
+_manager = CacheManager()
+
+
+def get_cache() -> CacheManager:
+    return _manager
+
+
+def cached(namespace: str, latest: str | None = None) -> Callable:
+    # Drop-in for @st.cache_data: parameters starting with an underscore are
+    # left out of the key, and a "version" parameter tags the entry so
+    # invalidate(namespace, version) can find it. With latest, the newest
+    # result is also found by get_cache().latest(latest).
+    if namespace not in NAMESPACES:
+        raise ValueError(f"Unknown cache namespace {namespace!r}")
+
+    def decorate(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = tuple(
+                (name, value)
+                for name, value in bound.arguments.items()
+                if not name.startswith("_")
+            )
+            return get_cache().get_or_build(
+                namespace,
+                (func.__module__, func.__qualname__, params),
+                lambda: func(*args, **kwargs),
+                bound.arguments.get("version"),
+                latest,
+            )
+
+        return wrapper
+
+    return decorate
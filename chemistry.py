@@ -0,0 +1,132 @@
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+PRIOR_MATCHES = 4  # pretend every pair also drew this many games together
+
+pair_columns = [
+    "player",
+    "partner",
+    "together",
+    "together_wins",
+    "together_win_rate",
+    "against",
+    "wins",
+    "draws",
+    "losses",
+]
+
+
+class Chemistry(NamedTuple):
+    # Pair counts as sparse player x player matrices, all from the row player's
+    # side: together, together_wins / together_losses (on the same side of a
+    # win / loss), against, wins (row player beat column player) and losses
+    # (= wins transposed).
+    names: np.ndarray
+    together: sparse.csr_matrix
+    together_wins: sparse.csr_matrix
+    together_losses: sparse.csr_matrix
+    against: sparse.csr_matrix
+    wins: sparse.csr_matrix
+    losses: sparse.csr_matrix
+
+
+def incidence(
+    player_matches: pd.DataFrame,
+) -> tuple[np.ndarray, sparse.csr_matrix, sparse.csr_matrix]:
+    # Player x match matrices: side (+1 team A, -1 team B) and result from the
+    # player's side (1 / 0 / -1). "Other" is a placeholder, not a player.
+    played = player_matches[player_matches["name"] != "Other"].drop_duplicates(
+        ["date", "name"]
+    )
+    player, names = pd.factorize(played["name"].astype(object), sort=True)
+    match, dates = pd.factorize(played["date"], sort=True)
+    shape = (len(names), len(dates))
+    side = np.where(played["team"] == "A", 1, -1).astype(np.int32)
+    result = played["sign"].to_numpy(dtype=np.int32)
+    return (
+        np.asarray(names, dtype=object),
+        sparse.csr_matrix((side, (player, match)), shape=shape),
+        sparse.csr_matrix((result, (player, match)), shape=shape),
+    )
+
+
+def _without_diagonal(matrix: sparse.spmatrix) -> sparse.csr_matrix:
+    matrix = sparse.csr_matrix(matrix - sparse.diags(matrix.diagonal()))
+    matrix.eliminate_zeros()
+    return matrix.astype(np.int32)
+
+
+def build_chemistry(player_matches: pd.DataFrame) -> Chemistry:
+    # A handful of sparse products instead of a loop over dates and pairs:
+    # side @ side.T is +1 per match together and -1 per match against.
+    names, side, result = incidence(player_matches)
+    present = abs(side)
+    won = (result > 0).astype(np.int32)
+    lost = (result < 0).astype(np.int32)
+    played = present @ present.T
+    same_side = side @ side.T
+    wins = _without_diagonal(won @ lost.T)  # a win and a loss: opposite sides
+    return Chemistry(
+        names,
+        _without_diagonal((played + same_side) / 2),
+        _without_diagonal(won @ won.T),
+        _without_diagonal(lost @ lost.T),
+        _without_diagonal((played - same_side) / 2),
+        wins,
+        wins.T.tocsr(),
+    )
+
+
+def pair_synergy(chemistry: Chemistry, names: list) -> np.ndarray:
+    # Net wins per match the pair played together, shrunk towards 0 for pairs
+    # with few games: positive pairs did better together than apart.
+    positions = pd.Index(chemistry.names).get_indexer(names)
+    known = positions >= 0
+    synergy = np.zeros((len(names), len(names)))
+    rows = positions[known]
+    net = (chemistry.together_wins - chemistry.together_losses)[rows][:, rows]
+    games = chemistry.together[rows][:, rows]
+    synergy[np.ix_(known, known)] = net.toarray() / (games.toarray() + PRIOR_MATCHES)
+    return synergy
+
+
+def pair_table(chemistry: Chemistry, player: str | None = None) -> pd.DataFrame:
+    # One row per pair that shared a pitch (each pair once, or every partner
+    # of one player).
+    if player is None:
+        pairs = sparse.triu(chemistry.together + chemistry.against, k=1).tocoo()
+        rows, cols = pairs.row, pairs.col
+    else:
+        row = np.searchsorted(chemistry.names, player)
+        if row == len(chemistry.names) or chemistry.names[row] != player:
+            return pd.DataFrame(columns=pair_columns)
+        cols = (chemistry.together + chemistry.against)[row].indices
+        rows = np.full(len(cols), row)
+
+    def values(matrix: sparse.csr_matrix) -> np.ndarray:
+        return np.asarray(matrix[rows, cols]).ravel()
+
+    together = values(chemistry.together)
+    together_wins = values(chemistry.together_wins)
+    against = values(chemistry.against)
+    wins = values(chemistry.wins)
+    losses = values(chemistry.losses)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        win_rate = np.where(together > 0, together_wins / together, np.nan)
+    return pd.DataFrame(
+        {
+            "player": chemistry.names[rows],
+            "partner": chemistry.names[cols],
+            "together": together,
+            "together_wins": together_wins,
+            "together_win_rate": win_rate,
+            "against": against,
+            "wins": wins,
+            "draws": against - wins - losses,
+            "losses": losses,
+        },
+        columns=pair_columns,
+    )
@@ -0,0 +1,144 @@
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+# StatsBomb pitch coordinates
+PITCH_BOUNDS = (0.0, 120.0, 0.0, 80.0)
+GRID_STEP = 0.5
+KERNEL_SIGMAS = 4
+
+
+class ShotDensity(NamedTuple):
+    xs: np.ndarray
+    ys: np.ndarray
+    density: np.ndarray  # shape (len(ys), len(xs)), as contourf expects
+    marginal_x: np.ndarray
+    marginal_y: np.ndarray
+
+
+def _grid(lo: float, hi: float, step: float = GRID_STEP) -> np.ndarray:
+    return np.linspace(lo, hi, int(round((hi - lo) / step)) + 1)
+
+
+def _bin(values: np.ndarray, grid: np.ndarray) -> np.ndarray:
+    # nearest grid node for every value, points off the grid are dropped
+    step = grid[1] - grid[0]
+    return np.round((values - grid[0]) / step).astype(int)
+
+
+def _fft_convolve(counts: np.ndarray, kernel: np.ndarray) -> np.ndarray:
+    # linear ("same" size) convolution; kernel dimensions are odd and centred
+    shape = [n + k - 1 for n, k in zip(counts.shape, kernel.shape)]
+    full = np.fft.irfftn(
+        np.fft.rfftn(counts, shape) * np.fft.rfftn(kernel, shape), shape
+    )
+    start = [(k - 1) // 2 for k in kernel.shape]
+    return full[tuple(slice(s, s + n) for s, n in zip(start, counts.shape))]
+
+
+def _offsets(sigma: float, grid: np.ndarray) -> np.ndarray:
+    step = grid[1] - grid[0]
+    half = min(int(np.ceil(KERNEL_SIGMAS * sigma / step)), len(grid) - 1)
+    return np.arange(-half, half + 1) * step
+
+
+def density_1d(values: np.ndarray, grid: np.ndarray) -> np.ndarray:
+    # Gaussian KDE with Scott's bandwidth (as scipy / seaborn use), evaluated on
+    # the grid by binning the points and convolving with the sampled kernel.
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if len(values) < 2 or values.std(ddof=1) == 0:
+        return np.zeros(len(grid))
+    sigma = values.std(ddof=1) * len(values) ** (-1 / 5)
+    idx = _bin(values, grid)
+    idx = idx[(idx >= 0) & (idx < len(grid))]
+    counts = np.bincount(idx, minlength=len(grid)).astype(float)
+    offsets = _offsets(sigma, grid)
+    kernel = np.exp(-0.5 * (offsets / sigma) ** 2) / (sigma * np.sqrt(2 * np.pi))
+    return np.clip(_fft_convolve(counts, kernel), 0, None) / len(values)
+
+
+def density_2d(
+    x: np.ndarray, y: np.ndarray, xs: np.ndarray, ys: np.ndarray
+) -> np.ndarray:
+    points = np.vstack([np.asarray(x, dtype=float), np.asarray(y, dtype=float)])
+    points = points[:, ~np.isnan(points).any(axis=0)]
+    n = points.shape[1]
+    if n < 3:
+        return np.zeros((len(ys), len(xs)))
+    covariance = np.cov(points) * n ** (-2 / 6)
+    if np.linalg.det(covariance) <= 0:
+        return np.zeros((len(ys), len(xs)))
+    ix, iy = _bin(points[0], xs), _bin(points[1], ys)
+    inside = (ix >= 0) & (ix < len(xs)) & (iy >= 0) & (iy < len(ys))
+    counts = np.zeros((len(ys), len(xs)))
+    np.add.at(counts, (iy[inside], ix[inside]), 1)
+
+    dx = _offsets(np.sqrt(covariance[0, 0]), xs)
+    dy = _offsets(np.sqrt(covariance[1, 1]), ys)
+    grid_dx, grid_dy = np.meshgrid(dx, dy)
+    offsets = np.stack([grid_dx, grid_dy], axis=-1)
+    mahalanobis = np.einsum(
+        "...i,ij,...j->...", offsets, np.linalg.inv(covariance), offsets
+    )
+    kernel = np.exp(-0.5 * mahalanobis) / (
+        2 * np.pi * np.sqrt(np.linalg.det(covariance))
+    )
+    return np.clip(_fft_convolve(counts, kernel), 0, None) / n
+
+
+def shot_density(
+    shots: pd.DataFrame, bounds: tuple = PITCH_BOUNDS, step: float = GRID_STEP
+) -> ShotDensity:
+    xs, ys = _grid(bounds[0], bounds[1], step), _grid(bounds[2], bounds[3], step)
+    return ShotDensity(
+        xs,
+        ys,
+        density_2d(shots["x"], shots["y"], xs, ys),
+        density_1d(shots["x"], xs),
+        density_1d(shots["y"], ys),
+    )
+
+
+def batch_shot_densities(
+    shots: pd.DataFrame,
+    by: tuple = ("match_id", "team_name"),
+    bounds: tuple = PITCH_BOUNDS,
+    step: float = GRID_STEP,
+) -> dict:
+    return {
+        key: shot_density(group, bounds, step)
+        for key, group in shots.groupby(list(by), observed=True)
+    }
+
+
+def contour_levels(density: np.ndarray, levels: int = 75, thresh: float = 0.05):
+    # Iso-proportion levels like seaborn's kdeplot: each level encloses a fixed
+    # share of the probability mass, the lowest `thresh` share left blank.
+    values = np.sort(density.ravel())[::-1]
+    mass = np.cumsum(values) / values.sum()
+    proportions = np.linspace(thresh, 1, levels)
+    idx = np.searchsorted(mass, 1 - proportions)
+    return np.unique(np.append(np.take(values, idx, mode="clip"), values[0]))
+
+
+def plot_density(ax, density: ShotDensity, cmap: str, levels: int = 75):
+    if not density.density.any():
+        return
+    ax.contourf(
+        density.xs,
+        density.ys,
+        density.density,
+        levels=contour_levels(density.density, levels),
+        cmap=cmap,
+    )
+
+
+def plot_marginal(ax, grid: np.ndarray, values: np.ndarray, color, vertical=False):
+    if vertical:
+        ax.fill_betweenx(grid, values, color=color, alpha=0.25)
+        ax.plot(values, grid, color=color)
+    else:
+        ax.fill_between(grid, values, color=color, alpha=0.25)
+        ax.plot(grid, values, color=color)
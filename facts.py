@@ -0,0 +1,185 @@
+import hashlib
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+total_columns = ["apps", "goals", "assists", "W", "D", "L"]
+NOT_PLAYED = np.int8(-128)  # results cell of a player who missed the match
+
+
+class ResultsMatrix(NamedTuple):
+    # signs[player, match] is 1 / 0 / -1 (win / draw / loss) as int8, or
+    # NOT_PLAYED. Player ids follow first appearance and match ids the date
+    # order, so appending later matches never renumbers existing rows or
+    # columns.
+    names: np.ndarray
+    dates: np.ndarray
+    signs: np.ndarray
+
+
+class MatchFacts(NamedTuple):
+    # matches: one row per date with score_a, score_b and outcome (A - B)
+    # player_matches: one row per player per match with outcome and sign, plus
+    #   running per-player totals (cum_*) up to and including that match
+    # player_totals: per-player totals over all matches
+    # results: player x match ResultsMatrix
+    # version: content hash of the rows the tables were built from
+    matches: pd.DataFrame
+    player_matches: pd.DataFrame
+    player_totals: pd.DataFrame
+    results: ResultsMatrix
+    version: str
+
+
+def data_version(frame: pd.DataFrame) -> str:
+    return _version(pd.util.hash_pandas_object(frame, index=False).to_numpy())
+
+
+def _version(row_hashes: np.ndarray) -> str:
+    return hashlib.sha1(row_hashes.tobytes()).hexdigest()
+
+
+def build_match_facts(
+    match_data_with_outcomes: pd.DataFrame, previous: MatchFacts | None = None
+) -> MatchFacts:
+    # previous: facts built from an earlier copy of the sheet. When that copy
+    # is this one minus its latest matches, the results matrix is extended
+    # instead of rebuilt.
+    player_matches = match_data_with_outcomes.sort_values(
+        "date", kind="stable"
+    ).reset_index(drop=True)
+
+    scores = player_matches.pivot_table(
+        index="date", columns="team", values="goals", aggfunc="sum", observed=True
+    )
+    matches = pd.DataFrame(
+        {"score_a": scores["A"], "score_b": scores["B"]}, index=scores.index
+    )
+    matches["outcome"] = matches["score_a"] - matches["score_b"]
+
+    counts = pd.DataFrame(
+        {
+            "apps": 1,
+            "goals": player_matches["goals"].fillna(0).astype(int),
+            "assists": player_matches["assists"].fillna(0).astype(int),
+            "W": (player_matches["sign"] == 1).astype(int),
+            "D": (player_matches["sign"] == 0).astype(int),
+            "L": (player_matches["sign"] == -1).astype(int),
+        }
+    )
+    running = counts.groupby(player_matches["name"], observed=True).cumsum()
+    player_matches[[f"cum_{col}" for col in total_columns]] = running.to_numpy()
+    player_totals = totals_between(player_matches)
+
+    row_hashes = pd.util.hash_pandas_object(
+        match_data_with_outcomes, index=False
+    ).to_numpy()
+    results = None
+    if previous is not None and len(previous.results.dates):
+        last_date = previous.results.dates[-1]
+        earlier = (match_data_with_outcomes["date"] <= last_date).to_numpy()
+        if _version(row_hashes[earlier]) == previous.version:
+            results = append_results(
+                previous.results, player_matches[player_matches["date"] > last_date]
+            )
+    if results is None:
+        results = append_results(empty_results(), player_matches)
+    return MatchFacts(
+        matches, player_matches, player_totals, results, _version(row_hashes)
+    )
+
+
+def totals_between(
+    player_matches: pd.DataFrame,
+    start_date: pd.Timestamp | None = None,
+    end_date: pd.Timestamp | None = None,
+) -> pd.DataFrame:
+    # Difference of the running totals at the two ends of the window, so no
+    # re-aggregation over the rows inside it.
+    cum_columns = [f"cum_{col}" for col in total_columns]
+    dates = player_matches["date"]
+    window_end = (
+        player_matches if end_date is None else player_matches[dates <= end_date]
+    )
+    totals = window_end.drop_duplicates("name", keep="last").set_index("name")
+    totals = totals[cum_columns].set_axis(total_columns, axis=1)
+    if start_date is not None:
+        before = player_matches[dates < start_date].drop_duplicates("name", keep="last")
+        before = before.set_index("name")[cum_columns].set_axis(total_columns, axis=1)
+        totals = totals.sub(before.reindex(totals.index, fill_value=0))
+    totals.index = np.asarray(totals.index, dtype=object)
+    totals.index.name = "name"
+    return totals
+
+
+def outcome_summary(player_totals: pd.DataFrame) -> pd.DataFrame:
+    outcome_summary = (
+        player_totals[["W", "D", "L"]]
+        .drop("Other")
+        .sort_index()
+        .sort_values(["W", "D"], ascending=False)
+    )
+    outcome_summary["Win %"] = outcome_summary["W"] / outcome_summary.sum(axis=1)
+    return outcome_summary
+
+
+def empty_results() -> ResultsMatrix:
+    return ResultsMatrix(
+        np.array([], dtype=object),
+        np.array([], dtype="datetime64[ns]"),
+        np.empty((0, 0), dtype=np.int8),
+    )
+
+
+def append_results(
+    results: ResultsMatrix, player_matches: pd.DataFrame
+) -> ResultsMatrix:
+    # player_matches must only hold matches after the last one in results.
+    # Players playing twice in a match ("Other") get their signs summed.
+    if player_matches.empty:
+        return results
+    new_names = pd.unique(
+        player_matches.loc[~player_matches["name"].isin(results.names), "name"].astype(
+            object
+        )
+    )
+    names = np.concatenate([results.names, new_names])
+    player = pd.Index(names).get_indexer(player_matches["name"].astype(object))
+    match, new_dates = pd.factorize(player_matches["date"], sort=True)
+    shape = (len(names), len(new_dates))
+    flat = np.ravel_multi_index((player, match), shape)
+    played = np.bincount(flat, minlength=shape[0] * shape[1]).reshape(shape) > 0
+    total = np.bincount(
+        flat, weights=player_matches["sign"], minlength=shape[0] * shape[1]
+    ).reshape(shape)
+    new_signs = np.where(played, total, NOT_PLAYED).astype(np.int8)
+
+    signs = np.full(
+        (len(names), len(results.dates) + len(new_dates)), NOT_PLAYED, dtype=np.int8
+    )
+    signs[: len(results.names), : len(results.dates)] = results.signs
+    signs[:, len(results.dates) :] = new_signs
+    return ResultsMatrix(
+        names,
+        np.concatenate([results.dates, np.asarray(new_dates, dtype="datetime64[ns]")]),
+        signs,
+    )
+
+
+def results_since(
+    results: ResultsMatrix, start_date: pd.Timestamp | None = None
+) -> ResultsMatrix:
+    # Matches from start_date on and the players who played any of them, in
+    # name order. The date cut is a binary search on the sorted match ids.
+    first = (
+        0
+        if start_date is None
+        else np.searchsorted(
+            results.dates, np.datetime64(pd.Timestamp(start_date), "ns")
+        )
+    )
+    signs = results.signs[:, first:]
+    rows = np.flatnonzero((signs != NOT_PLAYED).any(axis=1))
+    rows = rows[np.argsort(results.names[rows].astype(str), kind="stable")]
+    return ResultsMatrix(results.names[rows], results.dates[first:], signs[rows])
@@ -0,0 +1,197 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Callable
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import seaborn as sns
+import streamlit as st
+from matplotlib.figure import Figure
+
+import cache
+import facts
+import profiling
+
+FIGURE_CACHE_DIR = Path(__file__).parent / ".cache" / "figures"
+FIGURE_CACHE_MAX_BYTES = 200 * 2**20
+FIGURE_CACHE_MAX_ENTRIES = 500
+# at most this many labels on the results heatmap axes, like sns.heatmap
+RESULTS_DATE_TICKS = 40
+RESULTS_NAME_TICKS = 50
+
+# pyplot keeps global state and is not thread safe: one figure is drawn at a
+# time, whether for a session or the warm-up pool
+_draw_lock = threading.Lock()
+
+
+class FigureCache:
+    # Rendered figures on disk, keyed on (page, data version, parameters).
+    # Least recently used files are evicted once the size or count limit is hit.
+
+    def __init__(
+        self,
+        directory: Path = FIGURE_CACHE_DIR,
+        max_bytes: int = FIGURE_CACHE_MAX_BYTES,
+        max_entries: int = FIGURE_CACHE_MAX_ENTRIES,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(page: str, data_version: str, **params) -> str:
+        raw = json.dumps([page, data_version, params], sort_keys=True, default=str)
+        return f"{page}-{hashlib.sha1(raw.encode()).hexdigest()}"
+
+    def render(
+        self,
+        page: str,
+        data_version: str,
+        draw: Callable[[], Figure],
+        fmt: str = "png",
+        **params,
+    ) -> bytes:
+        # PNGs in use stay in the shared memory cache, the rest only on disk
+        with profiling.stage(f"figure:{page}") as current:
+            current.cache = "hit"
+            image = cache.get_cache().get_or_build(
+                "figures",
+                (self.key(page, data_version, **params), fmt),
+                lambda: self._render(page, data_version, draw, fmt, current, **params),
+                data_version,
+            )
+        return image
+
+    def _render(
+        self,
+        page: str,
+        data_version: str,
+        draw: Callable[[], Figure],
+        fmt: str,
+        current: profiling.Stage,
+        **params,
+    ) -> bytes:
+        path = self.directory / f"{self.key(page, data_version, **params)}.{fmt}"
+        try:
+            image = path.read_bytes()
+            os.utime(path)  # mtime doubles as the last-used time
+            self.hits += 1
+            current.cache = "hit"
+            return image
+        except OSError:
+            self.misses += 1
+            current.cache = "miss"
+        with _draw_lock:
+            fig = draw()
+            try:
+                buffer = io.BytesIO()
+                # same output settings st.pyplot uses
+                fig.savefig(buffer, format=fmt, dpi=200, bbox_inches="tight")
+            finally:
+                plt.close(fig)
+        image = buffer.getvalue()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        tmp.write_bytes(image)
+        os.replace(tmp, path)
+        self.evict()
+        return image
+
+    def evict(self):
+        # another session may evict the same files while this one looks
+        files = []
+        for path in self.directory.iterdir():
+            if path.suffix == ".tmp":
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort(reverse=True)
+        total = 0
+        for count, (_, size, path) in enumerate(files):
+            total += size
+            if total > self.max_bytes or count >= self.max_entries:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    continue
+
+    def stats(self) -> dict:
+        sizes = []
+        for path in self.directory.glob("*"):
+            if path.suffix == ".tmp":
+                continue
+            try:
+                sizes.append(path.stat().st_size)
+            except FileNotFoundError:
+                continue
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(sizes),
+            "bytes": sum(sizes),
+        }
+
+
+@st.cache_resource
+def get_figure_cache() -> FigureCache:
+    return FigureCache()
+
+
+def draw_results_heatmap(results: facts.ResultsMatrix) -> Figure:
+    # The int8 signs index straight into an RGBA table, so imshow skips the
+    # colormap and masking work; missed matches stay transparent.
+    fig, ax = plt.subplots(figsize=(20, 10))
+    colors = np.array(
+        [
+            (255, 128, 128, 255),  # loss
+            (204, 204, 204, 255),  # draw
+            (102, 204, 128, 255),  # win
+            (0, 0, 0, 0),  # did not play
+        ],
+        dtype=np.uint8,
+    )
+    # "Other" can play twice in a match, hence the clip
+    cells = np.where(
+        results.signs == facts.NOT_PLAYED, 3, np.clip(results.signs, -1, 1) + 1
+    )
+    ax.imshow(colors[cells], aspect="auto", interpolation="nearest")
+    dates = np.datetime_as_string(results.dates, unit="D")
+    step = -(-len(dates) // RESULTS_DATE_TICKS)
+    ax.set_xticks(np.arange(0, len(dates), step), dates[::step], rotation=90)
+    step = -(-len(results.names) // RESULTS_NAME_TICKS)
+    ax.set_yticks(np.arange(0, len(results.names), step), results.names[::step])
+    ax.tick_params(bottom=False, left=False)
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+    return fig
+
+
+def draw_funds(days: pd.DataFrame) -> Figure:
+    a4_dims = (20, 10)
+    fig, ax = plt.subplots(figsize=a4_dims)
+
+    palette = ["r", "b", "g"]
+
+    sns.lineplot(
+        x="date",
+        y="balance",
+        markers=True,
+        dashes=False,
+        data=days,
+        palette=palette,
+        ax=ax,
+    )
+    ax.set_ylabel("Сума")
+    ax.set_xlabel("Дата")
+    return fig
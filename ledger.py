@@ -0,0 +1,208 @@
+import hashlib
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+import names
+
+SEASON_START_MONTH = 8  # seasons run August to July, e.g. "2024/25"
+
+rollup_columns = ["income", "expenses", "net", "entries", "balance"]
+
+
+class Ledger(NamedTuple):
+    # entries: the funds sheet in date order with the running balance after
+    #   each row; rows keep their sheet order within a date
+    # days: one row per date with the day's net amount, its descriptions
+    #   joined and the closing balance
+    # months / seasons: income, expenses, net, entries and closing balance per
+    #   period, indexed by a monthly Period / "2024/25" label
+    # by_description: amount and entries per normalized description, which
+    #   contributions() matches against the Players list
+    # rows: sheet rows folded in so far, version: hash of those rows
+    entries: pd.DataFrame
+    days: pd.DataFrame
+    months: pd.DataFrame
+    seasons: pd.DataFrame
+    by_description: pd.DataFrame
+    rows: int
+    version: str
+
+
+def _row_hashes(funds_data: pd.DataFrame) -> np.ndarray:
+    return pd.util.hash_pandas_object(
+        funds_data[["date", "amount", "description"]], index=False
+    ).to_numpy()
+
+
+def _version(row_hashes: np.ndarray) -> str:
+    return hashlib.sha1(row_hashes.tobytes()).hexdigest()
+
+
+def season_of(dates: pd.Series) -> pd.Series:
+    start = dates.dt.year - (dates.dt.month < SEASON_START_MONTH)
+    return start.astype(str) + "/" + ((start + 1) % 100).astype(str).str.zfill(2)
+
+
+def _rollup(entries: pd.DataFrame, period: pd.Series) -> pd.DataFrame:
+    amount = entries["amount"]
+    grouped = pd.DataFrame(
+        {
+            "income": amount.clip(lower=0),
+            "expenses": amount.clip(upper=0),
+            "net": amount,
+            "entries": 1,
+            "balance": entries["balance"],
+        }
+    ).groupby(period.to_numpy(), sort=True)
+    rollup = grouped[["income", "expenses", "net", "entries"]].sum()
+    rollup["balance"] = grouped["balance"].last()
+    return rollup[rollup_columns]
+
+
+def _fold(entries: pd.DataFrame, opening: float) -> pd.DataFrame:
+    # entries already sorted; running balance on top of the opening balance
+    entries = entries.reset_index(drop=True)
+    entries["balance"] = opening + entries["amount"].cumsum()
+    return entries
+
+
+def _days(entries: pd.DataFrame) -> pd.DataFrame:
+    grouped = entries.groupby("date", sort=True)
+    days = pd.DataFrame(
+        {"amount": grouped["amount"].sum(), "balance": grouped["balance"].last()}
+    )
+    described = entries.dropna(subset="description")
+    descriptions = described["description"].astype(str).groupby(described["date"])
+    days.insert(
+        1, "description", descriptions.agg(", ".join).reindex(days.index, fill_value="")
+    )
+    return days
+
+
+def _by_description(entries: pd.DataFrame) -> pd.DataFrame:
+    # summed per raw description first, so each spelling is normalized once
+    raw = (
+        entries.assign(entries=1)
+        .groupby(entries["description"].fillna(""))[["amount", "entries"]]
+        .sum()
+    )
+    return raw.groupby(raw.index.map(names.normalize)).sum().rename_axis("key")
+
+
+def _replace_tail(
+    rollup: pd.DataFrame, tail: pd.DataFrame, first: object
+) -> pd.DataFrame:
+    # periods from first on are rebuilt from the entries in them
+    return pd.concat([rollup[rollup.index < first], tail])
+
+
+def build_ledger(funds_data: pd.DataFrame, previous: Ledger | None = None) -> Ledger:
+    # previous: the ledger of an earlier copy of the sheet. When the sheet only
+    # grew at the end with entries no older than the last one, just those rows
+    # are folded in and only the periods they touch are rebuilt.
+    row_hashes = _row_hashes(funds_data)
+    version = _version(row_hashes)
+    if (
+        previous is not None
+        and len(previous.entries)
+        and previous.rows <= len(funds_data)
+        and _version(row_hashes[: previous.rows]) == previous.version
+    ):
+        new = funds_data.iloc[previous.rows :].sort_values("date", kind="stable")
+        last_date = previous.entries["date"].iloc[-1]
+        if new.empty:
+            return previous._replace(version=version)
+        if new["date"].iloc[0] >= last_date:
+            return _append(previous, new, len(funds_data), version)
+
+    entries = _fold(
+        funds_data[["date", "amount", "description"]].sort_values(
+            "date", kind="stable"
+        ),
+        0.0,
+    )
+    return Ledger(
+        entries,
+        _days(entries),
+        _rollup(entries, entries["date"].dt.to_period("M")),
+        _rollup(entries, season_of(entries["date"])),
+        _by_description(entries),
+        len(funds_data),
+        version,
+    )
+
+
+def _append(previous: Ledger, new: pd.DataFrame, rows: int, version: str) -> Ledger:
+    new = _fold(
+        new[["date", "amount", "description"]],
+        previous.entries["balance"].iloc[-1],
+    )
+    entries = pd.concat([previous.entries, new], ignore_index=True)
+
+    # the first new date, month and season may already hold earlier entries
+    first_date = new["date"].iloc[0]
+    touched = entries.iloc[entries["date"].searchsorted(first_date) :]
+    days = pd.concat([previous.days[previous.days.index < first_date], _days(touched)])
+
+    first_month = first_date.to_period("M")
+    months = entries.iloc[entries["date"].searchsorted(first_month.start_time) :]
+    first_season = season_of(new["date"].iloc[:1]).iloc[0]
+    season_start = pd.Timestamp(int(first_season[:4]), SEASON_START_MONTH, 1)
+    seasons = entries.iloc[entries["date"].searchsorted(season_start) :]
+
+    by_description = previous.by_description.add(
+        _by_description(new), fill_value=0
+    ).astype({"entries": int})
+    return Ledger(
+        entries,
+        days,
+        _replace_tail(
+            previous.months,
+            _rollup(months, months["date"].dt.to_period("M")),
+            first_month,
+        ),
+        _replace_tail(
+            previous.seasons, _rollup(seasons, season_of(seasons["date"])), first_season
+        ),
+        by_description,
+        rows,
+        version,
+    )
+
+
+def balance_at(ledger: Ledger, date: pd.Timestamp) -> float:
+    # closing balance of the last day on or before date
+    position = ledger.days.index.searchsorted(pd.Timestamp(date), side="right")
+    return float(ledger.days["balance"].iloc[position - 1]) if position else 0.0
+
+
+def period_summary(ledger: Ledger, date: pd.Timestamp, by: str = "month") -> pd.Series:
+    # the month / season rollup row date falls in, zeros if nothing happened
+    date = pd.Timestamp(date)
+    if by == "month":
+        rollup, key = ledger.months, date.to_period("M")
+    else:
+        rollup, key = ledger.seasons, season_of(pd.Series([date])).iloc[0]
+    if key in rollup.index:
+        return rollup.loc[key]
+    return pd.Series(
+        [0.0, 0.0, 0.0, 0, balance_at(ledger, date)], index=rollup_columns, name=key
+    )
+
+
+def contributions(
+    ledger: Ledger, players: list, aliases: dict | None = None
+) -> pd.DataFrame:
+    # Money in and out per player on the Players list, for entries whose
+    # description is the player's name (or an alias of it) in any spelling
+    # names.normalize folds together.
+    keys = {names.normalize(player): player for player in players}
+    for alias, player in (aliases or {}).items():
+        keys.setdefault(names.normalize(alias), player)
+    matched = ledger.by_description[ledger.by_description.index.isin(list(keys))]
+    totals = matched.groupby(matched.index.map(keys)).sum()
+    totals = totals.reindex(sorted(players), fill_value=0)
+    totals.index.name = "name"
+    return totals.astype({"entries": int})
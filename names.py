@@ -0,0 +1,156 @@
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+MIN_SIMILARITY = 0.8  # below this a fuzzy match is only a suggestion
+MIN_MARGIN = 0.1  # and the runner-up has to be this far behind
+MIN_SUGGESTION = 0.3
+N_CANDIDATES = 5
+
+resolve_columns = ["input", "name", "score", "exact", "suggestions"]
+
+# Bulgarian streamlined transliteration
+cyrillic_to_latin = str.maketrans(
+    {
+        "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ж": "zh",
+        "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m", "н": "n",
+        "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f",
+        "х": "h", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "sht", "ъ": "a",
+        "ь": "y", "ю": "yu", "я": "ya", "ё": "yo", "э": "e", "ы": "y", "і": "i",
+        "ї": "yi", "є": "ye",
+    }
+)  # fmt: skip
+
+
+def normalize(name: str) -> str:
+    # casefold, Cyrillic -> Latin, accents and punctuation dropped, single spaces
+    name = unicodedata.normalize("NFKC", str(name)).casefold()
+    name = name.translate(cyrillic_to_latin)
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(char for char in name if not unicodedata.combining(char))
+    return " ".join(re.sub(r"[^\w\s]", " ", name).split())
+
+
+def parse_roster(text: str) -> list:
+    # one player per line, numbering ("1.", "2)") and bullets removed
+    lines = (re.sub(r"^\s*(\d+[.)]?|[-*•])\s*", "", line) for line in text.split("\n"))
+    return [line.strip() for line in lines if line.strip()]
+
+
+def trigrams(key: str) -> set:
+    padded = f"  {key} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def _sorted_words(key: str) -> str:
+    return " ".join(sorted(key.split()))
+
+
+def edit_distance(a: str, b: str) -> int:
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (char_a != char_b),
+                )
+            )
+        previous = current
+    return previous[-1]
+
+
+class NameIndex:
+    # Canonical player names by normalized key, explicit aliases, and each
+    # name's first/last word where that word belongs to one player only. Fuzzy
+    # lookups go through a key x trigram sparse matrix: one product scores a
+    # whole roster against every key, the best few are re-ranked by edit
+    # distance.
+
+    def __init__(self, names: list, aliases: dict | None = None):
+        self.names = sorted({str(name) for name in names})
+        exact: dict = {}
+        for name in self.names:
+            exact.setdefault(normalize(name), set()).add(name)
+            exact.setdefault(_sorted_words(normalize(name)), set()).add(name)
+        for alias, name in (aliases or {}).items():
+            exact.setdefault(normalize(alias), set()).add(name)
+        words: dict = {}
+        for name in self.names:
+            parts = normalize(name).split()
+            for word in {parts[0], parts[-1]} if len(parts) > 1 else ():
+                words.setdefault(word, set()).add(name)
+        for word, owners in words.items():
+            if len(owners) == 1 and word not in exact:
+                exact[word] = owners
+        self.exact = exact
+
+        self.keys = list(exact)
+        vocabulary: dict = {}
+        rows, cols = [], []
+        for row, key in enumerate(self.keys):
+            for gram in trigrams(key):
+                rows.append(row)
+                cols.append(vocabulary.setdefault(gram, len(vocabulary)))
+        self.vocabulary = vocabulary
+        self.matrix = sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, cols)), shape=(len(self.keys), len(vocabulary))
+        )
+        self.sizes = np.asarray(self.matrix.sum(axis=1)).ravel()
+
+    def _query_matrix(self, keys: list) -> sparse.csr_matrix:
+        rows, cols = [], []
+        for row, key in enumerate(keys):
+            for gram in trigrams(key):
+                if gram in self.vocabulary:
+                    rows.append(row)
+                    cols.append(self.vocabulary[gram])
+        return sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, cols)),
+            shape=(len(keys), len(self.vocabulary)),
+        )
+
+    def resolve(self, lines: list) -> pd.DataFrame:
+        # name is set for confident matches only; suggestions lists the closest
+        # names for everything that was not an exact hit.
+        keys = [normalize(line) for line in lines]
+        overlap = (self._query_matrix(keys) @ self.matrix.T).toarray()
+        query_sizes = np.array([len(trigrams(key)) for key in keys])
+        dice = 2 * overlap / (query_sizes[:, None] + self.sizes[None, :])
+        top = np.argsort(-dice, axis=1, kind="stable")[:, :N_CANDIDATES]
+
+        results: list = []
+        for row, (line, key, candidates) in enumerate(zip(lines, keys, top)):
+            owners = self.exact.get(key) or self.exact.get(_sorted_words(key), set())
+            if len(owners) == 1:
+                results.append((line, next(iter(owners)), 1.0, True, []))
+                continue
+            scored: dict = {}
+            for candidate in candidates[dice[row, candidates] > 0]:
+                other = self.keys[candidate]
+                similarity = 1 - edit_distance(key, other) / max(len(key), len(other))
+                for name in self.exact[other]:
+                    scored[name] = max(scored.get(name, 0.0), similarity)
+            ranked = sorted(scored.items(), key=lambda item: (-item[1], item[0]))
+            best, score = ranked[0] if ranked else (None, 0.0)
+            runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+            confident = (
+                not owners
+                and score >= MIN_SIMILARITY
+                and score - runner_up >= MIN_MARGIN
+            )
+            results.append(
+                (
+                    line,
+                    best if confident else None,
+                    score,
+                    False,
+                    [name for name, sim in ranked[:3] if sim >= MIN_SUGGESTION],
+                )
+            )
+        return pd.DataFrame(results, columns=resolve_columns)
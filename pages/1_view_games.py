@@ -1,14 +1,20 @@
-import random
-
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import seaborn as sns
 import streamlit as st
 from matplotlib import colormaps
-from mplsoccer import Pitch, Sbopen, VerticalPitch
+from mplsoccer import Pitch, VerticalPitch
 
+import cache
+import density
+import figures
+import profiling
+import services
 import utils
+import warmup
+
+profiling.page("view_games")
 
 st.set_page_config(layout="wide")
 st.markdown(
@@ -27,7 +33,9 @@ st.markdown(
     """,
     unsafe_allow_html=True,
 )
-conn = utils.get_gsheet_connection()
+conn = utils.get_connection()
+utils.show_sync_status()
+warmup.get_warmup()
 match_data = utils.get_match_data(conn)
 
 
@@ -61,41 +69,8 @@ with team_b:
         st.write(f"{r['name']} {'⚽' * int(r['goals'])} {'🅰️' * int(r['assists'])}")
 
 # Pretty graphs bit
-parser = Sbopen(dataframe=True)
-
-
-@st.cache_data
-def get_match_stats(
-    match_id: int,
-) -> tuple[pd.DataFrame, pd.DataFrame | None, pd.DataFrame, pd.DataFrame]:
-    return parser.event(match_id)  # type: ignore
-
-
-@st.cache_data
-def get_matches(competition_id: int, season_id: int) -> pd.DataFrame:
-    return parser.match(competition_id=competition_id, season_id=season_id)  # type: ignore
-
-
-@st.cache_data
-def get_competitions() -> pd.DataFrame:
-    return parser.competition()
-
-
-comps = get_competitions()
-comps_to_select = (
-    comps.query('competition_gender == "male" and not competition_youth')
-    .sort_values("match_available")
-    .iloc[:60]
-)
-random.seed(int(match_date))
-comp_id = random.choice(comps_to_select.index)
-matches = get_matches(
-    competition_id=comps_to_select.at[comp_id, "competition_id"],
-    season_id=comps_to_select.at[comp_id, "season_id"],
-)
-match_id = random.choice(matches["match_id"])
-
-match_stats, related, freeze, tactics = get_match_stats(match_id)
+match_id, match_meta, df_shots = services.featured_match(match_date)
+df_shots = df_shots.copy()
 # setup the mplsoccer StatsBomb Pitches
 # note not much padding around the pitch so the marginal axis are tight to the pitch
 # if you are using a different goal type you will need to increase the padding to see the goals
@@ -112,9 +87,6 @@ vertical_pitch = VerticalPitch(
 )
 
 
-# subset the shots
-df_shots = match_stats.query('type_name == "Shot"').copy()
-
 # subset the shots for each team
 team1, team2 = df_shots.team_name.unique()
 shots_team1 = df_shots[df_shots.team_name == team1].copy()
@@ -130,58 +102,55 @@ blue = colormaps.get_cmap("Blues")(np.linspace(0, 1, 100))[60]
 shots_team1["x"] = pitch.dim.right - shots_team1.x
 
 
-pitch_fig, pitch_axes = pitch.jointgrid(
-    figheight=10,
-    left=None,
-    bottom=0.075,
-    grid_height=0.8,
-    axis=False,  # turn off title/ endnote/ marginal axes
-    # plot without endnote/ title axes
-    title_height=0,
-    endnote_height=0,
-)
-# increase number of levels for a smoother looking heatmap
-kde1 = pitch.kdeplot(
-    shots_team1.x,
-    shots_team1.y,
-    ax=pitch_axes["pitch"],
-    cmap="Reds",
-    levels=75,
-    fill=True,
-)
-kde2 = pitch.kdeplot(
-    shots_team2.x,
-    shots_team2.y,
-    ax=pitch_axes["pitch"],
-    cmap="Blues",
-    levels=75,
-    fill=True,
-)
-# kdeplot on marginal axes
-team1_hist_y = sns.kdeplot(y=shots_team1.y, ax=pitch_axes["left"], color=red, fill=True)
-team1_hist_x = sns.kdeplot(x=shots_team1.x, ax=pitch_axes["top"], color=red, fill=True)
-team2_hist_x = sns.kdeplot(x=shots_team2.x, ax=pitch_axes["top"], color=blue, fill=True)
-team2_hist_y = sns.kdeplot(
-    y=shots_team2.y, ax=pitch_axes["right"], color=blue, fill=True
-)
-txt1 = pitch_axes["pitch"].text(
-    x=15,
-    y=70,
-    s="Ягодка",
-    color=red,
-    ha="center",
-    va="center",
-    fontsize=30,
-)
-txt2 = pitch_axes["pitch"].text(
-    x=105,
-    y=70,
-    s="Черешка",
-    color=blue,
-    ha="center",
-    va="center",
-    fontsize=30,
-)
+@cache.cached("statsbomb")
+def get_shot_densities(
+    match_id: int, _shots_team1: pd.DataFrame, _shots_team2: pd.DataFrame
+) -> tuple[density.ShotDensity, density.ShotDensity]:
+    return density.shot_density(_shots_team1), density.shot_density(_shots_team2)
+
+
+def draw_shot_pitch():
+    pitch_fig, pitch_axes = pitch.jointgrid(
+        figheight=10,
+        left=None,
+        bottom=0.075,
+        grid_height=0.8,
+        axis=False,  # turn off title/ endnote/ marginal axes
+        # plot without endnote/ title axes
+        title_height=0,
+        endnote_height=0,
+    )
+    # contours and marginals come from the precomputed grid densities
+    density1, density2 = get_shot_densities(match_id, shots_team1, shots_team2)
+    density.plot_density(pitch_axes["pitch"], density1, cmap="Reds")
+    density.plot_density(pitch_axes["pitch"], density2, cmap="Blues")
+    density.plot_marginal(
+        pitch_axes["left"], density1.ys, density1.marginal_y, red, vertical=True
+    )
+    density.plot_marginal(pitch_axes["top"], density1.xs, density1.marginal_x, red)
+    density.plot_marginal(pitch_axes["top"], density2.xs, density2.marginal_x, blue)
+    density.plot_marginal(
+        pitch_axes["right"], density2.ys, density2.marginal_y, blue, vertical=True
+    )
+    pitch_axes["pitch"].text(
+        x=15,
+        y=70,
+        s="Ягодка",
+        color=red,
+        ha="center",
+        va="center",
+        fontsize=30,
+    )
+    pitch_axes["pitch"].text(
+        x=105,
+        y=70,
+        s="Черешка",
+        color=blue,
+        ha="center",
+        va="center",
+        fontsize=30,
+    )
+    return pitch_fig
 
 
 def create_statistics(shot_df):
@@ -205,40 +174,47 @@ def create_statistics(shot_df):
     return team_stats
 
 
-st.header("Изстрели")
-st.write(pitch_fig)
-
-home_stats = create_statistics(shots_team1)
-away_stats = create_statistics(shots_team2)
-stats_fig, stats_axes = plt.subplots(figsize=(10, 5), ncols=2, sharey=True)
-stats_fig.tight_layout()
-labels = tuple(home_stats.keys())
+def draw_shot_stats():
+    home_stats = create_statistics(shots_team1)
+    away_stats = create_statistics(shots_team2)
+    stats_fig, stats_axes = plt.subplots(figsize=(10, 5), ncols=2, sharey=True)
+    stats_fig.tight_layout()
+    labels = tuple(home_stats.keys())
 
+    stats_axes[0].invert_xaxis()
+    stats_axes[0].yaxis.tick_left()
 
-stats_axes[0].invert_xaxis()
-stats_axes[0].yaxis.tick_left()
+    for data, ax, colour, name in zip(
+        [home_stats, away_stats], stats_axes, [red, blue], ["Ягодка", "Черешка"]
+    ):
+        ax.barh(labels, data.values(), align="center", color=colour, zorder=10)
+        ax.set_title(name, fontsize=18, pad=15, color=colour)
+        ax.bar_label(ax.containers[0], fontsize=15, color=colour)
+        # ax.set(xticklabels=[])
+        ax.tick_params(bottom=False, left=False, labelbottom=False)
+        for label in ax.get_yticklabels():
+            label.set(fontsize=13)
+        ax.set_facecolor("white")
+    sns.despine(stats_fig, left=True, bottom=True)
+    stats_axes[0].set(yticks=labels, yticklabels=labels)
 
-for data, ax, colour, name in zip(
-    [home_stats, away_stats], stats_axes, [red, blue], ["Ягодка", "Черешка"]
-):
-    ax.barh(labels, data.values(), align="center", color=colour, zorder=10)
-    ax.set_title(name, fontsize=18, pad=15, color=colour)
-    ax.bar_label(ax.containers[0], fontsize=15, color=colour)
-    # ax.set(xticklabels=[])
-    ax.tick_params(bottom=False, left=False, labelbottom=False)
-    for label in ax.get_yticklabels():
-        label.set(fontsize=13)
-    ax.set_facecolor("white")
-sns.despine(stats_fig, left=True, bottom=True)
-stats_axes[0].set(yticks=labels, yticklabels=labels)
+    stats_fig.subplots_adjust(wspace=0, top=0.85, bottom=0.1, left=0.18, right=0.95)
+    return stats_fig
 
-plt.subplots_adjust(wspace=0, top=0.85, bottom=0.1, left=0.18, right=0.95)
 
+figure_cache = figures.get_figure_cache()
+st.header("Изстрели")
+st.image(
+    figure_cache.render("view_games_pitch_density", str(match_id), draw_shot_pitch),  # type: ignore
+    use_column_width=True,
+)
 
 st.header("Статистика")
-st.write(stats_fig)
+st.image(
+    figure_cache.render("view_games_stats", str(match_id), draw_shot_stats),  # type: ignore
+    use_column_width=True,
+)
 
-match_meta = matches.query(f"match_id == {match_id}").iloc[0]
 st.write(
     f"*Actual game played: {match_meta['home_team_name']} vs {match_meta['away_team_name']}"
     f" on {match_meta['match_date']:%Y-%m-%d} for {match_meta['season_name']} {match_meta['competition_name']}"
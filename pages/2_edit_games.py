@@ -1,7 +1,12 @@
 import pandas as pd
 import streamlit as st
 
+import profiling
+import sheets
 import utils
+import warmup
+
+profiling.page("edit_games")
 
 st.set_page_config(layout="wide")
 st.markdown(
@@ -15,9 +20,11 @@ st.markdown(
     """,
     unsafe_allow_html=True,
 )
-conn = utils.get_gsheet_connection()
-players = utils.get_player_list(conn)
-match_data = utils.get_match_data(conn)
+conn = utils.get_connection()
+utils.show_sync_status()
+warmup.get_warmup()
+sheet_data = utils.load_sheets(conn, ("players", "match_data"))
+players, match_data = sheet_data.players, sheet_data.match_data
 
 
 thursdays = pd.date_range(
@@ -30,6 +37,13 @@ assert match_date is not None, "No match date selected"
 team_a_players, team_b_players = utils.get_players_per_team(
     match_data, pd.to_datetime(match_date)
 )
+# The version the editors below were first rendered from; the upload is
+# rejected if someone else changed the match in the meantime.
+version_key = f"match_version_{match_date}"
+if version_key not in st.session_state:
+    st.session_state[version_key] = utils.match_version(
+        match_data, pd.to_datetime(match_date)
+    )
 team_a, team_b = st.columns(2, gap="medium")
 with st.form("edit_form"):
     with team_a:
@@ -44,7 +58,9 @@ with st.form("edit_form"):
         )
 
         team_a_players_edit = st.data_editor(
-            team_a_players.query('name!="Other"')[["name", "goals", "assists"]],
+            team_a_players.query('name!="Other"')[["name", "goals", "assists"]].astype(
+                {"name": object}
+            ),
             column_config={
                 "name": st.column_config.SelectboxColumn(
                     "Name",
@@ -83,7 +99,9 @@ with st.form("edit_form"):
             label_visibility="collapsed",
         )
         team_b_players_edit = st.data_editor(
-            team_b_players.query('name!="Other"')[["name", "goals", "assists"]],
+            team_b_players.query('name!="Other"')[["name", "goals", "assists"]].astype(
+                {"name": object}
+            ),
             column_config={
                 "name": st.column_config.SelectboxColumn(
                     "Name",
@@ -111,32 +129,44 @@ with st.form("edit_form"):
             key="team_b_editor",
         )
     if st.form_submit_button("Submit", use_container_width=True, type="primary"):
-        if team_a_players_edit["name"].duplicated().any():
-            st.error("Team A contains duplicate players")
-        elif team_b_players_edit["name"].duplicated().any():
-            st.error("Team B contains duplicate players")
-        elif (
-            pd.concat([team_a_players_edit, team_b_players_edit], axis=0)["name"]
-            .duplicated()
-            .any()
-        ):
-            st.error("The same player appears for both teams")
-        elif team_a_score < team_a_players_edit["goals"].sum():
-            "Team A score must be greater than or equal to the sum of goals"
-        elif team_b_score < team_b_players_edit["goals"].sum():
-            "Team B score must be greater than or equal to the sum of goals"
+        team_scores = {"A": team_a_score, "B": team_b_score}
+        edits = {"A": team_a_players_edit, "B": team_b_players_edit}
+        problems = utils.team_sheet_problems(
+            pd.concat(
+                [
+                    edit.assign(
+                        date=pd.Timestamp(match_date),
+                        team=team,
+                        total_goals=team_scores[team],
+                    )
+                    for team, edit in edits.items()
+                ],
+                ignore_index=True,
+            )
+        )
+        if problems:
+            st.error(problems[0])
         else:
             team_sheets = pd.concat(
                 [
                     utils.enrich_team_sheet(
-                        team_a_players_edit, pd.Timestamp(match_date), "A", team_a_score
-                    ).squeeze(),
-                    utils.enrich_team_sheet(
-                        team_b_players_edit, pd.Timestamp(match_date), "B", team_b_score
-                    ).squeeze(),
+                        edit, pd.Timestamp(match_date), team, team_scores[team]
+                    ).squeeze()
+                    for team, edit in edits.items()
                 ],
                 ignore_index=True,
                 axis=0,
             )
-            utils.upload_team_sheet(conn, team_sheets)
-            st.success("Match data updated successfully")
+            try:
+                utils.upload_team_sheet(
+                    conn, team_sheets, st.session_state[version_key]
+                )
+            except sheets.StaleDataError:
+                st.error(
+                    "This match was changed by someone else meanwhile, reload the page"
+                )
+            else:
+                st.success("Match data updated successfully")
+                # rebuild the derived tables for the new data in the background
+                warmup.get_warmup().start("upload")
+            del st.session_state[version_key]
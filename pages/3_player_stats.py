@@ -1,11 +1,13 @@
-import matplotlib.pyplot as plt
-import numpy as np
 import pandas as pd
-import seaborn as sns
 import streamlit as st
-from matplotlib.colors import LinearSegmentedColormap
 
+import figures
+import profiling
+import services
 import utils
+import warmup
+
+profiling.page("player_stats")
 
 st.set_page_config(layout="wide")
 st.markdown(
@@ -19,68 +21,65 @@ st.markdown(
     """,
     unsafe_allow_html=True,
 )
-conn = utils.get_gsheet_connection()
-match_data = utils.get_match_data(conn)
-match_data = utils.get_match_outcome(match_data)
-match_data["sign"] = match_data["sign"].map({"W": 1, "L": -1, "D": 0})
+conn = utils.get_connection()
+utils.show_sync_status()
+warmup.get_warmup()
+match_facts = utils.get_match_facts(utils.get_match_data(conn))
 
-starting_point = st.radio(
-    "Стартова дата",
-    ["since_beginning", "from_2024", "other"],
-    format_func={
-        "since_beginning": "Отначало",
-        "from_2024": "от 2024-та",
-        "other": "Друга",
-    }.get,
-    index=1,
-    horizontal=True,
-)
-match starting_point:
-    case "since_beginning":
-        start_date = match_data["date"].min()
-    case "from_2024":
-        start_date = pd.Timestamp("2024-01-01")
-    case "other":
-        start_date = st.date_input(
-            "Избери начало", pd.Timestamp.now() - pd.DateOffset(months=3)
-        )
-apps_data = (
-    match_data.query("date >= @start_date")
-    .groupby("name")
-    .agg({"date": "count", "goals": "sum"})
-    .query("date > 0 and name != 'Other'")
-)
-st.dataframe(
-    apps_data.sort_values(["date", "goals"], ascending=[False, False]),
-    column_config={
-        "date": st.column_config.NumberColumn("Мачове"),
-        "goals": st.column_config.NumberColumn("Голове"),
-    },
-    use_container_width=True,
-    height=800,
-)
 
-heatmap_data = (
-    match_data.query("date >= @start_date and name != 'Other'")
-    .groupby(["name", "date"])
-    .agg({"sign": "sum"})["sign"]
-    .unstack()
-)
+@services.fragment
+def player_stats():
+    starting_point = st.radio(
+        "Стартова дата",
+        ["since_beginning", "from_2024", "other"],
+        format_func={
+            "since_beginning": "Отначало",
+            "from_2024": "от 2024-та",
+            "other": "Друга",
+        }.get,
+        index=1,
+        horizontal=True,
+    )
+    match starting_point:
+        case "since_beginning":
+            start_date = match_facts.matches.index.min()
+        case "from_2024":
+            start_date = pd.Timestamp("2024-01-01")
+        case "other":
+            start_date = st.date_input(
+                "Избери начало", pd.Timestamp.now() - pd.DateOffset(months=3)
+            )
+    start_date = pd.Timestamp(start_date)
+    st.dataframe(
+        services.appearances(conn, match_facts, start_date),
+        column_config={
+            "apps": st.column_config.NumberColumn("Мачове"),
+            "goals": st.column_config.NumberColumn("Голове"),
+        },
+        use_container_width=True,
+        height=800,
+    )
 
-heatmap_data.index.name = None
-heatmap_data.columns = np.datetime_as_string(heatmap_data.columns, unit="D")
+    heatmap_data = services.heatmap_matrix(match_facts, start_date)
+
+    st.image(
+        figures.get_figure_cache().render(
+            "player_stats_results",
+            match_facts.version,
+            lambda: figures.draw_results_heatmap(heatmap_data),
+            start_date=start_date,
+        ),
+        use_column_width=True,
+    )
+
+    st.header("Рейтинг")
+    timeseries = services.rating_timeseries(match_facts)
+    # defaults from the ratings the chart ends on
+    top_players = timeseries.iloc[-1].drop("Other", errors="ignore").sort_values()
+    selected = st.multiselect(
+        "Играчи", sorted(top_players.index), default=list(top_players.index[-5:])
+    )
+    st.line_chart(timeseries.loc[timeseries.index >= start_date, selected])
 
-fig, ax = plt.subplots(figsize=(20, 10))
-myColors = [(1, 0.5, 0.5), (0.8, 0.8, 0.8), (0.4, 0.8, 0.5)]
-sns.heatmap(
-    heatmap_data,
-    # cmap=sns.cubehelix_palette(start=2, rot=0, dark=0.75, light=1, as_cmap=True),
-    # vmin=0,
-    # vmax=1,
-    cmap=LinearSegmentedColormap.from_list("Custom", myColors, len(myColors)),
-    cbar=False,
-    ax=ax,
-)
-ax.tick_params(bottom=False, left=False)
 
-st.write(fig)
+player_stats()
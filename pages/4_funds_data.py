@@ -1,8 +1,14 @@
-import matplotlib.pyplot as plt
 import seaborn as sns
 import streamlit as st
 
+import figures
+import ledger
+import profiling
+import services
 import utils
+import warmup
+
+profiling.page("funds_data")
 
 sns.set_theme(style="darkgrid")
 st.set_page_config(layout="wide")
@@ -17,48 +23,90 @@ st.markdown(
     """,
     unsafe_allow_html=True,
 )
-conn = utils.get_gsheet_connection()
-funds_data = utils.get_funds(conn).sort_values("date", ascending=True)
+conn = utils.get_connection()
+utils.show_sync_status()
+warmup.get_warmup()
+sheet_data = utils.load_sheets(conn, ("funds", "players", "aliases"))
+funds_ledger = services.funds_ledger(sheet_data.funds)
+days = funds_ledger.days
+
 
-cum_funds_data = funds_data.groupby("date").agg(
-    {
-        "amount": "sum",
-        "description": lambda x: ", ".join(x[x.notnull()].tolist())
-        if x.notnull().any()
-        else "",
-    }
+st.metric(
+    f"Общо събрано (към {days.index[-1]:%d.%m.%Y})",
+    value=f'{int(days["balance"].iloc[-1])} лв.',
+    delta=days["amount"].iloc[-1],
+)
+st.header("Каса")
+st.image(
+    figures.get_figure_cache().render(  # type: ignore
+        "funds",
+        funds_ledger.version,
+        lambda: figures.draw_funds(days),
+    ),
+    use_column_width=True,
 )
-cum_funds_data["amount"] = cum_funds_data["amount"].cumsum()
 
-a4_dims = (20, 10)
-fig, ax = plt.subplots(figsize=a4_dims)
+rollup_config = {
+    "income": st.column_config.NumberColumn("Приходи (лв.)"),
+    "expenses": st.column_config.NumberColumn("Разходи (лв.)"),
+    "net": st.column_config.NumberColumn("Нетно (лв.)"),
+    "entries": st.column_config.NumberColumn("Записи"),
+    "balance": st.column_config.NumberColumn("Наличност (лв.)"),
+}
 
-palette = ["r", "b", "g"]
 
-p1 = sns.lineplot(
-    x="date",
-    y="amount",
-    markers=True,
-    dashes=False,
-    data=cum_funds_data,
-    palette=palette,
+@services.fragment
+def balance_on_date():
+    date, by = st.columns(2)
+    on = date.date_input("Наличност към", value=days.index[-1])
+    period = by.radio(
+        "Период",
+        ["month", "season"],
+        format_func={"month": "Месец", "season": "Сезон"}.get,
+        horizontal=True,
+    )
+    summary = ledger.period_summary(funds_ledger, on, period)
+    balance, income, expenses = st.columns(3)
+    balance.metric(
+        f"Наличност към {on:%d.%m.%Y}",
+        f"{ledger.balance_at(funds_ledger, on):.2f} лв.",
+    )
+    income.metric(f"Приходи ({summary.name})", f'{summary["income"]:.2f} лв.')
+    expenses.metric(f"Разходи ({summary.name})", f'{summary["expenses"]:.2f} лв.')
+
+
+balance_on_date()
+
+months, seasons = st.tabs(["По месеци", "По сезони"])
+monthly = funds_ledger.months.sort_index(ascending=False)
+monthly.index = monthly.index.strftime("%m.%Y")
+months.dataframe(monthly, column_config=rollup_config, use_container_width=True)
+seasons.dataframe(
+    funds_ledger.seasons.sort_index(ascending=False),
+    column_config=rollup_config,
+    use_container_width=True,
 )
-ax.set_ylabel("Сума")
-ax.set_xlabel("Дата")
-st.metric(
-    f"Общо събрано (към {cum_funds_data.index[-1]:%d.%m.%Y})",
-    value=f'{int(cum_funds_data["amount"].iloc[-1])} лв.',
-    delta=cum_funds_data["amount"].diff().iloc[-1],
+
+st.header("Вноски по играчи")
+st.dataframe(
+    ledger.contributions(funds_ledger, sheet_data.players or [], sheet_data.aliases)
+    .query("entries > 0")
+    .sort_values("amount", ascending=False),
+    column_config={
+        "amount": st.column_config.NumberColumn("Сума (лв.)"),
+        "entries": st.column_config.NumberColumn("Записи"),
+    },
+    use_container_width=True,
 )
-st.header("Каса")
-st.write(fig)
+
 st.dataframe(
-    funds_data.sort_values("date", ascending=False),
+    funds_ledger.entries.iloc[::-1],
     hide_index=True,
     use_container_width=True,
     column_config={
         "date": st.column_config.DateColumn("Дата"),
         "amount": st.column_config.NumberColumn("Сума (лв.)"),
         "description": st.column_config.TextColumn("Описание"),
+        "balance": st.column_config.NumberColumn("Наличност (лв.)"),
     },
 )
@@ -1,114 +1,144 @@
-import itertools
-import re
-
-import numpy as np
 import pandas as pd
 import streamlit as st
 
+import chemistry
+import names
+import profiling
+import ratings
+import services
+import simulate
+import splits
 import utils
+import warmup
 
+RECENT_MATCHES = 10
+HALF_LIFE_DAYS = 180
 
-def get_player_outcome_summary(md):
-    outcome_summary = (
-        md.groupby("name")["sign"]
-        .value_counts()
-        .unstack()
-        .fillna(0)
-        .astype(int)
-        .drop("Other")
-        .sort_values(["W", "D"], ascending=False)
-    )[["W", "D", "L"]]
-    outcome_summary["Win %"] = outcome_summary["W"] / outcome_summary.sum(axis=1)
-    return outcome_summary
+profiling.page("split_teams")
+gc = utils.get_connection()
+utils.show_sync_status()
+warmup.get_warmup()
+sheet_data = utils.load_sheets(gc, ("players", "match_data", "aliases"))
+match_facts = utils.get_match_facts(sheet_data.match_data)
+player_ratings = services.player_ratings(match_facts)
 
 
-def calculate_player_ratings(match_data_with_outcomes: pd.DataFrame) -> pd.Series:
-    player_rating = pd.Series(
-        index=match_data_with_outcomes["name"].unique(), data=1500
-    )
-    for dt in match_data_with_outcomes["date"].unique():
-        md_dt = match_data_with_outcomes.query(f'date=="{dt}"').copy()
-        md_dt["rating"] = md_dt["name"].map(player_rating)
-        outcome = md_dt["outcome"].iloc[0]
-        normalized_outcome = 1 / (np.exp(-outcome) + 1)  # sigmoid function
-        team_ratings = md_dt.groupby("team")["rating"].mean().to_dict()
-        team_rating_change = 32 * (
-            normalized_outcome
-            - 1 / (1 + 10 ** ((team_ratings["A"] - team_ratings["B"]) / 400))
+@services.fragment
+def raw_data():
+    if st.checkbox("Show raw data", value=False):
+        st.dataframe(services.outcome_summary(gc, match_facts))
+        # every column from the one rating history
+        history = services.rating_history(match_facts)
+        st.dataframe(
+            pd.DataFrame(
+                {
+                    "rating": ratings.ratings_at(history),
+                    f"last {RECENT_MATCHES}": ratings.rolling_ratings(
+                        history, RECENT_MATCHES
+                    ),
+                    "decayed": ratings.decayed_ratings(history, HALF_LIFE_DAYS),
+                }
+            ).sort_values("rating")
         )
 
-        for i, r in md_dt.iterrows():
-            sign_of_change = ((r["team"] == "A") - 0.5) * 2
-            player_rating[r["name"]] += sign_of_change * team_rating_change
-    return player_rating.sort_values()
-
 
-gc = utils.get_gsheet_connection()
-md = utils.get_match_data(gc)
-match_data_with_outcomes = utils.get_match_outcome(md)
-player_ratings = calculate_player_ratings(match_data_with_outcomes)
-if st.checkbox("Show raw data", value=False):
-    st.dataframe(get_player_outcome_summary(match_data_with_outcomes))
-    st.dataframe(player_ratings)
+raw_data()
 
 
-def split_teams(list_of_players: list, player_ratings: pd.Series) -> pd.Series:
-    try:
-        players_to_choose_from = player_ratings.loc[list_of_players].copy()
-    except KeyError:
-        missing_players = set(list_of_players).difference(set(player_ratings.index))
+def split_teams(
+    list_of_players: list,
+    features: pd.DataFrame,
+    together: pd.DataFrame,
+    weights: dict,
+) -> pd.DataFrame:
+    missing_players = set(list_of_players).difference(set(features.index))
+    if missing_players:
         st.write(f"These are missing {missing_players}")
-        return pd.Series(dtype = int)
-    results = dict()
-    for team_split in range(2**11):
-        if team_split.bit_count() == 6:
-            results[team_split] = abs(
-                (
-                    players_to_choose_from
-                    * np.array(list(str(bin(team_split))[2:].zfill(12))).astype(int)
-                ).mean()
-                * 2
-                - players_to_choose_from.mean()
-            )
-    return pd.Series(results).sort_values()
+        return pd.DataFrame(columns=splits.balanced_columns)
+    with profiling.stage("balanced_splits") as current:
+        current.rows = len(list_of_players)
+        return splits.balanced_splits(
+            features.loc[list_of_players],
+            together.loc[list_of_players, list_of_players].to_numpy(),
+            weights,
+            k=3,
+            synergy=chemistry.pair_synergy(
+                services.pair_chemistry(match_facts), list_of_players
+            ),
+        )
 
 
-with st.form("split_teams"):
-    player_list_raw = st.text_area("Enter 12 players")
-    if st.form_submit_button("Split teams"):
-        player_list = player_list_raw.split("\n")
-        player_list = list(map(lambda t: re.sub("^\d+\. ", "", t).strip(), player_list))
-        team_splits = split_teams(player_list, player_ratings)
-        for team_split, score in team_splits.iloc[:3].items():
-            st.write(f"Score: {score*1000:.4f}")
-            col1, col2 = st.columns(2)
-            with col1:
-                st.write(
-                    sorted(
-                        list(
-                            itertools.compress(
-                                player_list,
-                                list(
-                                    np.array(
-                                        list(str(bin(team_split))[2:].zfill(12))  # type: ignore
-                                    ).astype(bool)
-                                ),
-                            )
-                        )
-                    )
+@services.fragment
+def split_form():
+    features, together = services.split_features(match_facts)
+    index = services.name_index(sheet_data.players, match_facts, sheet_data.aliases)
+    with st.form("split_teams"):
+        player_list_raw = st.text_area("Enter players")
+        with st.expander("Balance weights"):
+            weights = {
+                objective: st.slider(label, 0.0, 1.0, default, 0.05)
+                for (objective, default), label in zip(
+                    splits.DEFAULT_WEIGHTS.items(),
+                    [
+                        "Rating",
+                        "Recent form",
+                        "Goals and assists",
+                        "Spread pairs that win together",
+                        "Mix up teammates",
+                    ],
                 )
-            with col2:
-                st.write(
-                    sorted(
-                        list(
-                            itertools.compress(
-                                player_list,
-                                list(
-                                    ~np.array(
-                                        list(str(bin(team_split))[2:].zfill(12))  # type: ignore
-                                    ).astype(bool)
-                                ),
-                            )
-                        )
+            }
+        if st.form_submit_button("Split teams"):
+            resolved = index.resolve(names.parse_roster(player_list_raw))
+            unresolved = resolved[resolved["name"].isnull()]
+            for _, row in unresolved.iterrows():
+                suggestions = ", ".join(row["suggestions"]) or "no close names"
+                st.warning(f"Who is '{row['input']}'? Closest: {suggestions}")
+            for _, row in resolved.query("name.notnull() and ~exact").iterrows():
+                st.caption(f"Read '{row['input']}' as {row['name']}")
+            named = resolved.dropna(subset=["name"])
+            repeated = named[named.duplicated("name", keep=False)]
+            for name, lines in repeated.groupby("name", sort=False)["input"]:
+                quoted = " and ".join(f"'{line}'" for line in lines)
+                st.warning(f"{quoted} both read as {name}, remove one or spell it out")
+            if not unresolved.empty or not repeated.empty:
+                return
+            player_list = named["name"].tolist()
+            team_splits = split_teams(player_list, features, together, weights)
+            with profiling.stage("simulate_splits"):
+                outlook = simulate.simulate_splits(
+                    services.score_model(match_facts),
+                    team_splits,
+                    services.rating_history(match_facts),
+                )
+            for i, team_split in team_splits.iterrows():
+                # the objectives are half the gap between the team averages
+                gap = team_split[["rating", "form", "production"]] * 2
+                if pd.isnull(team_split["form"]):
+                    st.write(f"Rating gap: {gap['rating']:.1f}")
+                    st.caption("Too many players, balanced on rating only")
+                else:
+                    # weighted sum of the gaps below, each scaled by its spread
+                    # among these players: no unit, only for ranking
+                    st.write(f"Imbalance: {team_split['score']:.2f} (lower is fairer)")
+                    st.caption(
+                        f"Rating gap {gap['rating']:.1f},"
+                        f" form gap {gap['form']:.2f},"
+                        f" goals/assists gap {gap['production']:.2f},"
+                        f" chemistry gap {team_split['chemistry']:.0%},"
+                        f" {team_split['together']:.0%} of recent teammates kept together"
                     )
+                st.caption(
+                    f"A wins {outlook.at[i, 'win_a']:.0%},"
+                    f" draw {outlook.at[i, 'draw']:.0%},"
+                    f" B wins {outlook.at[i, 'win_b']:.0%},"
+                    f" expected margin {outlook.at[i, 'margin']:+.1f} goals"
                 )
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.write(sorted(team_split["team_a"]))
+                with col2:
+                    st.write(sorted(team_split["team_b"]))
+
+
+split_form()
@@ -0,0 +1,61 @@
+import streamlit as st
+
+import chemistry
+import profiling
+import services
+import utils
+import warmup
+
+MIN_GAMES = 5
+
+profiling.page("chemistry")
+st.set_page_config(layout="wide")
+conn = utils.get_connection()
+utils.show_sync_status()
+warmup.get_warmup()
+match_facts = utils.get_match_facts(utils.get_match_data(conn))
+pairs = services.pair_chemistry(match_facts)
+
+column_config = {
+    "together": st.column_config.NumberColumn("Together"),
+    "together_wins": st.column_config.NumberColumn("Won together"),
+    "together_win_rate": st.column_config.NumberColumn(
+        "Win rate together", format="%.2f"
+    ),
+    "against": st.column_config.NumberColumn("Against"),
+    "wins": st.column_config.NumberColumn("W"),
+    "draws": st.column_config.NumberColumn("D"),
+    "losses": st.column_config.NumberColumn("L"),
+}
+
+
+@services.fragment
+def player_chemistry():
+    player = st.selectbox("Player", pairs.names)
+    partners = chemistry.pair_table(pairs, player)
+    st.dataframe(
+        partners.drop(columns="player")
+        .set_index("partner")
+        .sort_values(["together", "against"], ascending=False),
+        column_config=column_config,
+        use_container_width=True,
+    )
+
+
+@services.fragment
+def best_pairs():
+    min_games = st.slider("Minimum games together", 1, 30, MIN_GAMES)
+    table = chemistry.pair_table(pairs)
+    st.dataframe(
+        table[table["together"] >= min_games]
+        .sort_values(["together_win_rate", "together"], ascending=False)
+        .set_index(["player", "partner"]),
+        column_config=column_config,
+        use_container_width=True,
+    )
+
+
+st.subheader("Teammates and opponents")
+player_chemistry()
+st.subheader("Pairs")
+best_pairs()
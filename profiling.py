@@ -0,0 +1,255 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+# FOOTBALL_PROFILE=time records wall time, rows and cache hits per stage;
+# =memory adds peak traced memory (tracemalloc slows everything down a lot).
+# Unset, the decorators hand back the undecorated function and stage() is a
+# shared no-op.
+MODE = os.environ.get("FOOTBALL_PROFILE", "off")
+ENABLED = MODE in ("time", "memory")
+TRACE_MEMORY = MODE == "memory"
+
+PROFILE_DIR = Path(__file__).parent / ".cache" / "profile"
+PROFILE_LOG = PROFILE_DIR / "stages.jsonl"
+LOG_MAX_BYTES = 5 * 2**20
+LOG_BACKUPS = 3
+PANEL_RECORDS = 5000  # most recent records the admin panel summarizes
+
+record_columns = [
+    "ts",
+    "run",
+    "page",
+    "stage",
+    "depth",
+    "seconds",
+    "rows",
+    "cache",
+    "peak_bytes",
+]
+
+
+class Stage:
+    # What a stage reports; code inside the stage may set rows and cache.
+    __slots__ = ("name", "rows", "cache", "peak", "depth")
+
+    def __init__(self, name: str, depth: int = 0):
+        self.name = name
+        self.rows: int | None = None
+        self.cache: str | None = None
+        self.peak = 0
+        self.depth = depth
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_null_stage = _NullStage()
+_local = threading.local()
+_logger = None
+_logger_lock = threading.Lock()
+
+
+def _get_logger() -> logging.Logger:
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+            handler = RotatingFileHandler(
+                PROFILE_LOG, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger = logging.getLogger("football.profile")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            logger.addHandler(handler)
+            _logger = logger
+    return _logger
+
+
+def _stack() -> list:
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def new_run() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def page(name: str, run: str | None = None):
+    # Called at the top of a page script: the stages until the next call
+    # belong to one rerun of this page. Worker threads pass the run they
+    # work for.
+    if ENABLED:
+        _local.page = name
+        _local.run = run or new_run()
+
+
+class _Recorder:
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> Stage:
+        stack = _stack()
+        self.stage = Stage(self.name, len(stack))
+        if TRACE_MEMORY:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                # the parent keeps the peak seen so far, this stage starts over
+                stack[-1].peak = max(stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+            self.start_bytes = current
+        stack.append(self.stage)
+        self.started = time.perf_counter()
+        return self.stage
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.started
+        stack = _stack()
+        stack.pop()
+        peak_bytes = None
+        if TRACE_MEMORY:
+            peak = max(self.stage.peak, tracemalloc.get_traced_memory()[1])
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, peak)
+            # tracemalloc is process wide: concurrent reruns blur each other
+            peak_bytes = max(peak - self.start_bytes, 0)
+        record = {
+            "ts": time.time(),
+            "run": getattr(_local, "run", None),
+            "page": getattr(_local, "page", threading.current_thread().name),
+            "stage": self.name,
+            "depth": self.stage.depth,
+            "seconds": seconds,
+            "rows": self.stage.rows,
+            "cache": self.stage.cache,
+            "peak_bytes": peak_bytes,
+        }
+        _get_logger().info(json.dumps(record, default=int))
+        return False
+
+
+def stage(name: str):
+    # with profiling.stage("elo") as s: ...; s.rows = len(frame)
+    return _Recorder(name) if ENABLED else _null_stage
+
+
+def _count_rows(result) -> int | None:
+    if isinstance(result, (pd.DataFrame, pd.Series, np.ndarray, list)):
+        return len(result)
+    return None
+
+
+def profiled(name: str | None = None, cached: bool = False) -> Callable:
+    # Times every call of the function as a stage. cached=True marks calls as
+    # cache hits unless a function decorated with on_miss ran inside them.
+    def decorate(func: Callable) -> Callable:
+        if not ENABLED:
+            return func
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name) as current:
+                if cached:
+                    current.cache = "hit"
+                result = func(*args, **kwargs)
+                if current.rows is None:
+                    current.rows = _count_rows(result)
+                return result
+
+        return wrapper
+
+    return decorate
+
+
+def on_miss(func: Callable) -> Callable:
+    # Goes under @cache.cached: the body only runs on a miss, which it reports
+    # to the enclosing profiled stage.
+    if not ENABLED:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        stack = _stack()
+        if stack:
+            stack[-1].cache = "miss"
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+def read_log(limit: int = PANEL_RECORDS) -> pd.DataFrame:
+    # Most recent records, from the rotated files too when the live one is short.
+    records: deque = deque(maxlen=limit)
+    paths = [
+        PROFILE_LOG.with_name(f"{PROFILE_LOG.name}.{i}")
+        for i in range(LOG_BACKUPS, 0, -1)
+    ]
+    for path in [*paths, PROFILE_LOG]:
+        try:
+            with path.open() as lines:
+                records.extend(lines)
+        except OSError:
+            continue
+    return pd.DataFrame([json.loads(line) for line in records], columns=record_columns)
+
+
+def summarize(records: pd.DataFrame) -> pd.DataFrame:
+    # p50 / p95 wall time per page and stage, with hit rate and typical rows
+    if records.empty:
+        return pd.DataFrame()
+    grouped = records.groupby(["page", "stage"])
+    summary = grouped["seconds"].describe(percentiles=[0.5, 0.95])[
+        ["count", "50%", "95%", "max"]
+    ]
+    summary.columns = ["calls", "p50_s", "p95_s", "max_s"]
+    summary["rows"] = grouped["rows"].median()
+    summary["hit_rate"] = grouped["cache"].agg(
+        lambda cache: (
+            (cache == "hit").sum() / cache.notnull().sum()
+            if cache.notnull().any()
+            else np.nan
+        )
+    )
+    if records["peak_bytes"].notnull().any():
+        summary["p95_peak_bytes"] = grouped["peak_bytes"].quantile(0.95)
+    return summary.sort_values("p95_s", ascending=False)
+
+
+def run_totals(records: pd.DataFrame) -> pd.DataFrame:
+    # per rerun, the time spent in its top-level stages
+    top = records[(records["depth"] == 0) & records["run"].notnull()]
+    totals = top.groupby(["page", "run"]).agg(
+        ts=("ts", "min"), seconds=("seconds", "sum")
+    )
+    return (
+        totals.groupby("page")["seconds"]
+        .describe(percentiles=[0.5, 0.95])[["count", "50%", "95%", "max"]]
+        .set_axis(["reruns", "p50_s", "p95_s", "max_s"], axis=1)
+    )
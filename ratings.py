@@ -0,0 +1,292 @@
+import hashlib
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import profiling
+
+INITIAL_RATING = 1500
+K_FACTOR = 32
+CHECKPOINT_DIR = Path(__file__).parent / ".cache" / "ratings"
+CHECKPOINT_FILE = "checkpoint.parquet"  # history, with the meta in its schema
+
+history_columns = ["date", "name", "rating"]
+
+
+def _kahan_mean(values: list) -> float:
+    # Same compensated summation pandas uses for groupby().mean(), so the
+    # team averages match the old per-date groupby bit for bit.
+    total = compensation = 0.0
+    for value in values:
+        y = value - compensation
+        t = total + y
+        compensation = t - total - y
+        total = t
+    return total / len(values)
+
+
+def _digest(match_data: pd.DataFrame) -> str:
+    hashed = pd.util.hash_pandas_object(
+        match_data[["date", "team", "name", "outcome"]], index=False
+    )
+    return hashlib.sha1(hashed.to_numpy().tobytes()).hexdigest()
+
+
+@profiling.profiled("elo_replay")
+def replay(
+    match_data_with_outcomes: pd.DataFrame, ratings: dict | None = None
+) -> pd.DataFrame:
+    # Dates are replayed in the order match_data_with_outcomes lists them, and
+    # each date's rows have to be next to each other. Returns one row per
+    # player per match with the rating after that match.
+    md = match_data_with_outcomes
+    if md.empty:
+        return pd.DataFrame(columns=history_columns)
+    codes, names = pd.factorize(md["name"])
+    names = np.asarray(names, dtype=object)
+    ratings = ratings or {}
+    current = np.array(
+        [ratings.get(name, INITIAL_RATING) for name in names], dtype=float
+    )
+
+    dates = md["date"].to_numpy()
+    is_a = (md["team"] == "A").to_numpy()
+    sign_of_change = np.where(is_a, 1.0, -1.0)
+    starts = np.r_[0, np.flatnonzero(dates[1:] != dates[:-1]) + 1]
+    stops = np.r_[starts[1:], len(md)]
+    outcome = md["outcome"].to_numpy(dtype=float)[starts]
+    normalized_outcome = 1 / (np.exp(-outcome) + 1)  # sigmoid function
+
+    after = np.empty(len(md))
+    for i, (start, stop) in enumerate(zip(starts, stops)):
+        ids = codes[start:stop]
+        before = current[ids]
+        team_a = _kahan_mean(before[is_a[start:stop]].tolist())
+        team_b = _kahan_mean(before[~is_a[start:stop]].tolist())
+        team_rating_change = K_FACTOR * (
+            normalized_outcome[i] - 1 / (1 + 10 ** ((team_a - team_b) / 400))
+        )
+        # add.at applies repeated ids ("Other" plays for both teams) in row order
+        np.add.at(current, ids, sign_of_change[start:stop] * team_rating_change)
+        after[start:stop] = current[ids]
+
+    history = pd.DataFrame({"date": dates, "name": names[codes], "rating": after})
+    return history.drop_duplicates(["date", "name"], keep="last").reset_index(drop=True)
+
+
+def _load_checkpoint(checkpoint_dir: Path) -> tuple[dict, pd.DataFrame] | None:
+    try:
+        table = pq.read_table(checkpoint_dir / CHECKPOINT_FILE)
+        meta = json.loads(table.schema.metadata[b"checkpoint"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return meta, table.to_pandas()
+
+
+def _save_checkpoint(checkpoint_dir: Path, meta: dict, history: pd.DataFrame):
+    # History and meta go in one file, replaced in one step, so a reader never
+    # sees the meta of one run with the history of another.
+    checkpoint_dir.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(history, preserve_index=False)
+    table = table.replace_schema_metadata(
+        {**table.schema.metadata, b"checkpoint": json.dumps(meta).encode()}
+    )
+    tmp = checkpoint_dir / f"{CHECKPOINT_FILE}.{uuid.uuid4().hex}.tmp"
+    pq.write_table(table, tmp)
+    os.replace(tmp, checkpoint_dir / CHECKPOINT_FILE)
+
+
+def get_rating_history(
+    match_data_with_outcomes: pd.DataFrame, checkpoint_dir: Path | None = CHECKPOINT_DIR
+) -> pd.DataFrame:
+    # Ratings replayed oldest match first, so the history is a time series and a
+    # new match only applies one update on top of the checkpoint.
+    md = match_data_with_outcomes.sort_values("date", kind="stable")
+    checkpoint = _load_checkpoint(checkpoint_dir) if checkpoint_dir else None
+    if checkpoint is not None:
+        meta, history = checkpoint
+        last_date = pd.Timestamp(meta["last_date"])
+        processed = md["date"] <= last_date
+        if _digest(md[processed]) == meta["digest"]:
+            if processed.all():
+                return history
+            ratings = history.groupby("name")["rating"].last().to_dict()
+            history = pd.concat(
+                [history, replay(md[~processed], ratings)], ignore_index=True
+            )
+        else:
+            checkpoint = None
+    if checkpoint is None:
+        history = replay(md)
+    if checkpoint_dir and not md.empty:
+        meta = {"last_date": md["date"].max().isoformat(), "digest": _digest(md)}
+        _save_checkpoint(checkpoint_dir, meta, history)
+    return history
+
+
+def rating_timeseries(history: pd.DataFrame) -> pd.DataFrame:
+    return history.pivot(index="date", columns="name", values="rating").ffill()
+
+
+def final_ratings(history: pd.DataFrame, names) -> pd.Series:
+    names = np.asarray(names, dtype=object)
+    last_rating = history.groupby("name")["rating"].last().reindex(names)
+    return pd.Series(index=names, data=last_rating.to_numpy()).sort_values()
+
+
+def calculate_player_ratings(
+    match_data_with_outcomes: pd.DataFrame, checkpoint_dir: Path | None = CHECKPOINT_DIR
+) -> pd.Series:
+    # Every player's rating after their last match: the end of the same
+    # oldest-first history the charts and point-in-time ratings come from, so
+    # a new match is one update on top of the checkpoint.
+    history = get_rating_history(match_data_with_outcomes, checkpoint_dir)
+    return final_ratings(history, match_data_with_outcomes["name"].unique())
+
+
+class RatingHistory(NamedTuple):
+    # Event log of ratings, grouped by player and in match order within each
+    # player: player i's events are rows offsets[i]:offsets[i + 1]. The search
+    # key player * len(dates) + match is sorted, so point-in-time lookups are
+    # a binary search.
+    names: np.ndarray  # sorted player names, position = player id
+    dates: np.ndarray  # sorted match dates, position = match index
+    offsets: np.ndarray
+    match: np.ndarray  # match index of each event
+    rating: np.ndarray  # rating after the event
+    key: np.ndarray
+
+
+def build_rating_history(history: pd.DataFrame) -> RatingHistory:
+    player, names = pd.factorize(history["name"], sort=True)
+    match, dates = pd.factorize(history["date"], sort=True)
+    key = player.astype(np.int64) * len(dates) + match
+    order = np.argsort(key, kind="stable")
+    offsets = np.searchsorted(player[order], np.arange(len(names) + 1))
+    return RatingHistory(
+        np.asarray(names, dtype=object),
+        np.asarray(dates, dtype="datetime64[ns]"),
+        offsets,
+        match[order],
+        history["rating"].to_numpy(dtype=float)[order],
+        key[order],
+    )
+
+
+def _positions(
+    rating_history: RatingHistory, date=None, before: bool = False
+) -> np.ndarray:
+    # Per player, the last event up to `date` (strictly earlier if before), or
+    # -1 when the player had not played yet.
+    n_dates = len(rating_history.dates)
+    if date is None:
+        cutoff = n_dates
+    else:
+        cutoff = int(
+            np.searchsorted(
+                rating_history.dates,
+                np.datetime64(pd.Timestamp(date), "ns"),
+                side="left" if before else "right",
+            )
+        )
+    players = np.arange(len(rating_history.names), dtype=np.int64)
+    positions = np.searchsorted(rating_history.key, players * n_dates + cutoff) - 1
+    return np.where(positions >= rating_history.offsets[:-1], positions, -1)
+
+
+def _ratings_or_initial(rating_history: RatingHistory, positions: np.ndarray):
+    return np.where(
+        positions >= 0, rating_history.rating[np.maximum(positions, 0)], INITIAL_RATING
+    )
+
+
+def _previous_ratings(rating_history: RatingHistory) -> np.ndarray:
+    # rating going into each event
+    previous = np.r_[INITIAL_RATING, rating_history.rating][:-1]
+    previous[rating_history.offsets[:-1][np.diff(rating_history.offsets) > 0]] = (
+        INITIAL_RATING
+    )
+    return previous
+
+
+def pre_match_ratings(rating_history: RatingHistory) -> pd.DataFrame:
+    # one row per player per match with the rating they brought into it
+    player = np.repeat(
+        np.arange(len(rating_history.names)), np.diff(rating_history.offsets)
+    )
+    return pd.DataFrame(
+        {
+            "date": rating_history.dates[rating_history.match],
+            "name": rating_history.names[player],
+            "rating": _previous_ratings(rating_history),
+        },
+        columns=history_columns,
+    )
+
+
+def rating_at(
+    rating_history: RatingHistory, name: str, date, before: bool = True
+) -> float:
+    # Rating going into (before=True) or coming out of the match on `date`.
+    player = np.searchsorted(rating_history.names, name)
+    if player == len(rating_history.names) or rating_history.names[player] != name:
+        return INITIAL_RATING
+    start, stop = rating_history.offsets[player : player + 2]
+    cutoff = np.searchsorted(
+        rating_history.dates,
+        np.datetime64(pd.Timestamp(date), "ns"),
+        "left" if before else "right",
+    )
+    position = start + np.searchsorted(rating_history.match[start:stop], cutoff) - 1
+    return rating_history.rating[position] if position >= start else INITIAL_RATING
+
+
+def ratings_at(
+    rating_history: RatingHistory, date=None, before: bool = False
+) -> pd.Series:
+    positions = _positions(rating_history, date, before)
+    return pd.Series(
+        _ratings_or_initial(rating_history, positions), index=rating_history.names
+    )
+
+
+def rolling_ratings(
+    rating_history: RatingHistory, n_matches: int, date=None, before: bool = False
+) -> pd.Series:
+    # INITIAL_RATING plus only the changes from each player's last n_matches.
+    positions = _positions(rating_history, date, before)
+    window_start = positions - n_matches
+    window_start[window_start < rating_history.offsets[:-1]] = -1
+    change = _ratings_or_initial(rating_history, positions) - _ratings_or_initial(
+        rating_history, window_start
+    )
+    return pd.Series(INITIAL_RATING + change, index=rating_history.names)
+
+
+def decayed_ratings(
+    rating_history: RatingHistory, half_life_days: float, date=None
+) -> pd.Series:
+    # INITIAL_RATING plus every rating change weighted down by its age.
+    player = np.repeat(
+        np.arange(len(rating_history.names)), np.diff(rating_history.offsets)
+    )
+    change = rating_history.rating - _previous_ratings(rating_history)
+    event_dates = rating_history.dates[rating_history.match]
+    as_of = (
+        rating_history.dates[-1]
+        if date is None
+        else np.datetime64(pd.Timestamp(date), "ns")
+    )
+    age_days = (as_of - event_dates) / np.timedelta64(1, "D")
+    weight = np.where(age_days >= 0, 0.5 ** (age_days / half_life_days), 0)
+    decayed = np.bincount(
+        player, weights=change * weight, minlength=len(rating_history.names)
+    )
+    return pd.Series(INITIAL_RATING + decayed, index=rating_history.names)
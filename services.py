@@ -0,0 +1,255 @@
+import hashlib
+import random
+
+import pandas as pd
+import streamlit as st
+from mplsoccer import Sbopen
+from streamlit_gsheets import GSheetsConnection
+
+import cache
+import chemistry
+import facts
+import ledger
+import names
+import profiling
+import ratings
+import sheets
+import shots
+import simulate
+import splits
+import utils
+
+# Cached computations behind the pages. Every function is keyed explicitly on a
+# content version (and its parameters); the frames themselves are passed as
+# underscore arguments so they are never hashed. See cache.py for the
+# namespaces and the memory budget.
+
+# st.fragment reruns only the decorated function on widget changes; the pinned
+# Streamlit predates it, in which case the page reruns whole and the caches
+# below keep that cheap.
+fragment = (
+    getattr(st, "fragment", None)
+    or getattr(st, "experimental_fragment", None)
+    or (lambda func: func)
+)
+
+
+@cache.cached("ratings")
+@profiling.on_miss
+def _rating_events(version: str, _player_matches: pd.DataFrame) -> pd.DataFrame:
+    return ratings.get_rating_history(_player_matches)
+
+
+@cache.cached("ratings")
+@profiling.on_miss
+def _player_ratings(version: str, _player_matches: pd.DataFrame) -> pd.Series:
+    # the end of the cached history, not a replay of its own
+    return ratings.final_ratings(
+        _rating_events(version, _player_matches), _player_matches["name"].unique()
+    )
+
+
+@profiling.profiled(cached=True)
+def player_ratings(match_facts: facts.MatchFacts) -> pd.Series:
+    return _player_ratings(match_facts.version, match_facts.player_matches)
+
+
+@cache.cached("ratings")
+@profiling.on_miss
+def _rating_history(
+    version: str, _player_matches: pd.DataFrame
+) -> ratings.RatingHistory:
+    return ratings.build_rating_history(_rating_events(version, _player_matches))
+
+
+@profiling.profiled(cached=True)
+def rating_history(match_facts: facts.MatchFacts) -> ratings.RatingHistory:
+    return _rating_history(match_facts.version, match_facts.player_matches)
+
+
+@cache.cached("ratings")
+@profiling.on_miss
+def _rating_timeseries(version: str, _player_matches: pd.DataFrame) -> pd.DataFrame:
+    return ratings.rating_timeseries(_rating_events(version, _player_matches))
+
+
+@profiling.profiled(cached=True)
+def rating_timeseries(match_facts: facts.MatchFacts) -> pd.DataFrame:
+    # rating of every player after every match date, carried forward
+    return _rating_timeseries(match_facts.version, match_facts.player_matches)
+
+
+@cache.cached("ratings")
+@profiling.on_miss
+def _score_model(version: str, _match_facts: facts.MatchFacts) -> simulate.ScoreModel:
+    gaps = simulate.rating_gaps(
+        _match_facts.player_matches,
+        _rating_history(version, _match_facts.player_matches),
+    )
+    return simulate.fit_score_model(_match_facts.matches, gaps)
+
+
+@profiling.profiled(cached=True)
+def score_model(match_facts: facts.MatchFacts) -> simulate.ScoreModel:
+    # goals per side given the teams' rating gap, fitted on past scores
+    return _score_model(match_facts.version, match_facts)
+
+
+@cache.cached("derived")
+@profiling.on_miss
+def _chemistry(version: str, _player_matches: pd.DataFrame) -> chemistry.Chemistry:
+    return chemistry.build_chemistry(_player_matches)
+
+
+@profiling.profiled(cached=True)
+def pair_chemistry(match_facts: facts.MatchFacts) -> chemistry.Chemistry:
+    # together / against counts and head-to-head records of every pair
+    return _chemistry(match_facts.version, match_facts.player_matches)
+
+
+@cache.cached("derived")
+@profiling.on_miss
+def _split_features(
+    version: str, _player_matches: pd.DataFrame, _player_ratings: pd.Series
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    features = splits.player_features(_player_matches, _player_ratings)
+    names = list(features.index)
+    together = splits.together_matrix(_player_matches, names)
+    return features, pd.DataFrame(together, index=names, columns=names)
+
+
+@profiling.profiled(cached=True)
+def split_features(match_facts: facts.MatchFacts) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # per-player features and the recent played-together counts for splitting
+    return _split_features(
+        match_facts.version, match_facts.player_matches, player_ratings(match_facts)
+    )
+
+
+@cache.cached("derived")
+@profiling.on_miss
+def _name_index(version: str, _names: list, _aliases: dict) -> names.NameIndex:
+    return names.NameIndex(_names, _aliases)
+
+
+@profiling.profiled(cached=True)
+def name_index(
+    player_list: list, match_facts: facts.MatchFacts, aliases: dict
+) -> names.NameIndex:
+    # everyone on the Players sheet or in a past match, plus the alias sheet
+    known = sorted(
+        set(player_list).union(match_facts.player_matches["name"]) - {"Other"}
+    )
+    version = hashlib.sha1(repr((known, sorted(aliases.items()))).encode()).hexdigest()
+    return _name_index(version, known, aliases)
+
+
+@cache.cached("derived")
+@profiling.on_miss
+def _player_totals(
+    version: str,
+    start_date: pd.Timestamp | None,
+    _conn: GSheetsConnection | sheets.SheetBackend,
+) -> pd.DataFrame:
+    return utils.get_player_totals(_conn, start_date)
+
+
+@profiling.profiled(cached=True)
+def outcome_summary(
+    conn: GSheetsConnection | sheets.SheetBackend, match_facts: facts.MatchFacts
+) -> pd.DataFrame:
+    return facts.outcome_summary(_player_totals(match_facts.version, None, conn))
+
+
+@profiling.profiled(cached=True)
+def appearances(
+    conn: GSheetsConnection | sheets.SheetBackend,
+    match_facts: facts.MatchFacts,
+    start_date: pd.Timestamp,
+) -> pd.DataFrame:
+    totals = _player_totals(match_facts.version, start_date, conn)
+    return (
+        totals[["apps", "goals"]]
+        .query("apps > 0 and name != 'Other'")
+        .sort_values(["apps", "goals"], ascending=[False, False])
+    )
+
+
+@profiling.profiled()
+def heatmap_matrix(
+    match_facts: facts.MatchFacts, start_date: pd.Timestamp
+) -> facts.ResultsMatrix:
+    # A view on the stored matrix, cheap enough to skip caching
+    results = facts.results_since(match_facts.results, start_date)
+    players = results.names != "Other"
+    return facts.ResultsMatrix(
+        results.names[players], results.dates, results.signs[players]
+    )
+
+
+@cache.cached("derived", latest="ledger")
+@profiling.on_miss
+def _funds_ledger(version: str, _funds_data: pd.DataFrame) -> ledger.Ledger:
+    # starts from the last ledger built, so new sheet rows are folded into it
+    return ledger.build_ledger(_funds_data, cache.get_cache().latest("ledger"))
+
+
+@profiling.profiled(cached=True)
+def funds_ledger(funds_data: pd.DataFrame) -> ledger.Ledger:
+    return _funds_ledger(facts.data_version(funds_data), funds_data)
+
+
+statsbomb = Sbopen(dataframe=True)
+
+
+@cache.cached("statsbomb")
+@profiling.on_miss
+def statsbomb_events(
+    match_id: int,
+) -> tuple[pd.DataFrame, pd.DataFrame | None, pd.DataFrame, pd.DataFrame]:
+    return statsbomb.event(match_id)  # type: ignore
+
+
+@cache.cached("statsbomb")
+@profiling.on_miss
+def statsbomb_matches(competition_id: int, season_id: int) -> pd.DataFrame:
+    return statsbomb.match(competition_id=competition_id, season_id=season_id)  # type: ignore
+
+
+@cache.cached("statsbomb")
+@profiling.on_miss
+def statsbomb_competitions() -> pd.DataFrame:
+    return statsbomb.competition()
+
+
+@cache.cached("statsbomb")
+@profiling.on_miss
+def shot_store() -> tuple[pd.DataFrame, pd.DataFrame] | None:
+    return shots.load_store()
+
+
+@profiling.profiled(cached=True)
+def featured_match(match_date) -> tuple[int, pd.Series, pd.DataFrame]:
+    # The StatsBomb match shown for one of our match dates: the same pick for
+    # the same date, from the local shot store when it exists.
+    rng = random.Random(int(match_date))
+    store = shot_store()
+    if store is not None:
+        # prefetched with `python shots.py`, no network needed
+        matches, all_shots = store
+        match_id = rng.choice(matches.index)
+        return (
+            match_id,
+            matches.loc[match_id],
+            shots.match_shots(matches, all_shots, match_id),
+        )
+    comps_to_select = shots.select_competitions(statsbomb_competitions())
+    comp_id = rng.choice(comps_to_select.index)
+    matches = statsbomb_matches(
+        competition_id=comps_to_select.at[comp_id, "competition_id"],
+        season_id=comps_to_select.at[comp_id, "season_id"],
+    )
+    match_id = rng.choice(matches["match_id"])
+    match_meta = matches.query(f"match_id == {match_id}").iloc[0]
+    match_stats, related, freeze, tactics = statsbomb_events(match_id)
+    return match_id, match_meta, shots.extract_shots(match_stats, match_id)
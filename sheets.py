@@ -0,0 +1,306 @@
+import bisect
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+
+import numpy as np
+import pandas as pd
+from gspread.utils import rowcol_to_a1
+from streamlit_gsheets import GSheetsConnection
+
+USER_ENTERED = "USER_ENTERED"
+
+
+class StaleDataError(Exception):
+    pass
+
+
+def to_cells(frame: pd.DataFrame) -> list[list]:
+    # Same representation gspread_dataframe uses for full-sheet writes.
+    frame = frame.astype(object).where(frame.notnull(), "")
+    return [
+        [value if isinstance(value, (int, float, str)) else str(value) for value in row]
+        for row in frame.itertuples(index=False)
+    ]
+
+
+def fingerprint(rows: pd.DataFrame) -> str:
+    # Order-independent digest of one match's rows, comparable between the
+    # typed frame a page was rendered from and the raw cells in the sheet.
+    rows = rows.query("name.notnull() and name != ''")
+    normalized = sorted(
+        zip(
+            rows["team"].astype(str),
+            rows["name"].astype(str),
+            pd.to_numeric(rows["goals"], errors="coerce").fillna(0).astype(int),
+            pd.to_numeric(rows["assists"], errors="coerce").fillna(0).astype(int),
+        )
+    )
+    return hashlib.sha1(repr(normalized).encode()).hexdigest()
+
+
+class SheetBackend(ABC):
+    # Row positions are 0-based and exclude the header row.
+
+    def __init__(self):
+        self._date_index = {}
+        # One backend serves every session thread. The date index and any
+        # read-check-write on the sheet (replace_date_rows, or a caller's full
+        # rewrite) happen under this lock.
+        self.write_lock = threading.RLock()
+
+    @abstractmethod
+    def read(self, worksheet: str, usecols=None, nrows=None) -> pd.DataFrame:
+        raise NotImplementedError
+
+    @abstractmethod
+    def update(self, worksheet: str, data: pd.DataFrame):
+        raise NotImplementedError
+
+    @abstractmethod
+    def header(self, worksheet: str) -> list:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_column(self, worksheet: str, col: int) -> list:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_rows(self, worksheet: str, start: int, stop: int) -> list[list]:
+        # Like the Sheets API, trailing empty rows are not returned.
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_rows(self, worksheet: str, start: int, rows: list[list]):
+        raise NotImplementedError
+
+    @abstractmethod
+    def insert_rows(self, worksheet: str, start: int, rows: list[list]):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_rows(self, worksheet: str, start: int, stop: int):
+        raise NotImplementedError
+
+    def version(self, worksheet: str) -> str | None:
+        return None
+
+    def date_index(self, worksheet: str, refresh: bool = False) -> dict:
+        # date -> (start, stop) row range; dates have to be stored contiguously,
+        # which holds for sheets written by upload_team_sheet (sorted by date).
+        with self.write_lock:
+            if refresh or worksheet not in self._date_index:
+                dates = pd.to_datetime(pd.Series(self.get_column(worksheet, 0)))
+                index: dict = {}
+                for pos, date in enumerate(dates):
+                    if pd.isnull(date):
+                        continue
+                    start, stop = index.get(date, (pos, pos))
+                    if stop != pos:
+                        raise ValueError(f"Rows for {date:%Y-%m-%d} are not contiguous")
+                    index[date] = (start, pos + 1)
+                self._date_index[worksheet] = index
+            return self._date_index[worksheet]
+
+    def _shift_date_index(self, worksheet: str, after: int, delta: int):
+        index = self._date_index[worksheet]
+        for date, (start, stop) in index.items():
+            if start >= after:
+                index[date] = (start + delta, stop + delta)
+
+    def _locate(self, worksheet: str, date: pd.Timestamp) -> tuple[int, int]:
+        index = self.date_index(worksheet)
+        if date in index:
+            return index[date]
+        # new date: keep the sheet sorted newest first
+        starts = sorted((-d.value, start) for d, (start, _) in index.items())
+        pos = bisect.bisect_left(starts, (-date.value, -1))
+        if pos < len(starts):
+            return starts[pos][1], starts[pos][1]
+        return (max((stop for _, stop in index.values()), default=0),) * 2
+
+    def _read_range(self, worksheet: str, date: pd.Timestamp, start: int, stop: int):
+        # One row of context either side confirms the index still matches the sheet.
+        lo = max(start - 1, 0)
+        rows = self.get_rows(worksheet, lo, stop + 1)
+        rows += [[]] * (stop + 1 - lo - len(rows))
+        dates = pd.to_datetime(pd.Series([row[0] if row else None for row in rows]))
+        inside = dates.iloc[start - lo : stop - lo]
+        outside = pd.concat([dates.iloc[: start - lo], dates.iloc[stop - lo :]])
+        if not ((inside == date).all() and not (outside == date).any()):
+            return None
+        return rows[start - lo : stop - lo]
+
+    def replace_date_rows(
+        self,
+        worksheet: str,
+        date: pd.Timestamp,
+        data: pd.DataFrame,
+        expected_version: str | None = None,
+    ):
+        with self.write_lock:
+            self._replace_date_rows(
+                worksheet, pd.Timestamp(date), data, expected_version
+            )
+
+    def _replace_date_rows(
+        self,
+        worksheet: str,
+        date: pd.Timestamp,
+        data: pd.DataFrame,
+        expected_version: str | None,
+    ):
+        start, stop = self._locate(worksheet, date)
+        current = self._read_range(worksheet, date, start, stop)
+        if current is None:
+            # someone else moved rows around since the index was built
+            self.date_index(worksheet, refresh=True)
+            start, stop = self._locate(worksheet, date)
+            current = self._read_range(worksheet, date, start, stop)
+            if current is None:
+                raise StaleDataError(
+                    f"Rows for {date:%Y-%m-%d} moved while saving, try again"
+                )
+        if expected_version is not None:
+            header = self.header(worksheet)
+            current_frame = pd.DataFrame(
+                [row + [""] * (len(header) - len(row)) for row in current],
+                columns=header,
+            )
+            if fingerprint(current_frame) != expected_version:
+                raise StaleDataError(f"Match {date:%Y-%m-%d} was changed meanwhile")
+
+        rows = to_cells(data)
+        extra = len(rows) - (stop - start)
+        if extra > 0:
+            self.insert_rows(worksheet, stop, rows[-extra:])
+            self.update_rows(worksheet, start, rows[:-extra])
+        elif extra < 0:
+            self.delete_rows(worksheet, start + len(rows), stop)
+            self.update_rows(worksheet, start, rows)
+        else:
+            self.update_rows(worksheet, start, rows)
+        if extra:
+            self._shift_date_index(worksheet, stop, extra)
+        if rows:
+            self._date_index[worksheet][date] = (start, start + len(rows))
+        else:
+            self._date_index[worksheet].pop(date, None)
+
+
+class GSheetsBackend(SheetBackend):
+    def __init__(self, conn: GSheetsConnection):
+        super().__init__()
+        self.conn = conn
+        self._worksheets: dict = {}
+        self._headers: dict = {}
+
+    def _worksheet(self, worksheet: str):
+        if worksheet not in self._worksheets:
+            self._worksheets[worksheet] = self.conn.client._select_worksheet(  # type: ignore
+                worksheet=worksheet
+            )
+        return self._worksheets[worksheet]
+
+    def read(self, worksheet: str, usecols=None, nrows=None) -> pd.DataFrame:
+        return self.conn.read(worksheet=worksheet, usecols=usecols, nrows=nrows, ttl=0)
+
+    def update(self, worksheet: str, data: pd.DataFrame):
+        self.conn.update(worksheet=worksheet, data=data)
+        self._date_index.pop(worksheet, None)
+
+    def header(self, worksheet: str) -> list:
+        if worksheet not in self._headers:
+            self._headers[worksheet] = self._worksheet(worksheet).row_values(1)
+        return self._headers[worksheet]
+
+    def get_column(self, worksheet: str, col: int) -> list:
+        return self._worksheet(worksheet).col_values(col + 1)[1:]
+
+    def get_rows(self, worksheet: str, start: int, stop: int) -> list[list]:
+        if stop <= start:
+            return []
+        last = rowcol_to_a1(stop + 1, len(self.header(worksheet)))
+        return self._worksheet(worksheet).get_values(f"A{start + 2}:{last}")
+
+    def update_rows(self, worksheet: str, start: int, rows: list[list]):
+        if rows:
+            self._worksheet(worksheet).update(
+                f"A{start + 2}", rows, value_input_option=USER_ENTERED
+            )
+
+    def insert_rows(self, worksheet: str, start: int, rows: list[list]):
+        self._worksheet(worksheet).insert_rows(
+            rows, row=start + 2, value_input_option=USER_ENTERED
+        )
+
+    def delete_rows(self, worksheet: str, start: int, stop: int):
+        self._worksheet(worksheet).delete_rows(start + 2, stop + 1)
+
+    def version(self, worksheet: str) -> str | None:
+        # Drive's last-modified time changes on any edit, the grid row count on
+        # appends. Public (URL) spreadsheets expose neither.
+        if not hasattr(self.conn.client, "_select_worksheet"):
+            return None
+        sheet = self.conn.client._select_worksheet(worksheet=worksheet)  # type: ignore
+        return f"{sheet.spreadsheet.get_lastUpdateTime()}/{sheet.row_count}"
+
+
+class FakeSheetBackend(SheetBackend):
+    # In-memory stand-in for the spreadsheet, for working offline and in tests.
+
+    def __init__(self, worksheets: dict[str, pd.DataFrame]):
+        super().__init__()
+        self.worksheets = {
+            name: [list(data.columns)] + to_cells(data)
+            for name, data in worksheets.items()
+        }
+        self.cells_written = 0
+        self._versions = dict.fromkeys(self.worksheets, 0)
+
+    def _touch(self, worksheet: str, rows: list[list]):
+        self._versions[worksheet] += 1
+        self.cells_written += sum(map(len, rows))
+
+    def read(self, worksheet: str, usecols=None, nrows=None) -> pd.DataFrame:
+        header, *rows = self.worksheets[worksheet]
+        data = pd.DataFrame(rows[:nrows], columns=header).replace("", np.nan)
+        if usecols is not None:
+            data = data.iloc[:, list(usecols)]
+        return data.apply(pd.to_numeric, errors="ignore")  # type: ignore
+
+    def update(self, worksheet: str, data: pd.DataFrame):
+        rows = to_cells(data)
+        self.worksheets[worksheet] = [list(data.columns)] + rows
+        self._touch(worksheet, rows)
+        self._date_index.pop(worksheet, None)
+
+    def header(self, worksheet: str) -> list:
+        return self.worksheets[worksheet][0]
+
+    def get_column(self, worksheet: str, col: int) -> list:
+        return [
+            row[col] if len(row) > col else "" for row in self.worksheets[worksheet][1:]
+        ]
+
+    def get_rows(self, worksheet: str, start: int, stop: int) -> list[list]:
+        rows = self.worksheets[worksheet][start + 1 : stop + 1]
+        return [list(map(str, row)) for row in rows]
+
+    def update_rows(self, worksheet: str, start: int, rows: list[list]):
+        sheet = self.worksheets[worksheet]
+        sheet.extend([] for _ in range(start + len(rows) + 1 - len(sheet)))
+        sheet[start + 1 : start + len(rows) + 1] = [list(row) for row in rows]
+        self._touch(worksheet, rows)
+
+    def insert_rows(self, worksheet: str, start: int, rows: list[list]):
+        sheet = self.worksheets[worksheet]
+        sheet[start + 1 : start + 1] = [list(row) for row in rows]
+        self._touch(worksheet, rows)
+
+    def delete_rows(self, worksheet: str, start: int, stop: int):
+        del self.worksheets[worksheet][start + 1 : stop + 1]
+        self._touch(worksheet, [])
+
+    def version(self, worksheet: str) -> str | None:
+        return str(self._versions[worksheet])
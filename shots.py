@@ -0,0 +1,109 @@
+import argparse
+import os
+import random
+import uuid
+from pathlib import Path
+
+import pandas as pd
+from mplsoccer import Sbopen
+
+SHOTS_DIR = Path(__file__).parent / ".cache" / "statsbomb"
+
+shot_columns = ["match_id", "team_name", "x", "y", "outcome_name", "shot_statsbomb_xg"]
+match_columns = [
+    "match_id",
+    "home_team_name",
+    "away_team_name",
+    "match_date",
+    "season_name",
+    "competition_name",
+    "home_score",
+    "away_score",
+]
+
+
+def select_competitions(competitions: pd.DataFrame, n: int = 60) -> pd.DataFrame:
+    return (
+        competitions.query('competition_gender == "male" and not competition_youth')
+        .sort_values("match_available")
+        .iloc[:n]
+    )
+
+
+def extract_shots(events: pd.DataFrame, match_id: int) -> pd.DataFrame:
+    shots = events.query('type_name == "Shot"').assign(match_id=match_id)
+    return shots[shot_columns].reset_index(drop=True)
+
+
+def prefetch(
+    n_competitions: int = 60,
+    matches_per_season: int = 5,
+    store: Path = SHOTS_DIR,
+    seed: int = 0,
+):
+    # Pulls a fixed sample of open-data matches once and keeps only their shots;
+    # the full event frames (related, freeze, tactics) are never stored.
+    parser = Sbopen(dataframe=True)
+    rng = random.Random(seed)
+    matches, shots = [], []
+    for _, comp in select_competitions(parser.competition(), n_competitions).iterrows():
+        season = parser.match(
+            competition_id=comp["competition_id"], season_id=comp["season_id"]
+        )
+        sample = season.loc[
+            sorted(rng.sample(list(season.index), min(matches_per_season, len(season))))
+        ]
+        for match_id in sample["match_id"]:
+            events, *_ = parser.event(match_id)
+            shots.append(extract_shots(events, match_id))
+            print(f"{comp['competition_name']} {comp['season_name']}: {match_id}")
+        matches.append(sample[match_columns])
+    write_store(pd.concat(matches, ignore_index=True), pd.concat(shots), store)
+
+
+def write_store(matches: pd.DataFrame, shots: pd.DataFrame, store: Path = SHOTS_DIR):
+    # Shots are stored sorted by match; the match table keeps each match's row
+    # range in the shot file so a lookup is a slice, not a filter.
+    shots = shots.sort_values("match_id", kind="stable").reset_index(drop=True)
+    shots["team_name"] = shots["team_name"].astype("category")
+    shots["outcome_name"] = shots["outcome_name"].astype("category")
+    rows = pd.Series(shots.index, index=shots["match_id"]).groupby(level=0)
+    bounds = rows.agg(["min", "max"])
+    # the pitch plot needs shots from both sides
+    two_sided = shots.groupby("match_id")["team_name"].nunique() == 2
+    matches = matches.set_index("match_id")
+    matches = matches[matches.index.isin(two_sided.index[two_sided])].copy()
+    matches["shot_start"] = bounds["min"]
+    matches["shot_stop"] = bounds["max"] + 1
+    store.mkdir(parents=True, exist_ok=True)
+    for name, data in (("shots", shots), ("matches", matches)):
+        tmp = store / f"{name}.{uuid.uuid4().hex}.tmp"
+        data.to_parquet(tmp)
+        os.replace(tmp, store / f"{name}.parquet")
+
+
+def load_store(store: Path = SHOTS_DIR) -> tuple[pd.DataFrame, pd.DataFrame] | None:
+    try:
+        matches = pd.read_parquet(store / "matches.parquet")
+        shots = pd.read_parquet(store / "shots.parquet")
+    except OSError:
+        return None
+    return matches, shots
+
+
+def match_shots(
+    matches: pd.DataFrame, shots: pd.DataFrame, match_id: int
+) -> pd.DataFrame:
+    start, stop = matches.loc[match_id, ["shot_start", "shot_stop"]]
+    return shots.iloc[start:stop]
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Store the shots of a sample of StatsBomb open-data matches"
+    )
+    arg_parser.add_argument("--competitions", type=int, default=60)
+    arg_parser.add_argument("--matches-per-season", type=int, default=5)
+    arg_parser.add_argument("--store", type=Path, default=SHOTS_DIR)
+    args = arg_parser.parse_args()
+    prefetch(args.competitions, args.matches_per_season, args.store)
@@ -0,0 +1,102 @@
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+import ratings
+
+N_SIMULATIONS = 100_000
+FIT_ITERATIONS = 25
+RATING_SCALE = 400  # Elo points per unit of rating gap in the model
+
+outcome_columns = ["win_a", "draw", "win_b", "margin"]
+
+
+class ScoreModel(NamedTuple):
+    # Each team's goals are Poisson with log mean base + slope * gap for team A
+    # and base - slope * gap for team B, where gap is the difference between
+    # the teams' average ratings in RATING_SCALE units. The goal difference is
+    # then Skellam distributed.
+    base: float
+    slope: float
+
+
+def rating_gaps(
+    player_matches: pd.DataFrame, rating_history: ratings.RatingHistory
+) -> pd.Series:
+    # A's average rating minus B's going into each match, as the Elo update
+    # sees it ("Other" counts for both teams).
+    before = ratings.pre_match_ratings(rating_history)
+    lineups = player_matches[["date", "name", "team"]].astype({"name": object})
+    lineups = lineups.merge(before, on=["date", "name"], how="left")
+    lineups["rating"] = lineups["rating"].fillna(ratings.INITIAL_RATING)
+    team_means = lineups.pivot_table(
+        index="date", columns="team", values="rating", aggfunc="mean", observed=True
+    )
+    return (team_means["A"] - team_means["B"]).rename("gap")
+
+
+def fit_score_model(matches: pd.DataFrame, gaps: pd.Series) -> ScoreModel:
+    # Poisson regression of both teams' goals on the rating gap, by Newton's
+    # method on the two parameters.
+    gap = gaps.reindex(matches.index).fillna(0).to_numpy() / RATING_SCALE
+    goals = np.r_[matches["score_a"], matches["score_b"]].astype(float)
+    if not goals.sum():
+        return ScoreModel(0.0, 0.0)
+    design = np.column_stack([np.ones(len(goals)), np.r_[gap, -gap]])
+    params = np.array([np.log(goals.mean()), 0.0])
+    for _ in range(FIT_ITERATIONS):
+        mean = np.exp(design @ params)
+        step = np.linalg.solve(
+            design.T @ (design * mean[:, None]), design.T @ (goals - mean)
+        )
+        params += step
+        if np.abs(step).max() < 1e-10:
+            break
+    return ScoreModel(*params)
+
+
+def expected_goals(
+    model: ScoreModel, gaps: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    gaps = np.asarray(gaps, dtype=float) / RATING_SCALE
+    return (
+        np.exp(model.base + model.slope * gaps),
+        np.exp(model.base - model.slope * gaps),
+    )
+
+
+def simulate_splits(
+    model: ScoreModel,
+    team_splits: pd.DataFrame,
+    rating_history: ratings.RatingHistory,
+    n_simulations: int = N_SIMULATIONS,
+    seed: int | None = 0,
+) -> pd.DataFrame:
+    # All splits in one batch: a (splits x simulations) draw of goals per side.
+    # Team strength is the average rating, so a side with an extra player is
+    # not credited for it; ratings are the latest in rating_history, the
+    # history the model was fitted on.
+    if team_splits.empty:
+        return pd.DataFrame(columns=outcome_columns)
+    player_ratings = ratings.ratings_at(rating_history)
+    gaps = np.array(
+        [
+            player_ratings[team_a].mean() - player_ratings[team_b].mean()
+            for team_a, team_b in zip(team_splits["team_a"], team_splits["team_b"])
+        ]
+    )
+    goals_a, goals_b = expected_goals(model, gaps)
+    rng = np.random.default_rng(seed)
+    shape = (len(gaps), n_simulations)
+    margin = rng.poisson(goals_a[:, None], shape) - rng.poisson(goals_b[:, None], shape)
+    return pd.DataFrame(
+        {
+            "win_a": (margin > 0).mean(axis=1),
+            "draw": (margin == 0).mean(axis=1),
+            "win_b": (margin < 0).mean(axis=1),
+            "margin": margin.mean(axis=1),
+        },
+        index=team_splits.index,
+        columns=outcome_columns,
+    )
@@ -0,0 +1,260 @@
+import functools
+
+import numpy as np
+import pandas as pd
+
+MAX_EXACT_PLAYERS = 22
+
+split_columns = ["score", "gap", "team_a", "team_b"]
+
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    values = values - ((values >> 1) & 0x55555555)
+    values = (values & 0x33333333) + ((values >> 2) & 0x33333333)
+    values = (values + (values >> 4)) & 0x0F0F0F0F
+    return (values * 0x01010101 & 0xFFFFFFFF) >> 24
+
+
+@functools.lru_cache(maxsize=None)
+def team_a_masks(n_players: int) -> np.ndarray:
+    # Every possible team A as an int8 row of 0/1 per player. Player 0 is always
+    # on team A, which drops the mirrored A/B duplicates. For an odd roster team
+    # A can be the side with or without the extra (sub) player.
+    rest = np.arange(2 ** (n_players - 1), dtype=np.uint32)
+    team_sizes = np.unique([n_players // 2, (n_players + 1) // 2])
+    rest = rest[np.isin(_popcount(rest), team_sizes - 1)]
+    bits = (rest[:, None] >> np.arange(n_players - 1, dtype=np.uint32)) & 1
+    masks = np.hstack([np.ones((len(rest), 1), dtype=np.int8), bits.astype(np.int8)])
+    masks.flags.writeable = False
+    return masks
+
+
+def _scores(sum_a, size_a, total, n_players):
+    # Half the gap between the average ratings of the two teams; for equal team
+    # sizes this is |sum A - sum B| / n, the measure the page has always shown.
+    return np.abs(sum_a / size_a - (total - sum_a) / (n_players - size_a)) / 2
+
+
+def _to_frame(masks: np.ndarray, scores, gaps, names) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "score": scores,
+            "gap": gaps,
+            "team_a": [list(names[mask]) for mask in masks],
+            "team_b": [list(names[~mask]) for mask in masks],
+        },
+        columns=split_columns,
+    )
+
+
+def _exact_splits(ratings: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    masks = team_a_masks(len(ratings))
+    scores = _scores(masks @ ratings, masks.sum(axis=1), ratings.sum(), len(ratings))
+    k = min(k, len(scores))
+    best = np.argpartition(scores, k - 1)[:k]
+    best = best[np.argsort(scores[best], kind="stable")]
+    return masks[best].astype(bool), scores[best]
+
+
+def _heuristic_splits(ratings: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    # Pairwise differencing: walk the roster from the strongest player down in
+    # pairs and hand the stronger of each pair to the currently weaker team,
+    # then improve with best single swaps until none helps.
+    n_players = len(ratings)
+    order = np.argsort(-ratings, kind="stable")
+    in_a = np.zeros(n_players, dtype=bool)
+    sum_a = sum_b = 0.0
+    for hi, lo in zip(order[0::2], order[1::2]):
+        to_a, to_b = (hi, lo) if sum_a <= sum_b else (lo, hi)
+        in_a[to_a] = True
+        sum_a += ratings[to_a]
+        sum_b += ratings[to_b]
+    if n_players % 2:
+        in_a[order[-1]] = sum_a <= sum_b
+    total = ratings.sum()
+    size_a = in_a.sum()
+
+    while True:
+        a, b = np.flatnonzero(in_a), np.flatnonzero(~in_a)
+        swap = ratings[b][None, :] - ratings[a][:, None]
+        swap_scores = _scores(ratings[a].sum() + swap, size_a, total, n_players)
+        best = np.unravel_index(np.argmin(swap_scores), swap_scores.shape)
+        current = _scores(ratings[a].sum(), size_a, total, n_players)
+        if swap_scores[best] >= current:
+            break
+        in_a[a[best[0]]], in_a[b[best[1]]] = False, True
+
+    # the local optimum plus its best single-swap neighbours
+    flat = np.argsort(swap_scores, axis=None, kind="stable")[: max(k - 1, 0)]
+    neighbours, scores = [in_a.copy()], [current]
+    for i, j in zip(*np.unravel_index(flat, swap_scores.shape)):
+        mask = in_a.copy()
+        mask[a[i]], mask[b[j]] = False, True
+        neighbours.append(mask)
+        scores.append(swap_scores[i, j])
+    masks = np.array(neighbours)
+    masks[~masks[:, 0]] = ~masks[~masks[:, 0]]
+    return masks, np.array(scores)
+
+
+def best_splits(player_ratings: pd.Series, k: int = 3) -> pd.DataFrame:
+    names = player_ratings.index.to_numpy()
+    ratings = player_ratings.to_numpy(dtype=float)
+    if len(ratings) < 2:
+        return pd.DataFrame(columns=split_columns)
+    if len(ratings) <= MAX_EXACT_PLAYERS:
+        masks, scores = _exact_splits(ratings, k)
+        gaps = np.zeros(len(scores))
+    else:
+        masks, scores = _heuristic_splits(ratings, k)
+        # no useful lower bound on the optimum here, so the gap is unknown
+        gaps = np.full(len(scores), np.nan)
+    return _to_frame(masks, scores, gaps, names)
+
+
+PARETO_BLOCK = 256  # candidates compared against each other at once
+FORM_MATCHES = 10  # a player's last appearances that count as recent form
+TOGETHER_MATCHES = 8  # last match dates checked for repeated pairings
+
+feature_columns = ["rating", "form", "production"]
+objective_columns = [*feature_columns, "chemistry", "together"]
+balanced_columns = ["score", "pareto", *objective_columns, "team_a", "team_b"]
+DEFAULT_WEIGHTS = {
+    "rating": 1.0,
+    "form": 0.5,
+    "production": 0.5,
+    "chemistry": 0.25,
+    "together": 0.25,
+}
+
+
+def player_features(
+    player_matches: pd.DataFrame,
+    player_ratings: pd.Series,
+    form_matches: int = FORM_MATCHES,
+) -> pd.DataFrame:
+    # rating: Elo; form: mean 1 / 0 / -1 result over the player's last
+    # form_matches games; production: goals + assists per game.
+    played = player_matches[player_matches["name"] != "Other"]
+    by_name = played.groupby("name", observed=True, sort=False)
+    recent = played[by_name.cumcount(ascending=False) < form_matches]
+    form = recent.groupby("name", observed=True)["sign"].mean()
+    production = (
+        (played["goals"] + played["assists"])
+        .groupby(played["name"], observed=True)
+        .mean()
+    )
+    features = pd.DataFrame({"rating": player_ratings.astype(float)})
+    features["form"] = form.reindex(features.index, fill_value=0).to_numpy()
+    features["production"] = production.reindex(features.index, fill_value=0).to_numpy()
+    return features
+
+
+def together_matrix(
+    player_matches: pd.DataFrame, names: list, recent_dates: int = TOGETHER_MATCHES
+) -> np.ndarray:
+    # Number of the last recent_dates matches each pair of players spent on
+    # the same team.
+    dates = np.sort(player_matches["date"].unique())[-recent_dates:]
+    recent = player_matches[player_matches["date"].isin(dates)]
+    side = (
+        recent.assign(side=np.where(recent["team"] == "A", 1, -1))
+        .pivot_table(
+            index="date", columns="name", values="side", aggfunc="first", observed=True
+        )
+        .reindex(columns=names)
+        .fillna(0)
+        .to_numpy()
+    )
+    present = np.abs(side)
+    together = (side.T @ side + present.T @ present) / 2
+    np.fill_diagonal(together, 0)
+    return together
+
+
+def _within_team(masks: np.ndarray, pairs: np.ndarray) -> np.ndarray:
+    # sum of pairs[i, j] over the pairs inside team A and inside team B
+    sides = 2 * masks.astype(np.float64) - 1
+    return (pairs.sum() + ((sides @ pairs) * sides).sum(axis=1)) / 4
+
+
+def _objectives(
+    masks: np.ndarray,
+    features: np.ndarray,
+    together: np.ndarray | None,
+    synergy: np.ndarray | None = None,
+) -> np.ndarray:
+    # One row per candidate team A: the half-gap between team averages for each
+    # feature, the difference in pair synergy inside the two teams as a share
+    # of all synergy, then the share of recent same-team pairings kept together.
+    n_players = masks.shape[1]
+    size_a = masks.sum(axis=1)[:, None]
+    gaps = _scores(masks @ features, size_a, features.sum(axis=0), n_players)
+    chemistry = np.zeros(len(masks))
+    if synergy is not None and synergy.any():
+        in_a = ((masks @ synergy) * masks).sum(axis=1) / 2
+        in_b = _within_team(masks, synergy) - in_a
+        chemistry = np.abs(in_a - in_b) / (np.abs(synergy).sum() / 2)
+    kept = np.zeros(len(masks))
+    if together is not None and together.any():
+        kept = _within_team(masks, together) / (together.sum() / 2)
+    return np.hstack([gaps, chemistry[:, None], kept[:, None]])
+
+
+def _pareto_order(objectives: np.ndarray, scores: np.ndarray, k: int) -> tuple:
+    # Takes candidates in blocks from the best weighted score. Anything
+    # dominating a candidate scores lower, so it is either on the front found
+    # so far or in the same block; one comparison per block settles them all.
+    order = np.argsort(scores, kind="stable")
+    front = np.empty(0, dtype=int)
+    for start in range(0, len(order), PARETO_BLOCK):
+        block = order[start : start + PARETO_BLOCK]
+        values = objectives[block][None, :, :]
+        rivals = objectives[np.concatenate([front, block])][:, None, :]
+        dominated = (rivals <= values).all(axis=2) & (rivals < values).any(axis=2)
+        front = np.concatenate([front, block[~dominated.any(axis=0)]])
+        if len(front) >= k:
+            break
+    front = front[:k]
+    rest = order[~np.isin(order, front)][: k - len(front)]
+    return front, rest
+
+
+def balanced_splits(
+    features: pd.DataFrame,
+    together: np.ndarray | None = None,
+    weights: dict = DEFAULT_WEIGHTS,
+    k: int = 3,
+    synergy: np.ndarray | None = None,
+) -> pd.DataFrame:
+    # Scores every partition on all objectives at once (mask matrix x feature
+    # matrix). Objectives are scaled by the spread of the feature among these
+    # players so the weights are comparable. Pareto-optimal splits come first,
+    # topped up with the next best weighted scores.
+    names = features.index.to_numpy()
+    n_players = len(names)
+    if n_players < 2:
+        return pd.DataFrame(columns=balanced_columns)
+    if n_players > MAX_EXACT_PLAYERS:
+        frame = best_splits(features["rating"], k)
+        for col in objective_columns[1:]:
+            frame[col] = np.nan
+        frame["rating"] = frame["score"]
+        frame["pareto"] = False
+        return frame[balanced_columns]
+
+    values = features[feature_columns].to_numpy(dtype=float)
+    masks = team_a_masks(n_players)
+    objectives = _objectives(masks, values, together, synergy)
+    spread = np.append(values.std(axis=0), [1.0, 1.0])
+    spread[spread == 0] = 1.0
+    weight = np.array([weights.get(col, 0.0) for col in objective_columns])
+    active = weight > 0
+    scores = (objectives / spread) @ weight
+
+    front, rest = _pareto_order(objectives[:, active], scores, k)
+    best = np.concatenate([front, rest])
+    frame = _to_frame(masks[best].astype(bool), scores[best], 0, names)
+    frame["pareto"] = np.arange(len(best)) < len(front)
+    frame[objective_columns] = objectives[best]
+    return frame[balanced_columns]
@@ -0,0 +1,374 @@
+import argparse
+import hashlib
+import sqlite3
+import time
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import NamedTuple, Sequence
+
+import pandas as pd
+
+from sheets import SheetBackend, to_cells
+
+SQLITE_PATH = Path(__file__).parent / ".cache" / "football.sqlite"
+WORKSHEETS = ["game_data", "Players", "funds"]
+IMPORT_CHUNK_ROWS = 1000
+
+# SQLite column affinities; anything not listed is TEXT
+column_types = {"goals": "INTEGER", "assists": "INTEGER", "amount": "REAL"}
+indexed_columns = {"game_data": ["date", "name"], "funds": ["date"]}
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _normalize_date(value):
+    date = pd.to_datetime(value, errors="coerce")
+    return value if pd.isnull(date) else f"{date:%Y-%m-%d}"
+
+
+def _fetch(source: SheetBackend, worksheet: str) -> tuple[list, list[list]]:
+    rows, start = [], 0
+    while True:
+        block = source.get_rows(worksheet, start, start + IMPORT_CHUNK_ROWS)
+        rows += block
+        if len(block) < IMPORT_CHUNK_ROWS:
+            break
+        start += IMPORT_CHUNK_ROWS
+    return source.header(worksheet), rows
+
+
+def _digest(header: list, rows: list[list]) -> str:
+    # of the cells as read back, so two reads of an unchanged worksheet agree
+    return hashlib.sha1(repr((header, rows)).encode()).hexdigest()
+
+
+class SyncResult(NamedTuple):
+    pushed: list
+    pulled: list
+    conflicts: list  # edited both locally and in the mirror; left alone
+
+
+class SQLiteBackend(SheetBackend):
+    # Local copy of the spreadsheet. Each worksheet is a table with a `pos`
+    # column holding the row position, so the row-range operations of
+    # SheetBackend map onto it; Google Sheets is kept as a mirror via sync().
+
+    def __init__(self, path: Path = SQLITE_PATH):
+        super().__init__()
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS _meta (worksheet TEXT PRIMARY KEY,"
+                " header TEXT, version INTEGER DEFAULT 0,"
+                " synced_version INTEGER DEFAULT 0, synced_at REAL DEFAULT 0,"
+                " remote_version TEXT, remote_digest TEXT)"
+            )
+            # copies made before sync checked the mirror for edits
+            columns = {row[1] for row in db.execute("PRAGMA table_info(_meta)")}
+            for column in ("remote_version", "remote_digest"):
+                if column not in columns:
+                    db.execute(f"ALTER TABLE _meta ADD COLUMN {column} TEXT")
+
+    @contextmanager
+    def _connect(self):
+        # a connection per call: Streamlit runs sessions on different threads
+        with closing(sqlite3.connect(self.path)) as db:
+            with db:
+                yield db
+
+    def has_worksheet(self, worksheet: str) -> bool:
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT 1 FROM _meta WHERE worksheet = ?", (worksheet,)
+            ).fetchone()
+        return row is not None
+
+    def _header(self, db, worksheet: str) -> list:
+        row = db.execute(
+            "SELECT header FROM _meta WHERE worksheet = ?", (worksheet,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(f"No worksheet {worksheet!r} in {self.path}")
+        return row[0].split("\t")
+
+    def _insert(self, db, worksheet: str, start: int, rows: Sequence[list]):
+        header = self._header(db, worksheet)
+        dates = [i for i, col in enumerate(header) if col == "date"]
+        records = []
+        for pos, row in enumerate(rows, start):
+            row = (list(row) + [None] * len(header))[: len(header)]
+            row = [None if value == "" else value for value in row]
+            for i in dates:
+                if row[i] is not None:
+                    row[i] = _normalize_date(row[i])
+            records.append((pos, *row))
+        db.executemany(
+            f"INSERT INTO {_quote(worksheet)}"
+            f" VALUES ({', '.join('?' * (len(header) + 1))})",
+            records,
+        )
+
+    def _touch(self, db, worksheet: str):
+        db.execute(
+            "UPDATE _meta SET version = version + 1 WHERE worksheet = ?", (worksheet,)
+        )
+
+    def create_worksheet(self, worksheet: str, header: list, rows: Sequence[list] = ()):
+        with self._connect() as db:
+            self._create_worksheet(db, worksheet, header, rows)
+        self._date_index.pop(worksheet, None)
+
+    def _create_worksheet(self, db, worksheet: str, header: list, rows: Sequence[list]):
+        columns = ", ".join(
+            f"{_quote(col)} {column_types.get(col, 'TEXT')}" for col in header
+        )
+        table = _quote(worksheet)
+        db.execute(f"DROP TABLE IF EXISTS {table}")
+        db.execute(f"CREATE TABLE {table} (pos INTEGER NOT NULL, {columns})")
+        db.execute(f"CREATE INDEX {_quote(worksheet + '_pos')} ON {table} (pos)")
+        for col in indexed_columns.get(worksheet, []):
+            if col in header:
+                index = _quote(f"{worksheet}_{col}")
+                db.execute(f"CREATE INDEX {index} ON {table} ({_quote(col)})")
+        db.execute(
+            "INSERT INTO _meta (worksheet, header) VALUES (?, ?)"
+            " ON CONFLICT (worksheet) DO UPDATE SET header = excluded.header",
+            (worksheet, "\t".join(header)),
+        )
+        self._insert(db, worksheet, 0, rows)
+
+    def import_from(self, source: SheetBackend, worksheets: list = WORKSHEETS):
+        # One-shot copy of whole worksheets, e.g. from the Google spreadsheet.
+        # Replaces local edits that were not synced yet.
+        for worksheet in worksheets:
+            remote_version = source.version(worksheet)
+            header, rows = _fetch(source, worksheet)
+            self._pull(worksheet, header, rows, remote_version)
+
+    def _pull(
+        self,
+        worksheet: str,
+        header: list,
+        rows: list[list],
+        remote_version: str | None,
+        expected_version: int | None = None,
+    ) -> bool:
+        # Replaces the local copy with the mirror's. With expected_version, only
+        # while the local copy is still at that version.
+        with self.write_lock, self._connect() as db:
+            if expected_version is not None:
+                row = db.execute(
+                    "SELECT version FROM _meta WHERE worksheet = ?", (worksheet,)
+                ).fetchone()
+                if row is None or row[0] != expected_version:
+                    return False
+            self._create_worksheet(db, worksheet, header, rows)
+            db.execute(
+                "UPDATE _meta SET version = version + 1, synced_version = version + 1,"
+                " synced_at = ?, remote_version = ?, remote_digest = ?"
+                " WHERE worksheet = ?",
+                (time.time(), remote_version, _digest(header, rows), worksheet),
+            )
+            self._date_index.pop(worksheet, None)
+        return True
+
+    def _mark_synced(self, worksheet: str, **columns):
+        columns["synced_at"] = time.time()
+        with self._connect() as db:
+            db.execute(
+                f"UPDATE _meta SET {', '.join(f'{col} = ?' for col in columns)}"
+                " WHERE worksheet = ?",
+                (*columns.values(), worksheet),
+            )
+
+    def sync(
+        self, target: SheetBackend, min_interval: float = 0, force: bool = False
+    ) -> SyncResult:
+        # Brings the local copy and the mirror in step, at most once per
+        # min_interval seconds per worksheet: local edits are pushed, edits
+        # made directly in the mirror are pulled. A worksheet edited on both
+        # sides since the last sync is reported as a conflict and left alone;
+        # `import` takes the mirror's copy, force=True pushes ours over it.
+        with self._connect() as db:
+            due = db.execute(
+                "SELECT worksheet, version, synced_version, remote_version,"
+                " remote_digest FROM _meta WHERE synced_at <= ?",
+                (time.time() - min_interval,),
+            ).fetchall()
+        result = SyncResult([], [], [])
+        for worksheet, version, synced_version, remote_version, digest in due:
+            local_changed = version != synced_version
+            token = target.version(worksheet)
+            remote = None
+            # The token is spreadsheet-wide (and missing for public sheets), so a
+            # new one only says "maybe": the cells decide. Copies without a
+            # digest predate this check and are pushed as before.
+            if digest is not None and (token is None or token != remote_version):
+                remote = _fetch(target, worksheet)
+                if _digest(*remote) == digest:
+                    remote = None
+            if remote is not None and not force:
+                if local_changed:
+                    result.conflicts.append(worksheet)
+                    self._mark_synced(worksheet)
+                elif self._pull(worksheet, *remote, token, expected_version=version):
+                    result.pulled.append(worksheet)
+                continue
+            if local_changed or remote is not None:
+                target.update(worksheet, self.read(worksheet))
+                token = target.version(worksheet)
+                digest = _digest(*_fetch(target, worksheet))
+                result.pushed.append(worksheet)
+            self._mark_synced(
+                worksheet,
+                synced_version=version,
+                remote_version=token,
+                remote_digest=digest,
+            )
+        return result
+
+    def query(self, sql: str, params: dict | tuple = ()) -> pd.DataFrame:
+        with self._connect() as db:
+            return pd.read_sql_query(sql, db, params=params)
+
+    def read(self, worksheet: str, usecols=None, nrows=None) -> pd.DataFrame:
+        sql = f"SELECT * FROM {_quote(worksheet)} ORDER BY pos"
+        if nrows is not None:
+            sql += f" LIMIT {int(nrows)}"
+        data = self.query(sql).drop(columns="pos")
+        if usecols is not None:
+            data = data.iloc[:, list(usecols)]
+        return data
+
+    def update(self, worksheet: str, data: pd.DataFrame):
+        self.create_worksheet(worksheet, list(data.columns), to_cells(data))
+        with self._connect() as db:
+            self._touch(db, worksheet)
+
+    def header(self, worksheet: str) -> list:
+        with self._connect() as db:
+            return self._header(db, worksheet)
+
+    def get_column(self, worksheet: str, col: int) -> list:
+        return [row[col] for row in self.get_rows(worksheet, 0, 2**62)]
+
+    def get_rows(self, worksheet: str, start: int, stop: int) -> list[list]:
+        with self._connect() as db:
+            rows = db.execute(
+                f"SELECT * FROM {_quote(worksheet)} WHERE pos >= ? AND pos < ?"
+                " ORDER BY pos",
+                (start, stop),
+            ).fetchall()
+        return [
+            ["" if value is None else str(value) for value in row[1:]] for row in rows
+        ]
+
+    def update_rows(self, worksheet: str, start: int, rows: list[list]):
+        if not rows:
+            return
+        with self._connect() as db:
+            db.execute(
+                f"DELETE FROM {_quote(worksheet)} WHERE pos >= ? AND pos < ?",
+                (start, start + len(rows)),
+            )
+            self._insert(db, worksheet, start, rows)
+            self._touch(db, worksheet)
+
+    def insert_rows(self, worksheet: str, start: int, rows: list[list]):
+        with self._connect() as db:
+            db.execute(
+                f"UPDATE {_quote(worksheet)} SET pos = pos + ? WHERE pos >= ?",
+                (len(rows), start),
+            )
+            self._insert(db, worksheet, start, rows)
+            self._touch(db, worksheet)
+
+    def delete_rows(self, worksheet: str, start: int, stop: int):
+        table = _quote(worksheet)
+        with self._connect() as db:
+            db.execute(f"DELETE FROM {table} WHERE pos >= ? AND pos < ?", (start, stop))
+            db.execute(
+                f"UPDATE {table} SET pos = pos - ? WHERE pos >= ?", (stop - start, stop)
+            )
+            self._touch(db, worksheet)
+
+    def version(self, worksheet: str) -> str | None:
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT version FROM _meta WHERE worksheet = ?", (worksheet,)
+            ).fetchone()
+        return None if row is None else str(row[0])
+
+    def player_totals(
+        self,
+        start_date: pd.Timestamp | None = None,
+        since: str | pd.Timestamp | None = "2024-01-01",
+    ) -> pd.DataFrame:
+        # Same numbers as facts.totals_between over get_match_outcome(since),
+        # aggregated in SQLite instead of pandas.
+        since = "0000" if since is None else f"{pd.Timestamp(since):%Y-%m-%d}"
+        start = "0000" if start_date is None else f"{pd.Timestamp(start_date):%Y-%m-%d}"
+        totals = self.query(
+            """
+            WITH played AS (
+                SELECT date, team, name, goals, assists FROM game_data
+                WHERE name IS NOT NULL AND date > :since
+            ),
+            matches AS (
+                SELECT date,
+                    SUM(CASE WHEN team = 'A' THEN 1 ELSE -1 END
+                        * COALESCE(goals, 0)) AS outcome
+                FROM played GROUP BY date
+            ),
+            signs AS (
+                SELECT p.name, p.goals, p.assists,
+                    (CASE WHEN m.outcome > 0 THEN 1 WHEN m.outcome < 0 THEN -1
+                        ELSE 0 END)
+                    * (CASE WHEN p.team = 'A' THEN 1 ELSE -1 END) AS sign
+                FROM played p JOIN matches m USING (date)
+                WHERE p.date >= :start
+            )
+            SELECT name, COUNT(*) AS apps,
+                COALESCE(SUM(goals), 0) AS goals,
+                COALESCE(SUM(assists), 0) AS assists,
+                SUM(sign = 1) AS W, SUM(sign = 0) AS D, SUM(sign = -1) AS L
+            FROM signs GROUP BY name
+            """,
+            {"since": since, "start": start},
+        )
+        return totals.set_index("name")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Copy the spreadsheet into SQLite, or push local edits back"
+    )
+    arg_parser.add_argument("command", choices=["import", "sync"])
+    arg_parser.add_argument("--db", type=Path, default=SQLITE_PATH)
+    arg_parser.add_argument(
+        "--force",
+        action="store_true",
+        help="sync: push local worksheets over conflicting edits in the spreadsheet",
+    )
+    args = arg_parser.parse_args()
+
+    import streamlit as st
+    from streamlit_gsheets import GSheetsConnection
+
+    from sheets import GSheetsBackend
+
+    remote = GSheetsBackend(st.connection("gsheets", type=GSheetsConnection))
+    if args.command == "import":
+        SQLiteBackend(args.db).import_from(remote)
+    else:
+        result = SQLiteBackend(args.db).sync(remote, force=args.force)
+        print(f"pushed: {result.pushed}, pulled: {result.pulled}")
+        if result.conflicts:
+            print(
+                f"conflicts: {result.conflicts} were edited here and in the"
+                " spreadsheet; run `import` to keep the spreadsheet's copy or"
+                " `sync --force` to keep this one"
+            )
@@ -0,0 +1,165 @@
+import pandas as pd
+import pytest
+
+import bulk
+import sheets
+import utils
+
+game_data = pd.DataFrame(
+    {
+        "date": ["2024-03-07"] * 4,
+        "team": ["A", "A", "B", "B"],
+        "name": ["Ann", "Other", "Bob", "Other"],
+        "goals": [1, 0, 2, 1],
+        "assists": [0, 0, 1, 0],
+    }
+)
+
+
+@pytest.fixture(autouse=True)
+def sheet_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "SHEET_CACHE_DIR", tmp_path / "sheets")
+
+
+@pytest.fixture
+def backend() -> sheets.FakeSheetBackend:
+    players = pd.DataFrame({"name": ["Ann", "Bob", "Cid", "Dan"]})
+    return sheets.FakeSheetBackend({"game_data": game_data, "Players": players})
+
+
+def write_csv(path, text: str):
+    path.write_text(text.strip() + "\n")
+    return path
+
+
+@pytest.fixture
+def match_file(tmp_path):
+    return write_csv(
+        tmp_path / "matches.csv",
+        """
+date,team,name,goals,assists,score
+2024-03-14,A,Ann,2,0,3
+2024-03-14,a,Cid,0,1,3
+2024-03-14,B,Bob,1,0,1
+2024-03-14,B,Dan,,0,1
+""",
+    )
+
+
+def stored(backend: sheets.SheetBackend) -> pd.DataFrame:
+    return utils.read_worksheet(backend, "game_data", utils.match_dtypes)
+
+
+def test_import_adds_other_rows_and_keeps_newest_first(backend, match_file):
+    imported = bulk.import_matches(backend, [match_file])
+    after = stored(backend)
+    assert after["date"].is_monotonic_decreasing
+    assert len(after) == len(game_data) + len(imported)
+    new = after[after["date"] == "2024-03-14"]
+    others = new[new["name"] == "Other"].set_index("team")["goals"]
+    assert others.to_dict() == {"A": 1, "B": 0}
+    assert new.groupby("team", observed=True)["goals"].sum().to_dict() == {
+        "A": 3,
+        "B": 1,
+    }
+
+
+def test_dry_run_writes_nothing(backend, match_file):
+    bulk.import_matches(backend, [match_file], dry_run=True)
+    assert backend.cells_written == 0
+
+
+def test_bad_cells_are_reported_with_their_line(backend, tmp_path):
+    path = write_csv(
+        tmp_path / "bad.csv",
+        """
+date,team,name,goals,assists,score
+2024-03-14,A,Ann,two,0,3
+not a date,C,Bob,1,0,1
+""",
+    )
+    with pytest.raises(bulk.ImportProblems) as error:
+        bulk.import_matches(backend, [path])
+    assert error.value.problems == [
+        "bad.csv line 3: bad date 'not a date'",
+        "bad.csv line 3: bad team 'C'",
+        "bad.csv line 2: bad goals 'two'",
+    ]
+
+
+def test_checks_run_over_every_match(backend, tmp_path):
+    path = write_csv(
+        tmp_path / "matches.csv",
+        """
+date,team,name,goals,assists,score
+2024-03-07,A,Ann,0,0,0
+2024-03-07,B,Bob,0,0,0
+2024-03-14,A,Ann,3,0,2
+2024-03-14,B,Eve,0,0,0
+""",
+    )
+    with pytest.raises(bulk.ImportProblems) as error:
+        bulk.import_matches(backend, [path])
+    assert error.value.problems == [
+        "2024-03-14: team A score 2 must be greater than or equal to the sum of"
+        " goals 3",
+        "'Eve' is not on the Players sheet (2024-03-14)",
+        "matches already in game_data (use --replace): 2024-03-07",
+    ]
+    assert backend.cells_written == 0
+
+
+def test_files_without_a_score_need_without_score(backend, tmp_path):
+    path = write_csv(
+        tmp_path / "export.csv",
+        """
+date,team,name,goals,assists
+2024-03-14,A,Ann,2,0
+2024-03-14,A,Other,1,0
+2024-03-14,B,Bob,0,0
+""",
+    )
+    with pytest.raises(bulk.ImportProblems, match="no score column"):
+        bulk.import_matches(backend, [path])
+    imported = bulk.import_matches(backend, [path], without_score=True)
+    assert imported["name"].tolist() == ["Ann", "Other", "Bob"]
+
+
+def test_import_is_not_written_over_a_concurrent_change(
+    backend, match_file, monkeypatch
+):
+    load_sheets = utils.load_sheets
+
+    def load_then_edit(*args, **kwargs):
+        loaded = load_sheets(*args, **kwargs)
+        # someone saves a match while the files are being checked
+        backend.update_rows("game_data", 0, [["2024-03-07", "A", "Ann", 4, 0]])
+        return loaded
+
+    monkeypatch.setattr(utils, "load_sheets", load_then_edit)
+    before = backend.cells_written
+    with pytest.raises(sheets.StaleDataError):
+        bulk.import_matches(backend, [match_file])
+    assert backend.cells_written == before + 5
+    assert stored(backend)["goals"].iloc[0] == 4
+
+
+def test_a_new_token_alone_does_not_stop_the_import(backend, match_file, monkeypatch):
+    tokens = iter(["1", "2"])
+    monkeypatch.setattr(backend, "version", lambda worksheet: next(tokens, "3"))
+    bulk.import_matches(backend, [match_file])
+    assert (stored(backend)["date"] == "2024-03-14").any()
+
+
+def test_blank_name_rows_do_not_look_like_a_change(match_file, monkeypatch):
+    with_blank = pd.concat(
+        [game_data, pd.DataFrame([{"date": "2024-03-07", "team": "B"}])],
+        ignore_index=True,
+    )
+    players = pd.DataFrame({"name": ["Ann", "Bob", "Cid", "Dan"]})
+    backend = sheets.FakeSheetBackend({"game_data": with_blank, "Players": players})
+    # an edit on another tab moves the spreadsheet-wide token
+    tokens = iter(["1", "2"])
+    monkeypatch.setattr(backend, "version", lambda worksheet: next(tokens, "3"))
+    bulk.import_matches(backend, [match_file])
+    assert (stored(backend)["date"] == "2024-03-14").any()
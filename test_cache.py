@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import cache
+
+
+def frame(rows: int = 1000) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "goals": np.arange(rows, dtype=np.int64),
+            "team": pd.Categorical(["A", "B"] * (rows // 2)),
+        }
+    )
+
+
+def test_shared_frames_are_read_only():
+    manager = cache.CacheManager()
+    shared = manager.get_or_build("derived", ("frame",), frame)
+    with pytest.raises(ValueError):
+        shared.loc[0, "goals"] = 5
+    with pytest.raises(ValueError):
+        shared["goals"].to_numpy()[0] = 5
+    # new columns stay private to the caller
+    shared["double"] = shared["goals"] * 2
+    again = manager.get_or_build("derived", ("frame",), frame)
+    assert "double" not in again and again["goals"].iloc[0] == 0
+
+
+def test_lru_eviction_stays_within_the_budget():
+    size = cache.nbytes(frame())
+    manager = cache.CacheManager(budget=3 * size)
+    for i in range(5):
+        manager.get_or_build("derived", (i,), frame)
+    manager.get_or_build("derived", (3,), frame)  # 3 is now newer than 4
+    manager.get_or_build("derived", (5,), frame)
+    stats = manager.stats().loc["derived"]
+    assert stats["bytes"] <= manager.budget
+    assert stats["entries"] == 3 and stats["evictions"] == 3
+    assert [key[1] for key in manager._entries] == [4, 3, 5]
+
+
+def test_oversized_values_are_served_but_not_kept():
+    manager = cache.CacheManager(budget=100)
+    builds = []
+
+    def build():
+        builds.append(1)
+        return frame()
+
+    manager.get_or_build("derived", ("big",), build)
+    manager.get_or_build("derived", ("big",), build)
+    assert len(builds) == 2
+    assert manager.stats().loc["derived", "bytes"] == 0
+
+
+def test_invalidate_by_version_and_latest():
+    manager = cache.CacheManager()
+    manager.get_or_build("derived", ("v1",), frame, "v1", latest="facts")
+    manager.get_or_build("derived", ("v2",), lambda: frame(10), "v2", latest="facts")
+    assert len(manager.latest("facts")) == 10
+    assert manager.invalidate("derived", "v1") == 1
+    assert len(manager.latest("facts")) == 10
+    manager.invalidate("derived")
+    assert manager.latest("facts") is None
@@ -0,0 +1,135 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import chemistry
+import facts
+import utils
+from benchmarks.league import generate_league
+
+
+def player_matches_of(rows: list) -> pd.DataFrame:
+    # (date, name, team, sign) rows in the player_matches layout
+    return pd.DataFrame(rows, columns=["date", "name", "team", "sign"]).astype(
+        {"date": "datetime64[ns]"}
+    )
+
+
+@pytest.fixture
+def small_matches() -> pd.DataFrame:
+    # 03-07: Ann + Bob beat Cid + Dan
+    # 03-14: Ann + Cid draw with Bob + Dan (+ Other)
+    # 03-21: Ann + Dan lose to Bob + Cid
+    return player_matches_of(
+        [
+            ("2024-03-07", "Ann", "A", 1),
+            ("2024-03-07", "Bob", "A", 1),
+            ("2024-03-07", "Cid", "B", -1),
+            ("2024-03-07", "Dan", "B", -1),
+            ("2024-03-14", "Ann", "A", 0),
+            ("2024-03-14", "Cid", "A", 0),
+            ("2024-03-14", "Bob", "B", 0),
+            ("2024-03-14", "Dan", "B", 0),
+            ("2024-03-14", "Other", "B", 0),
+            ("2024-03-21", "Ann", "A", -1),
+            ("2024-03-21", "Dan", "A", -1),
+            ("2024-03-21", "Bob", "B", 1),
+            ("2024-03-21", "Cid", "B", 1),
+        ]
+    )
+
+
+def test_pair_table_by_hand(small_matches):
+    table = chemistry.pair_table(chemistry.build_chemistry(small_matches))
+    table = table.set_index(["player", "partner"]).sort_index()
+    # together, together_wins, against, wins, draws, losses
+    expected = {
+        ("Ann", "Bob"): (1, 1, 2, 0, 1, 1),
+        ("Ann", "Cid"): (1, 0, 2, 1, 0, 1),
+        ("Ann", "Dan"): (1, 0, 2, 1, 1, 0),
+        ("Bob", "Cid"): (1, 1, 2, 1, 1, 0),
+        ("Bob", "Dan"): (1, 0, 2, 2, 0, 0),
+        ("Cid", "Dan"): (1, 0, 2, 1, 1, 0),
+    }
+    assert list(table.index) == list(expected)
+    counts = ["together", "together_wins", "against", "wins", "draws", "losses"]
+    assert [tuple(row) for row in table[counts].to_numpy()] == list(expected.values())
+    assert table["together_win_rate"].tolist() == [1, 0, 0, 1, 0, 0]
+
+
+def test_pair_table_of_one_player(small_matches):
+    pairs = chemistry.build_chemistry(small_matches)
+    partners = chemistry.pair_table(pairs, "Bob").set_index("partner")
+    assert list(partners.index) == ["Ann", "Cid", "Dan"]
+    # from Bob's side, so Ann's loss is his win
+    assert partners.loc["Ann", ["wins", "draws", "losses"]].tolist() == [1, 1, 0]
+    assert chemistry.pair_table(pairs, "Other").empty
+    assert chemistry.pair_table(pairs, "Zed").empty
+
+
+def test_pair_synergy_by_hand(small_matches):
+    pairs = chemistry.build_chemistry(small_matches)
+    synergy = chemistry.pair_synergy(pairs, ["Ann", "Bob", "Cid", "Zed"])
+    prior = chemistry.PRIOR_MATCHES
+    assert synergy[0, 1] == synergy[1, 0] == pytest.approx(1 / (1 + prior))
+    assert synergy[0, 2] == 0 and synergy[1, 2] == pytest.approx(1 / (1 + prior))
+    # unknown names and the diagonal are neutral
+    assert not synergy[3].any() and not synergy[:, 3].any()
+    assert not synergy.diagonal().any()
+
+
+def brute_force_pairs(player_matches: pd.DataFrame) -> dict:
+    # every pair of every match, counted from the first (sorted) player's side
+    counts: dict = {}
+    played = player_matches[player_matches["name"] != "Other"]
+    for _, match in played.groupby("date"):
+        for (_, a), (_, b) in itertools.combinations(
+            match.sort_values("name").iterrows(), 2
+        ):
+            pair = counts.setdefault((a["name"], b["name"]), np.zeros(7, dtype=int))
+            if a["team"] == b["team"]:
+                pair += [1, a["sign"] > 0, a["sign"] < 0, 0, 0, 0, 0]
+            else:
+                pair += [0, 0, 0, 1, a["sign"] > 0, a["sign"] == 0, a["sign"] < 0]
+    return counts
+
+
+@pytest.fixture(scope="module")
+def league_matches() -> pd.DataFrame:
+    league = generate_league(n_players=20, seasons=1, seed=5)
+    outcomes = utils.get_match_outcome(league, since=None)
+    return facts.build_match_facts(outcomes).player_matches
+
+
+def test_pair_table_matches_a_loop_over_matches(league_matches):
+    expected = brute_force_pairs(league_matches)
+    table = chemistry.pair_table(chemistry.build_chemistry(league_matches))
+    assert len(table) == len(expected)
+    for row in table.itertuples(index=False):
+        together, together_wins, _, against, wins, draws, losses = expected[
+            (row.player, row.partner)
+        ]
+        assert (row.together, row.together_wins) == (together, together_wins)
+        assert (row.against, row.wins, row.draws, row.losses) == (
+            against,
+            wins,
+            draws,
+            losses,
+        )
+        if together:
+            assert row.together_win_rate == pytest.approx(together_wins / together)
+        else:
+            assert np.isnan(row.together_win_rate)
+
+
+def test_pair_synergy_matches_a_loop_over_matches(league_matches):
+    expected = brute_force_pairs(league_matches)
+    pairs = chemistry.build_chemistry(league_matches)
+    player_names = list(pairs.names)
+    synergy = chemistry.pair_synergy(pairs, player_names)
+    for (a, b), (together, won, lost, *_) in expected.items():
+        i, j = player_names.index(a), player_names.index(b)
+        delta = (won - lost) / (together + chemistry.PRIOR_MATCHES)
+        assert synergy[i, j] == synergy[j, i] == pytest.approx(delta)
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+from scipy.stats import gaussian_kde
+
+import density
+
+
+def shots(n: int = 200, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "match_id": rng.choice([1, 2], n),
+            "team_name": rng.choice(["Home", "Away"], n),
+            "x": rng.normal(100, 8, n).clip(0, 120),
+            "y": rng.normal(40, 10, n).clip(0, 80),
+        }
+    )
+
+
+def test_grid_density_matches_scipy_kde():
+    data = shots()
+    xs, ys = density._grid(0, 120), density._grid(0, 80)
+    expected_x = gaussian_kde(data["x"])(xs)
+    assert np.abs(density.density_1d(data["x"], xs) - expected_x).max() < (
+        0.02 * expected_x.max()
+    )
+    grid_x, grid_y = np.meshgrid(xs, ys)
+    expected = gaussian_kde(data[["x", "y"]].T.to_numpy())(
+        np.vstack([grid_x.ravel(), grid_y.ravel()])
+    ).reshape(grid_x.shape)
+    actual = density.density_2d(data["x"], data["y"], xs, ys)
+    assert actual.shape == (len(ys), len(xs))
+    assert np.abs(actual - expected).max() < 0.02 * expected.max()
+
+
+def test_too_few_shots_give_an_empty_density():
+    xs, ys = density._grid(0, 120), density._grid(0, 80)
+    assert not density.density_1d(np.array([50.0]), xs).any()
+    assert not density.density_2d([50.0, 60.0], [40.0, 40.0], xs, ys).any()
+
+
+def test_batch_densities_are_keyed_by_match_and_team():
+    data = shots()
+    batch = density.batch_shot_densities(data)
+    assert set(batch) == set(data.groupby(["match_id", "team_name"]).groups)
+    one = data[(data["match_id"] == 1) & (data["team_name"] == "Home")]
+    np.testing.assert_array_equal(
+        batch[(1, "Home")].density, density.shot_density(one).density
+    )
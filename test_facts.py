@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import facts
+import utils
+from benchmarks.league import generate_league
+
+
+@pytest.fixture(scope="module")
+def outcomes() -> pd.DataFrame:
+    league = generate_league(n_players=40, seasons=1, seed=3)
+    return utils.get_match_outcome(league, since=None)
+
+
+def assert_same_facts(actual: facts.MatchFacts, expected: facts.MatchFacts):
+    pd.testing.assert_frame_equal(actual.matches, expected.matches)
+    pd.testing.assert_frame_equal(actual.player_matches, expected.player_matches)
+    pd.testing.assert_frame_equal(actual.player_totals, expected.player_totals)
+    for actual_array, expected_array in zip(actual.results, expected.results):
+        np.testing.assert_array_equal(actual_array, expected_array)
+    assert actual.version == expected.version
+
+
+def test_appended_matches_extend_the_results(outcomes):
+    dates = np.sort(outcomes["date"].unique())
+    earlier = outcomes[outcomes["date"] <= dates[-4]]
+    previous = facts.build_match_facts(earlier)
+    incremental = facts.build_match_facts(outcomes, previous)
+    assert_same_facts(incremental, facts.build_match_facts(outcomes))
+    # the earlier block is carried over as it was
+    rows, cols = previous.results.signs.shape
+    np.testing.assert_array_equal(
+        incremental.results.signs[:rows, :cols], previous.results.signs
+    )
+
+
+def test_an_edited_earlier_match_rebuilds(outcomes):
+    dates = np.sort(outcomes["date"].unique())
+    previous = facts.build_match_facts(outcomes[outcomes["date"] <= dates[-4]])
+    edited = outcomes.copy()
+    first = edited["date"] == dates[0]
+    edited.loc[first, "sign"] = -edited.loc[first, "sign"]
+    assert_same_facts(
+        facts.build_match_facts(edited, previous), facts.build_match_facts(edited)
+    )
+
+
+def test_window_totals_match_a_direct_sum(outcomes):
+    match_facts = facts.build_match_facts(outcomes)
+    dates = np.sort(outcomes["date"].unique())
+    start, end = pd.Timestamp(dates[5]), pd.Timestamp(dates[-5])
+    window = outcomes[(outcomes["date"] >= start) & (outcomes["date"] <= end)]
+    expected = window.groupby("name", observed=True).agg(
+        apps=("name", "size"),
+        goals=("goals", "sum"),
+        W=("sign", lambda s: (s == 1).sum()),
+    )
+    totals = facts.totals_between(match_facts.player_matches, start, end)
+    totals = totals[totals["apps"] > 0]
+    assert sorted(totals.index) == sorted(expected.index.astype(str))
+    for col in expected:
+        assert (
+            totals[col] == expected[col].rename(index=str).reindex(totals.index)
+        ).all()
+
+
+def test_results_since_cuts_by_date(outcomes):
+    match_facts = facts.build_match_facts(outcomes)
+    start = pd.Timestamp(np.sort(outcomes["date"].unique())[-3])
+    recent = facts.results_since(match_facts.results, start)
+    assert len(recent.dates) == 3
+    played = outcomes.loc[outcomes["date"] >= start, "name"].astype(str).unique()
+    assert sorted(recent.names) == sorted(played)
@@ -0,0 +1,37 @@
+from pathlib import Path
+
+import pytest
+
+import figures
+
+
+@pytest.fixture
+def figure_cache(tmp_path) -> figures.FigureCache:
+    for i in range(4):
+        (tmp_path / f"page-{i}.png").write_bytes(b"x" * 10)
+    (tmp_path / "page-4.png.abc.tmp").write_bytes(b"x")
+    return figures.FigureCache(tmp_path, max_bytes=1000, max_entries=2)
+
+
+@pytest.fixture
+def vanishing(monkeypatch):
+    # page-0.png is listed, then removed by another session before stat
+    stat = Path.stat
+
+    def racing_stat(path, *args, **kwargs):
+        if path.name == "page-0.png":
+            path.unlink(missing_ok=True)
+        return stat(path, *args, **kwargs)
+
+    monkeypatch.setattr(Path, "stat", racing_stat)
+
+
+def test_stats_skip_files_removed_meanwhile(figure_cache, vanishing):
+    assert figure_cache.stats() == {"hits": 0, "misses": 0, "entries": 3, "bytes": 30}
+
+
+def test_evict_skips_files_removed_meanwhile(figure_cache, vanishing):
+    figure_cache.evict()
+    remaining = sorted(path.name for path in figure_cache.directory.iterdir())
+    assert len([name for name in remaining if name.endswith(".png")]) == 2
+    assert "page-0.png" not in remaining and "page-4.png.abc.tmp" in remaining
@@ -0,0 +1,24 @@
+import pytest
+
+from benchmarks.league import generate_league
+
+
+def test_league_fields_two_full_squads():
+    league = generate_league(n_players=14, seasons=1, squad_size=7)
+    per_match = league[league["name"] != "Other"].groupby("date")["name"]
+    assert (per_match.nunique() == 14).all()
+    assert league["date"].is_monotonic_decreasing
+
+
+@pytest.mark.parametrize(
+    "kwargs, message",
+    [
+        ({"n_players": 12}, "12 players cannot field two squads of 7"),
+        ({"n_players": 4, "squad_size": 0}, "squad_size"),
+        ({"seasons": 0}, "seasons"),
+        ({"matches_per_week": 8}, "matches_per_week"),
+    ],
+)
+def test_invalid_arguments_are_rejected_up_front(kwargs, message):
+    with pytest.raises(ValueError, match=message):
+        generate_league(**kwargs)
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import ledger
+
+
+def funds(rows: int = 120, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp("2023-06-01") + pd.to_timedelta(
+        np.sort(rng.integers(0, 700, rows)), unit="D"
+    )
+    return pd.DataFrame(
+        {
+            "date": dates,
+            "amount": rng.choice([-60.0, -20.0, 10.0, 15.0], rows),
+            "description": rng.choice(
+                np.array(["Ann", "ann ", "Bob", "pitch", None], dtype=object), rows
+            ),
+        }
+    )
+
+
+def assert_same_ledger(actual: ledger.Ledger, expected: ledger.Ledger):
+    for name in ["entries", "days", "months", "seasons", "by_description"]:
+        pd.testing.assert_frame_equal(
+            getattr(actual, name), getattr(expected, name), check_dtype=False
+        )
+    assert (actual.rows, actual.version) == (expected.rows, expected.version)
+
+
+@pytest.mark.parametrize("split", [1, 60, 119])
+def test_appended_rows_match_a_full_rebuild(split):
+    data = funds()
+    previous = ledger.build_ledger(data.iloc[:split])
+    assert_same_ledger(ledger.build_ledger(data, previous), ledger.build_ledger(data))
+
+
+def test_back_dated_rows_rebuild():
+    data = funds()
+    previous = ledger.build_ledger(data.iloc[:100])
+    back_dated = pd.concat([data, data.iloc[:1]], ignore_index=True)
+    assert_same_ledger(
+        ledger.build_ledger(back_dated, previous), ledger.build_ledger(back_dated)
+    )
+
+
+def test_balances_and_rollups_add_up():
+    data = funds()
+    funds_ledger = ledger.build_ledger(data)
+    assert funds_ledger.entries["balance"].iloc[-1] == pytest.approx(
+        data["amount"].sum()
+    )
+    date = data["date"].iloc[50]
+    assert ledger.balance_at(funds_ledger, date) == pytest.approx(
+        data.loc[data["date"] <= date, "amount"].sum()
+    )
+    assert ledger.balance_at(funds_ledger, "2000-01-01") == 0.0
+    assert funds_ledger.months["net"].sum() == pytest.approx(data["amount"].sum())
+    assert funds_ledger.seasons["entries"].sum() == len(data)
+
+
+def test_contributions_fold_spellings_together():
+    funds_ledger = ledger.build_ledger(funds())
+    totals = ledger.contributions(funds_ledger, ["Ann", "Bob", "Cid"])
+    data = funds()
+    ann = data["description"].isin(["Ann", "ann "])
+    assert totals.at["Ann", "amount"] == pytest.approx(data.loc[ann, "amount"].sum())
+    assert totals.at["Cid", "entries"] == 0
@@ -0,0 +1,86 @@
+import pytest
+
+import names
+
+
+@pytest.fixture(scope="module")
+def index() -> names.NameIndex:
+    # two Ivans, so "ivan" belongs to nobody; one player kept in Cyrillic
+    return names.NameIndex(
+        ["Иван Петров", "Ivan Georgiev", "Georgi Dimitrov", "Maria Ivanova"],
+        aliases={"Жоро": "Georgi Dimitrov"},
+    )
+
+
+def resolve_one(index: names.NameIndex, line: str) -> dict:
+    return index.resolve([line]).iloc[0].to_dict()
+
+
+def test_normalize_and_parse_roster():
+    assert names.normalize("  Ivan  Petrov-Jr. ") == "ivan petrov jr"
+    assert names.normalize("Иван Петров") == "ivan petrov"
+    assert names.normalize("José Müller") == "jose muller"
+    assert names.parse_roster("1. Ann\n2) Bob\n- Cid\n\n• Dan\n  ") == [
+        "Ann",
+        "Bob",
+        "Cid",
+        "Dan",
+    ]
+
+
+@pytest.mark.parametrize(
+    "line, name",
+    [
+        ("Ivan Georgiev", "Ivan Georgiev"),
+        ("  ivan GEORGIEV ", "Ivan Georgiev"),
+        ("Georgiev Ivan", "Ivan Georgiev"),
+        # Cyrillic and Latin spellings of the same name meet
+        ("ivan petrov", "Иван Петров"),
+        ("Георги Димитров", "Georgi Dimitrov"),
+        # last (or first) words owned by one player
+        ("Dimitrov", "Georgi Dimitrov"),
+        ("Maria", "Maria Ivanova"),
+        # aliases, normalized like everything else
+        ("жоро", "Georgi Dimitrov"),
+        ("Zhoro", "Georgi Dimitrov"),
+    ],
+)
+def test_exact_matches(index, line, name):
+    result = resolve_one(index, line)
+    assert result["name"] == name
+    assert result["score"] == 1.0 and result["exact"]
+    assert result["suggestions"] == []
+
+
+def test_typo_resolves_above_the_threshold(index):
+    result = resolve_one(index, "Georgi Dimitrof")
+    assert result["name"] == "Georgi Dimitrov" and not result["exact"]
+    assert result["score"] == pytest.approx(1 - 1 / 15)
+    assert result["suggestions"][0] == "Georgi Dimitrov"
+
+
+def test_typo_below_the_threshold_is_only_a_suggestion(index):
+    result = resolve_one(index, "Gorgi Dmtrv")
+    assert result["score"] < names.MIN_SIMILARITY
+    assert result["name"] is None
+    assert result["suggestions"][0] == "Georgi Dimitrov"
+
+
+def test_shared_first_name_stays_unresolved(index):
+    result = resolve_one(index, "Ivan")
+    assert result["name"] is None and not result["exact"]
+    assert {"Иван Петров", "Ivan Georgiev"} <= set(result["suggestions"])
+
+
+def test_unknown_name_has_no_suggestions(index):
+    result = resolve_one(index, "Zzz")
+    assert result["name"] is None
+    assert result["suggestions"] == []
+
+
+def test_resolve_keeps_roster_order(index):
+    lines = names.parse_roster("1. Dimitrov\n2. Ivan\n3. Maria")
+    resolved = index.resolve(lines)
+    assert list(resolved.columns) == names.resolve_columns
+    assert resolved["input"].tolist() == ["Dimitrov", "Ivan", "Maria"]
+    assert resolved["name"].tolist() == ["Georgi Dimitrov", None, "Maria Ivanova"]
@@ -0,0 +1,195 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import ratings
+import utils
+from benchmarks.league import generate_league
+
+
+def page_ratings(match_data_with_outcomes: pd.DataFrame) -> pd.Series:
+    # calculate_player_ratings as pages/5_split_teams.py had it before the
+    # engine, replaying dates in the order they are listed
+    player_rating = pd.Series(
+        index=match_data_with_outcomes["name"].unique(), data=1500
+    )
+    for dt in match_data_with_outcomes["date"].unique():
+        md_dt = match_data_with_outcomes.query(f'date=="{dt}"').copy()
+        md_dt["rating"] = md_dt["name"].map(player_rating)
+        outcome = md_dt["outcome"].iloc[0]
+        normalized_outcome = 1 / (np.exp(-outcome) + 1)  # sigmoid function
+        team_ratings = md_dt.groupby("team")["rating"].mean().to_dict()
+        team_rating_change = 32 * (
+            normalized_outcome
+            - 1 / (1 + 10 ** ((team_ratings["A"] - team_ratings["B"]) / 400))
+        )
+
+        for i, r in md_dt.iterrows():
+            sign_of_change = ((r["team"] == "A") - 0.5) * 2
+            player_rating[r["name"]] += sign_of_change * team_rating_change
+    return player_rating.sort_values()
+
+
+@pytest.fixture(scope="module")
+def outcomes() -> pd.DataFrame:
+    # newest first, like the sheet, with the plain columns conn.read returned
+    match_data = generate_league(n_players=20, seasons=1)
+    return utils.get_match_outcome(
+        match_data.astype({"team": object, "name": object}), since=None
+    )
+
+
+def test_ratings_are_bit_identical_to_the_page_loop_oldest_first(outcomes):
+    expected = page_ratings(outcomes.sort_values("date", kind="stable"))
+    actual = ratings.calculate_player_ratings(outcomes, None)
+    pd.testing.assert_series_equal(
+        actual.sort_index(), expected.sort_index(), check_exact=True
+    )
+
+
+def test_ratings_are_the_end_of_the_history(outcomes, tmp_path):
+    latest = outcomes["date"].max()
+    ratings.get_rating_history(outcomes[outcomes["date"] < latest], tmp_path)
+    # extended from the checkpoint, and the same as the history's last ratings
+    actual = ratings.calculate_player_ratings(outcomes, tmp_path)
+    history = ratings.build_rating_history(ratings.get_rating_history(outcomes, None))
+    pd.testing.assert_series_equal(
+        actual.sort_index(),
+        ratings.ratings_at(history).rename(None).sort_index(),
+        check_exact=True,
+        check_index_type=False,
+    )
+
+
+def test_ratings_do_not_depend_on_row_order(outcomes):
+    oldest_first = outcomes.sort_values("date", kind="stable")
+    pd.testing.assert_series_equal(
+        ratings.calculate_player_ratings(oldest_first, None).sort_index(),
+        ratings.calculate_player_ratings(outcomes, None).sort_index(),
+        check_exact=True,
+    )
+
+
+def test_history_replays_oldest_first(outcomes):
+    history = ratings.get_rating_history(outcomes, None)
+    assert history["date"].is_monotonic_increasing
+    first = history[
+        (history["date"] == history["date"].min()) & (history["name"] != "Other")
+    ]
+    # everyone starts from the initial rating, so both teams move by the same
+    change = (first["rating"] - ratings.INITIAL_RATING).abs()
+    assert np.allclose(change, change.iloc[0]) and change.iloc[0] > 0
+
+
+def test_checkpoint_extends_to_the_full_replay(outcomes, tmp_path):
+    latest = outcomes["date"].max()
+    ratings.get_rating_history(outcomes[outcomes["date"] < latest], tmp_path)
+    incremental = ratings.get_rating_history(outcomes, tmp_path)
+    pd.testing.assert_frame_equal(
+        incremental, ratings.get_rating_history(outcomes, None), check_exact=True
+    )
+
+
+def test_checkpoint_is_rebuilt_when_history_changes(outcomes, tmp_path):
+    ratings.get_rating_history(outcomes, tmp_path)
+    edited = outcomes.copy()
+    oldest = edited["date"] == edited["date"].min()
+    edited.loc[oldest, "outcome"] = -edited.loc[oldest, "outcome"]
+    pd.testing.assert_frame_equal(
+        ratings.get_rating_history(edited, tmp_path),
+        ratings.get_rating_history(edited, None),
+        check_exact=True,
+    )
+
+
+def test_checkpoint_is_one_file(outcomes, tmp_path):
+    history = ratings.get_rating_history(outcomes, tmp_path)
+    assert [path.name for path in tmp_path.iterdir()] == [ratings.CHECKPOINT_FILE]
+    meta, saved = ratings._load_checkpoint(tmp_path)
+    assert pd.Timestamp(meta["last_date"]) == outcomes["date"].max()
+    pd.testing.assert_frame_equal(saved, history)
+
+
+def test_unreadable_checkpoint_is_ignored(outcomes, tmp_path):
+    (tmp_path / ratings.CHECKPOINT_FILE).write_bytes(b"not parquet")
+    assert ratings._load_checkpoint(tmp_path) is None
+    pd.testing.assert_frame_equal(
+        ratings.get_rating_history(outcomes, tmp_path),
+        ratings.get_rating_history(outcomes, None),
+    )
+
+
+@pytest.fixture
+def small_history() -> ratings.RatingHistory:
+    # Ann plays all three dates, Bob the first and the last
+    return ratings.build_rating_history(
+        pd.DataFrame(
+            {
+                "date": pd.to_datetime(
+                    [
+                        "2024-03-07",
+                        "2024-03-07",
+                        "2024-03-14",
+                        "2024-03-21",
+                        "2024-03-21",
+                    ]
+                ),
+                "name": ["Ann", "Bob", "Ann", "Bob", "Ann"],
+                "rating": [1510.0, 1490.0, 1520.0, 1480.0, 1505.0],
+            }
+        )
+    )
+
+
+def test_rating_at_goes_into_or_out_of_a_match(small_history):
+    assert ratings.rating_at(small_history, "Ann", "2024-03-07") == 1500
+    assert ratings.rating_at(small_history, "Ann", "2024-03-14") == 1510
+    assert ratings.rating_at(small_history, "Ann", "2024-03-14", before=False) == 1520
+    # between matches, and after the last one
+    assert ratings.rating_at(small_history, "Ann", "2024-03-17") == 1520
+    assert ratings.rating_at(small_history, "Bob", "2024-03-14") == 1490
+    assert ratings.rating_at(small_history, "Bob", "2025-01-01") == 1480
+    assert ratings.rating_at(small_history, "Cid", "2024-03-14") == 1500
+
+
+def test_ratings_at_a_date(small_history):
+    assert ratings.ratings_at(small_history).to_dict() == {"Ann": 1505, "Bob": 1480}
+    assert ratings.ratings_at(small_history, "2024-03-14").to_dict() == {
+        "Ann": 1520,
+        "Bob": 1490,
+    }
+    assert ratings.ratings_at(small_history, "2024-03-07", before=True).to_dict() == {
+        "Ann": 1500,
+        "Bob": 1500,
+    }
+
+
+def test_rolling_ratings_keep_the_last_changes(small_history):
+    assert ratings.rolling_ratings(small_history, 1).to_dict() == {
+        "Ann": 1500 + (1505 - 1520),
+        "Bob": 1500 + (1480 - 1490),
+    }
+    assert ratings.rolling_ratings(small_history, 2).to_dict() == {
+        "Ann": 1500 + (1505 - 1510),
+        "Bob": 1480,
+    }
+    assert ratings.rolling_ratings(small_history, 1, "2024-03-14").to_dict() == {
+        "Ann": 1510,
+        "Bob": 1490,
+    }
+    pd.testing.assert_series_equal(
+        ratings.rolling_ratings(small_history, 10), ratings.ratings_at(small_history)
+    )
+
+
+def test_decayed_ratings_weigh_changes_by_age(small_history):
+    decayed = ratings.decayed_ratings(small_history, half_life_days=7)
+    # Ann: +10 two weeks back, +10 one week back, -15 on the last date
+    assert decayed["Ann"] == pytest.approx(1500 + 10 / 4 + 10 / 2 - 15)
+    assert decayed["Bob"] == pytest.approx(1500 - 10 / 4 - 10)
+    # as of the first date only its changes count, in full
+    early = ratings.decayed_ratings(small_history, 7, "2024-03-07")
+    assert early.to_dict() == {"Ann": 1510, "Bob": 1490}
+    pd.testing.assert_series_equal(
+        ratings.decayed_ratings(small_history, 1e9), ratings.ratings_at(small_history)
+    )
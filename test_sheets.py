@@ -0,0 +1,74 @@
+import threading
+
+import pandas as pd
+import pytest
+
+import sheets
+
+
+def match_rows(date: str, names: list) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "date": date,
+            "team": ["A", "B"] * (len(names) // 2),
+            "name": names,
+            "goals": 1,
+            "assists": 0,
+        }
+    )
+
+
+@pytest.fixture
+def backend() -> sheets.FakeSheetBackend:
+    return sheets.FakeSheetBackend(
+        {
+            "game_data": pd.concat(
+                [
+                    match_rows("2024-03-14", ["Ann", "Bob"]),
+                    match_rows("2024-03-07", ["Cid", "Dan", "Eve", "Fay"]),
+                ],
+                ignore_index=True,
+            )
+        }
+    )
+
+
+def test_rows_moved_by_another_writer_are_found_again(backend):
+    backend.date_index("game_data")
+    # a new match typed in at the top of the sheet by hand
+    backend.insert_rows("game_data", 0, [["2024-03-21", "A", "Gus", 0, 0]])
+    rows = match_rows("2024-03-07", ["Cid", "Dan"])
+    backend.replace_date_rows("game_data", "2024-03-07", rows)
+    assert backend.get_column("game_data", 2) == ["Gus", "Ann", "Bob", "Cid", "Dan"]
+
+
+def test_rows_that_cannot_be_located_raise_stale_data(backend, monkeypatch):
+    monkeypatch.setattr(backend, "_read_range", lambda *args: None)
+    with pytest.raises(sheets.StaleDataError):
+        backend.replace_date_rows(
+            "game_data", "2024-03-07", match_rows("2024-03-07", ["Cid", "Dan"])
+        )
+
+
+def test_fingerprint_ignores_row_order_and_types(backend):
+    typed = match_rows("2024-03-07", ["Cid", "Dan", "Eve", "Fay"])
+    cells = backend.read("game_data").iloc[2:]
+    assert sheets.fingerprint(typed.iloc[::-1]) == sheets.fingerprint(cells)
+
+
+def test_concurrent_writers_keep_the_index_in_step(backend):
+    dates = [f"2024-04-{day:02d}" for day in range(1, 25)]
+
+    def write(date):
+        backend.replace_date_rows("game_data", date, match_rows(date, ["Hal", "Ivy"]))
+
+    threads = [threading.Thread(target=write, args=(date,)) for date in dates]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    column = pd.to_datetime(pd.Series(backend.get_column("game_data", 0)))
+    assert column.is_monotonic_decreasing
+    assert len(column) == 6 + 2 * len(dates)
+    index = dict(backend.date_index("game_data"))
+    assert index == backend.date_index("game_data", refresh=True)
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import ratings
+import simulate
+
+
+def test_fit_recovers_the_generating_model():
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2020-01-02", periods=4000, freq="D")
+    gaps = pd.Series(rng.normal(0, 150, len(dates)), index=dates)
+    truth = simulate.ScoreModel(base=np.log(4.0), slope=0.8)
+    mean_a, mean_b = simulate.expected_goals(truth, gaps.to_numpy())
+    matches = pd.DataFrame(
+        {"score_a": rng.poisson(mean_a), "score_b": rng.poisson(mean_b)}, index=dates
+    )
+    model = simulate.fit_score_model(matches, gaps)
+    assert model.base == pytest.approx(truth.base, abs=0.02)
+    assert model.slope == pytest.approx(truth.slope, abs=0.05)
+
+
+def test_goalless_history_fits_a_flat_model():
+    matches = pd.DataFrame(
+        {"score_a": [0, 0], "score_b": [0, 0]},
+        index=pd.to_datetime(["2024-03-07", "2024-03-14"]),
+    )
+    assert simulate.fit_score_model(matches, pd.Series(dtype=float)) == (0.0, 0.0)
+
+
+@pytest.fixture
+def history() -> ratings.RatingHistory:
+    return ratings.build_rating_history(
+        pd.DataFrame(
+            {
+                "date": pd.to_datetime(["2024-03-07"] * 4),
+                "name": ["Ann", "Bob", "Cid", "Dan"],
+                "rating": [1600.0, 1560.0, 1440.0, 1400.0],
+            }
+        )
+    )
+
+
+def team_splits(*teams: tuple) -> pd.DataFrame:
+    return pd.DataFrame(
+        {"team_a": [a for a, _ in teams], "team_b": [b for _, b in teams]}
+    )
+
+
+def test_outcome_probabilities_sum_to_one(history):
+    model = simulate.ScoreModel(np.log(3.0), 1.0)
+    splits = team_splits(
+        (["Ann", "Bob"], ["Cid", "Dan"]), (["Ann", "Dan"], ["Bob", "Cid"])
+    )
+    outlook = simulate.simulate_splits(model, splits, history, 20_000, seed=1)
+    assert list(outlook.columns) == simulate.outcome_columns
+    total = outlook[["win_a", "draw", "win_b"]].sum(axis=1)
+    np.testing.assert_allclose(total, 1.0)
+    # the strong pair wins more, the even split is close to symmetric
+    assert outlook.at[0, "win_a"] > 2 * outlook.at[0, "win_b"]
+    assert outlook.at[1, "win_a"] == pytest.approx(outlook.at[1, "win_b"], abs=0.02)
+    assert outlook.at[0, "margin"] == pytest.approx(
+        np.subtract(*simulate.expected_goals(model, np.array([160.0])))[0], abs=0.1
+    )
+    pd.testing.assert_frame_equal(
+        outlook, simulate.simulate_splits(model, splits, history, 20_000, seed=1)
+    )
+
+
+def test_no_splits_give_an_empty_outlook(history):
+    outlook = simulate.simulate_splits(
+        simulate.ScoreModel(0.0, 0.0), team_splits(), history
+    )
+    assert outlook.empty and list(outlook.columns) == simulate.outcome_columns
+
+
+def test_rating_gaps_use_ratings_going_into_the_match():
+    player_matches = pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2024-03-07"] * 2 + ["2024-03-14"] * 2),
+            "name": ["Ann", "Bob", "Ann", "Bob"],
+            "team": ["A", "B", "B", "A"],
+        }
+    )
+    history = ratings.build_rating_history(
+        player_matches.assign(rating=[1516.0, 1484.0, 1500.0, 1500.0])
+    )
+    gaps = simulate.rating_gaps(player_matches, history)
+    assert gaps.tolist() == [0.0, 1484.0 - 1516.0]
@@ -0,0 +1,99 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import splits
+
+
+def brute_force_scores(ratings: np.ndarray) -> list:
+    # every split with player 0 on team A, the way the page used to enumerate
+    n_players = len(ratings)
+    scores = []
+    for size in {n_players // 2, (n_players + 1) // 2}:
+        for rest in itertools.combinations(range(1, n_players), size - 1):
+            team_a = [0, *rest]
+            team_b = [i for i in range(n_players) if i not in team_a]
+            scores.append(abs(ratings[team_a].mean() - ratings[team_b].mean()) / 2)
+    return sorted(scores)
+
+
+@pytest.mark.parametrize("n_players", [4, 7, 12])
+def test_exact_splits_are_the_best(n_players):
+    rng = np.random.default_rng(n_players)
+    player_ratings = pd.Series(
+        rng.normal(1500, 50, n_players), index=[f"p{i}" for i in range(n_players)]
+    )
+    best = splits.best_splits(player_ratings, k=3)
+    expected = brute_force_scores(player_ratings.to_numpy())[:3]
+    assert np.allclose(best["score"], expected)
+    assert (best["gap"] == 0).all()
+    for team_a, team_b in zip(best["team_a"], best["team_b"]):
+        assert sorted(team_a + team_b) == sorted(player_ratings.index)
+        assert abs(len(team_a) - len(team_b)) <= 1
+
+
+def test_masks_cover_every_split_once():
+    masks = splits.team_a_masks(10)
+    assert len(masks) == len(brute_force_scores(np.zeros(10)))
+    assert masks[:, 0].all() and (masks.sum(axis=1) == 5).all()
+    assert len(np.unique(masks, axis=0)) == len(masks)
+
+
+def test_heuristic_splits_leave_the_gap_unknown():
+    n_players = splits.MAX_EXACT_PLAYERS + 4
+    rng = np.random.default_rng(0)
+    player_ratings = pd.Series(rng.normal(1500, 50, n_players), index=range(n_players))
+    best = splits.best_splits(player_ratings, k=3)
+    assert len(best) == 3 and best["gap"].isnull().all()
+    assert best["score"].is_monotonic_increasing
+    assert best["score"].iloc[0] < player_ratings.std() / n_players
+
+
+def sequential_pareto_order(objectives: np.ndarray, scores: np.ndarray, k: int):
+    # one candidate at a time against the front found so far
+    order = np.argsort(scores, kind="stable")
+    front: list = []
+    for candidate in order:
+        kept = objectives[front]
+        dominated = (kept <= objectives[candidate]).all(axis=1) & (
+            kept < objectives[candidate]
+        ).any(axis=1)
+        if not dominated.any():
+            front.append(candidate)
+            if len(front) == k:
+                break
+    rest = order[~np.isin(order, front)][: k - len(front)]
+    return front, list(rest)
+
+
+@pytest.mark.parametrize("k", [1, 3, 50])
+def test_pareto_order_matches_one_at_a_time(k):
+    rng = np.random.default_rng(k)
+    objectives = rng.random((2000, 3))
+    scores = objectives @ np.array([1.0, 0.5, 0.25])
+    front, rest = splits._pareto_order(objectives, scores, k)
+    expected_front, expected_rest = sequential_pareto_order(objectives, scores, k)
+    assert list(front) == expected_front
+    assert list(rest) == expected_rest
+
+
+def test_balanced_splits_put_the_pareto_front_first():
+    rng = np.random.default_rng(1)
+    names = [f"p{i}" for i in range(10)]
+    features = pd.DataFrame(
+        {
+            "rating": rng.normal(1500, 50, 10),
+            "form": rng.uniform(-1, 1, 10),
+            "production": rng.uniform(0, 2, 10),
+        },
+        index=names,
+    )
+    best = splits.balanced_splits(features, k=5)
+    assert list(best.columns) == splits.balanced_columns
+    assert len(best) == 5
+    # front first, then the rest
+    assert list(best["pareto"]) == sorted(best["pareto"], reverse=True)
+    front = best[best["pareto"]]
+    assert front["score"].is_monotonic_increasing
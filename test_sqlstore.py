@@ -0,0 +1,75 @@
+import pandas as pd
+import pytest
+
+import sheets
+import sqlstore
+
+game_data = pd.DataFrame(
+    {
+        "date": ["2024-03-14", "2024-03-14", "2024-03-07", "2024-03-07"],
+        "team": ["A", "B", "A", "B"],
+        "name": ["Ann", "Bob", "Cid", "Dan"],
+        "goals": [2, 1, 0, 3],
+        "assists": [1, 0, 0, 1],
+    }
+)
+
+
+@pytest.fixture
+def remote() -> sheets.FakeSheetBackend:
+    return sheets.FakeSheetBackend({"game_data": game_data})
+
+
+@pytest.fixture
+def local(tmp_path, remote) -> sqlstore.SQLiteBackend:
+    backend = sqlstore.SQLiteBackend(tmp_path / "football.sqlite")
+    backend.import_from(remote, ["game_data"])
+    return backend
+
+
+def test_import_copies_the_worksheet(local, remote):
+    assert local.get_rows("game_data", 0, 10) == remote.get_rows("game_data", 0, 10)
+    assert local.sync(remote) == sqlstore.SyncResult([], [], [])
+
+
+def test_local_edits_are_pushed(local, remote):
+    local.update_rows("game_data", 0, [["2024-03-14", "A", "Ann", 4, 1]])
+    assert local.sync(remote).pushed == ["game_data"]
+    assert remote.get_rows("game_data", 0, 1) == [["2024-03-14", "A", "Ann", "4", "1"]]
+    assert local.sync(remote) == sqlstore.SyncResult([], [], [])
+
+
+def test_edits_in_the_spreadsheet_are_pulled(local, remote):
+    before = local.version("game_data")
+    remote.update_rows("game_data", 3, [["2024-03-07", "B", "Dan", 5, 1]])
+    assert local.sync(remote).pulled == ["game_data"]
+    assert local.get_rows("game_data", 3, 4) == [["2024-03-07", "B", "Dan", "5", "1"]]
+    # readers see a new version and reload
+    assert local.version("game_data") != before
+    assert local.sync(remote) == sqlstore.SyncResult([], [], [])
+
+
+def test_a_new_token_with_the_same_cells_is_not_a_change(local, remote):
+    remote.update_rows("game_data", 0, remote.get_rows("game_data", 0, 1))
+    local.update_rows("game_data", 1, [["2024-03-14", "B", "Bob", 2, 0]])
+    assert local.sync(remote).pushed == ["game_data"]
+
+
+def test_edits_on_both_sides_are_a_conflict(local, remote):
+    local.update_rows("game_data", 0, [["2024-03-14", "A", "Ann", 4, 1]])
+    remote.update_rows("game_data", 3, [["2024-03-07", "B", "Dan", 5, 1]])
+    written = remote.cells_written
+    assert local.sync(remote).conflicts == ["game_data"]
+    # neither side is overwritten, and it stays a conflict
+    assert remote.cells_written == written
+    assert local.get_rows("game_data", 0, 1) == [["2024-03-14", "A", "Ann", "4", "1"]]
+    assert local.sync(remote).conflicts == ["game_data"]
+
+    assert local.sync(remote, force=True).pushed == ["game_data"]
+    assert remote.get_rows("game_data", 0, 4) == local.get_rows("game_data", 0, 4)
+    assert local.sync(remote) == sqlstore.SyncResult([], [], [])
+
+
+def test_min_interval_holds_back_a_recent_sync(local, remote):
+    local.update_rows("game_data", 0, [["2024-03-14", "A", "Ann", 4, 1]])
+    assert local.sync(remote, min_interval=3600) == sqlstore.SyncResult([], [], [])
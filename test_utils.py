@@ -0,0 +1,288 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+import requests
+
+import sheets
+import utils
+
+game_data = pd.DataFrame(
+    {
+        "date": ["2024-03-14"] * 4 + ["2024-03-07"] * 4,
+        "team": ["A", "A", "B", "B"] * 2,
+        "name": ["Ann", "Other", "Bob", "Other", "Ann", "Other", "Cid", "Other"],
+        "goals": [2, 1, 1, 0, 0, 0, 3, 1],
+        "assists": [1, 0, 0, 0, 0, 0, 1, 0],
+    }
+)
+
+
+@pytest.fixture(autouse=True)
+def sheet_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "SHEET_CACHE_DIR", tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def backend() -> sheets.FakeSheetBackend:
+    return sheets.FakeSheetBackend({"game_data": game_data})
+
+
+class CountingLoad:
+    def __init__(self, backend: sheets.SheetBackend):
+        self.backend = backend
+        self.calls = 0
+
+    def __call__(self) -> pd.DataFrame:
+        self.calls += 1
+        return utils.read_worksheet(self.backend, "game_data", utils.match_dtypes)
+
+
+def test_read_through_serves_the_local_copy(backend):
+    load = CountingLoad(backend)
+    first = utils.read_through(backend, "game_data", load)
+    second = utils.read_through(backend, "game_data", load)
+    assert load.calls == 1
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_a_miss_is_as_read_only_as_a_hit(backend):
+    load = CountingLoad(backend)
+    for _ in range(2):
+        data = utils.read_through(backend, "game_data", load)
+        with pytest.raises(ValueError):
+            data.loc[0, "goals"] = 9
+    assert load.calls == 1
+
+
+def test_stale_copy_is_kept_while_the_sheet_is_unchanged(backend, monkeypatch):
+    load = CountingLoad(backend)
+    utils.read_through(backend, "game_data", load)
+    monkeypatch.setattr(utils, "SHEET_CACHE_TTL", 0)
+    utils.read_through(backend, "game_data", load)
+    assert load.calls == 1
+    backend.update_rows("game_data", 0, [["2024-03-14", "A", "Ann", 3, 1]])
+    changed = utils.read_through(backend, "game_data", load)
+    assert load.calls == 2 and changed["goals"].iloc[0] == 3
+
+
+def test_invalidate_worksheet_forces_a_reload(backend):
+    load = CountingLoad(backend)
+    utils.read_through(backend, "game_data", load)
+    utils.invalidate_worksheet("game_data")
+    utils.read_through(backend, "game_data", load)
+    assert load.calls == 2
+
+
+def test_first_load_works_without_a_version(backend, monkeypatch):
+    def offline(worksheet):
+        raise ConnectionError("offline")
+
+    monkeypatch.setattr(backend, "version", offline)
+    load = CountingLoad(backend)
+    data = utils.read_through(backend, "game_data", load)
+    assert len(data) == len(game_data)
+    # without a token the copy is trusted for the TTL, then read again
+    utils.read_through(backend, "game_data", load)
+    assert load.calls == 1
+
+
+def test_concurrent_misses_write_one_readable_copy(backend, sheet_cache):
+    data = utils.read_worksheet(backend, "game_data", utils.match_dtypes)
+    errors = []
+
+    def write():
+        try:
+            for _ in range(20):
+                utils._write_cached_frame("game_data", data, "1")
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=write) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert sorted(path.name for path in sheet_cache.iterdir()) == [
+        "game_data.json",
+        "game_data.parquet",
+    ]
+    pd.testing.assert_frame_equal(
+        pd.read_parquet(sheet_cache / "game_data.parquet"), data
+    )
+
+
+def team_sheet(match_date: str, scorers: dict) -> pd.DataFrame:
+    # the rows pages/2_edit_games.py uploads: players plus an "Other" per team
+    sides = []
+    for team, goals in scorers.items():
+        edit = pd.DataFrame(
+            {"name": list(goals), "goals": list(goals.values()), "assists": 0}
+        )
+        sides.append(
+            utils.enrich_team_sheet(
+                edit, pd.Timestamp(match_date), team, sum(goals.values())
+            )
+        )
+    return pd.concat(sides, ignore_index=True)
+
+
+def stored(backend: sheets.FakeSheetBackend) -> pd.DataFrame:
+    return utils.read_worksheet(backend, "game_data", utils.match_dtypes)
+
+
+def test_upload_rewrites_only_the_edited_match(backend):
+    version = utils.match_version(stored(backend), pd.Timestamp("2024-03-07"))
+    edit = team_sheet("2024-03-07", {"A": {"Ann": 1}, "B": {"Cid": 2, "Dan": 1}})
+    utils.upload_team_sheet(backend, edit, version)
+
+    after = stored(backend)
+    assert after["date"].is_monotonic_decreasing
+    edited = after[after["date"] == "2024-03-07"]
+    assert sorted(edited["name"]) == ["Ann", "Cid", "Dan", "Other", "Other"]
+    untouched = after[after["date"] == "2024-03-14"].reset_index(drop=True)
+    expected = stored(sheets.FakeSheetBackend({"game_data": game_data}))
+    pd.testing.assert_frame_equal(
+        untouched,
+        expected[expected["date"] == "2024-03-14"].reset_index(drop=True),
+        check_categorical=False,
+    )
+    # one row grew: 4 rewritten + 1 inserted, five cells each
+    assert backend.cells_written == 5 * len(edit)
+
+
+def test_upload_of_a_new_match_keeps_newest_first(backend):
+    utils.upload_team_sheet(backend, team_sheet("2024-03-21", {"A": {}, "B": {}}))
+    assert stored(backend)["date"].is_monotonic_decreasing
+    assert backend.cells_written == 5 * 2
+
+
+def test_stale_upload_is_rejected_and_the_copy_reloaded(backend, sheet_cache):
+    version = utils.match_version(stored(backend), pd.Timestamp("2024-03-14"))
+    utils.get_match_data(backend)
+    # someone else saves the match first
+    utils.upload_team_sheet(
+        backend, team_sheet("2024-03-14", {"A": {"Ann": 4}, "B": {}}), version
+    )
+    utils.get_match_data(backend)
+    before = backend.cells_written
+    with pytest.raises(sheets.StaleDataError):
+        utils.upload_team_sheet(
+            backend, team_sheet("2024-03-14", {"A": {"Ann": 2}, "B": {}}), version
+        )
+    assert backend.cells_written == before
+    assert not (sheet_cache / "game_data.json").exists()
+    assert utils.get_match_data(backend).query("name == 'Ann'")["goals"].max() == 4
+
+
+def non_contiguous_backend() -> sheets.FakeSheetBackend:
+    # 2024-03-14 split around 2024-03-07, as a hand edit of the sheet can leave it
+    shuffled = game_data.iloc[[0, 1, 4, 5, 6, 7, 2, 3]]
+    return sheets.FakeSheetBackend({"game_data": shuffled})
+
+
+def test_non_contiguous_dates_fall_back_to_a_full_rewrite():
+    backend = non_contiguous_backend()
+    version = utils.match_version(stored(backend), pd.Timestamp("2024-03-14"))
+    edit = team_sheet("2024-03-14", {"A": {"Ann": 1}, "B": {"Bob": 1}})
+    utils.upload_team_sheet(backend, edit, version)
+    after = stored(backend)
+    assert after["date"].is_monotonic_decreasing
+    assert len(after) == len(game_data)
+    assert after.query("name == 'Ann'")["goals"].tolist() == [1, 0]
+
+
+def test_non_contiguous_fallback_still_checks_the_version():
+    backend = non_contiguous_backend()
+    version = utils.match_version(stored(backend), pd.Timestamp("2024-03-14"))
+    backend.update_rows("game_data", 0, [["2024-03-14", "A", "Ann", 5, 0]])
+    before = backend.cells_written
+    with pytest.raises(sheets.StaleDataError):
+        utils.upload_team_sheet(
+            backend, team_sheet("2024-03-14", {"A": {"Ann": 1}, "B": {}}), version
+        )
+    assert backend.cells_written == before
+
+
+def test_background_sync_keeps_the_failure(monkeypatch):
+    def offline(min_interval):
+        raise ConnectionError("offline")
+
+    monkeypatch.setattr(utils, "sync_mirror", offline)
+    mirror = utils.MirrorSync()
+    assert mirror.start()
+    mirror.join()
+    assert isinstance(mirror.last_error, ConnectionError)
+    assert mirror.last_result is None
+
+
+@pytest.fixture
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(utils, "SHEET_BACKOFF", 0.001)
+
+
+class FlakyLoad:
+    def __init__(self, *errors: Exception):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self) -> str:
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "loaded"
+
+
+def test_transient_failure_is_retried(fast_retries):
+    load = FlakyLoad(requests.ConnectionError("reset"))
+    assert utils._with_retry(load, time.monotonic() + 5) == "loaded"
+    assert load.calls == 2
+
+
+def test_other_errors_are_raised_at_once(fast_retries):
+    load = FlakyLoad(KeyError("game_data"))
+    with pytest.raises(KeyError):
+        utils._with_retry(load, time.monotonic() + 5)
+    assert load.calls == 1
+
+
+def test_retries_stop_at_the_deadline(fast_retries):
+    load = FlakyLoad(*[requests.Timeout("slow")] * (utils.SHEET_RETRIES + 1))
+    with pytest.raises(requests.Timeout):
+        utils._with_retry(load, time.monotonic())
+    # the first backoff would already overrun the deadline
+    assert load.calls == 1
+
+
+def test_load_sheets_retries_a_dropped_read(backend, fast_retries, monkeypatch):
+    get_rows = backend.get_rows
+    errors = [requests.ConnectionError("reset")]
+
+    def flaky_rows(*args):
+        if errors:
+            raise errors.pop()
+        return get_rows(*args)
+
+    monkeypatch.setattr(backend, "get_rows", flaky_rows)
+    bundle = utils.load_sheets(backend, ("match_data",))
+    assert bundle.players is None
+    assert bundle.match_data is not None and len(bundle.match_data) == len(game_data)
+    assert errors == []
+
+
+def test_load_sheets_times_out_on_a_slow_worksheet(backend, monkeypatch):
+    release = threading.Event()
+
+    def slow_players(conn):
+        release.wait(5)
+        return ["Ann"]
+
+    monkeypatch.setitem(utils.sheet_loaders, "players", slow_players)
+    try:
+        with pytest.raises(TimeoutError, match="Reading players took over"):
+            utils.load_sheets(backend, ("players", "match_data"), timeout=0.05)
+    finally:
+        release.set()
@@ -1,49 +1,489 @@
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterator, NamedTuple
+
+import numpy as np
 import pandas as pd
+import requests
 import streamlit as st
+from gspread.exceptions import APIError, WorksheetNotFound
 from streamlit_gsheets import GSheetsConnection
 
+import cache
+import facts
+import profiling
+import sheets
+import sqlstore
+
 column_names = ["date", "team", "name", "goals", "assists"]
 
+match_dtypes = {
+    "date": "datetime64[ns]",
+    "team": "category",
+    "name": "category",
+    "goals": "int16",
+    "assists": "int16",
+}
+player_dtypes = {"name": "object"}
+funds_dtypes = {"date": "datetime64[ns]", "amount": "float64", "description": "object"}
+alias_dtypes = {"alias": "object", "name": "object"}
+
+# "gsheets" reads and writes the spreadsheet directly; "sqlite" works on a local
+# copy and mirrors edits back to the spreadsheet (FOOTBALL_SYNC=off for offline)
+STORAGE = os.environ.get("FOOTBALL_STORAGE", "gsheets")
+SQLITE_SYNC_INTERVAL = 900  # seconds between pushes to the spreadsheet
+
+CACHE_DIR = Path(__file__).parent / ".cache"
+SHEET_CACHE_DIR = CACHE_DIR / "sheets" / STORAGE
+SHEET_CACHE_TTL = 600  # seconds before the sheet is probed for changes again
+SHEET_CHUNK_ROWS = 1000
+SHEET_TIMEOUT = 30  # seconds per worksheet in load_sheets, retries included
+SHEET_RETRIES = 4
+SHEET_BACKOFF = 0.5  # seconds before the first retry, doubled after each
+TRANSIENT_STATUS = {429, 500, 502, 503, 504}  # quota and server hiccups
+
+
+class _BackgroundThreadFilter(logging.Filter):
+    # Cached functions look for a script run to show their spinner in and warn
+    # on every call from the sheet loader and warm-up pools, which have none.
+    def filter(self, record: logging.LogRecord) -> bool:
+        return not threading.current_thread().name.startswith(
+            ("sheets", "warmup", "sync")
+        )
+
+
+logging.getLogger("streamlit.runtime.scriptrunner.script_run_context").addFilter(
+    _BackgroundThreadFilter()
+)
+logger = logging.getLogger(__name__)
+
 
 @st.cache_resource
 def get_gsheet_connection():
     return st.connection("gsheets", type=GSheetsConnection)  # type: ignore
 
 
-def get_player_list(conn: GSheetsConnection) -> list:
-    players = conn.read(worksheet="Players", usecols=[0], nrows=100)
-    players = players.query("name.notnull()")["name"].tolist()
-    return sorted(players)
+@st.cache_resource
+def _get_gsheets_backend(_conn: GSheetsConnection) -> sheets.GSheetsBackend:
+    return sheets.GSheetsBackend(_conn)
 
 
-def get_match_data(conn: GSheetsConnection) -> pd.DataFrame:
-    match_data = conn.read(
-        worksheet="game_data", usecols=range(len(column_names)), nrows=4000
+def get_sheet_backend(
+    conn: GSheetsConnection | sheets.SheetBackend,
+) -> sheets.SheetBackend:
+    if isinstance(conn, sheets.SheetBackend):
+        return conn
+    return _get_gsheets_backend(conn)
+
+
+@st.cache_resource
+def get_sqlite_backend() -> sqlstore.SQLiteBackend:
+    backend = sqlstore.SQLiteBackend(
+        Path(os.environ.get("FOOTBALL_SQLITE_PATH", sqlstore.SQLITE_PATH))
     )
-    match_data["date"] = pd.to_datetime(match_data["date"])
-    match_data = match_data.query("name.notnull()")
-    return match_data
-
-
-def get_funds(conn: GSheetsConnection) -> pd.DataFrame:
-    funds_data = conn.read(worksheet="funds", usecols=range(3), nrows=400)
-    funds_data["date"] = pd.to_datetime(funds_data["date"])
-    funds_data = funds_data.query("amount.notnull()")
-    return funds_data
-
-
-def get_match_outcome(match_data: pd.DataFrame) -> pd.DataFrame:
-    md = match_data.query('date>"2024-01-01"').copy()
-    res = md.groupby(["date", "team"])["goals"].sum().unstack()
-    res["outcome"] = res["A"] - res["B"]
-    md["outcome"] = md["date"].map(res["outcome"])
-    md["sign"] = md["outcome"].map(lambda x: "W" if x > 0 else "L" if x < 0 else "D")
-    md.loc[md["team"] == "B", "sign"] = md.loc[md["team"] == "B", "sign"].map(
-        lambda x: "W" if x == "L" else "L" if x == "W" else "D"
+    missing = [ws for ws in sqlstore.WORKSHEETS if not backend.has_worksheet(ws)]
+    if missing:
+        # first run: one-shot import from the spreadsheet
+        backend.import_from(_get_gsheets_backend(get_gsheet_connection()), missing)
+    return backend
+
+
+def sync_mirror(min_interval: float = SQLITE_SYNC_INTERVAL) -> sqlstore.SyncResult:
+    # Pushes local edits to the spreadsheet and pulls edits made there; a failed
+    # push stays pending and is retried on the next call.
+    if STORAGE != "sqlite" or os.environ.get("FOOTBALL_SYNC") == "off":
+        return sqlstore.SyncResult([], [], [])
+    remote = _get_gsheets_backend(get_gsheet_connection())
+    result = get_sqlite_backend().sync(remote, min_interval)
+    for worksheet in result.pulled:
+        invalidate_worksheet(worksheet)
+    return result
+
+
+class MirrorSync:
+    # Runs sync_mirror on a background thread so no rerun waits on the
+    # spreadsheet, one run at a time. The outcome is kept for show_sync_status.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self.last_result = None
+        self.last_error = None
+        self.finished_at = None
+
+    def start(self, min_interval: float = SQLITE_SYNC_INTERVAL) -> bool:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._thread = threading.Thread(
+                target=self._run, args=(min_interval,), name="sync", daemon=True
+            )
+            self._thread.start()
+        return True
+
+    def join(self, timeout: float | None = None):
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self, min_interval: float):
+        try:
+            result = sync_mirror(min_interval)
+        except Exception as error:
+            logger.warning("Sync with the spreadsheet failed", exc_info=True)
+            self.last_error = error
+        else:
+            if result.conflicts:
+                logger.warning(
+                    "Edited both locally and in the spreadsheet, not synced: %s",
+                    ", ".join(result.conflicts),
+                )
+            self.last_result, self.last_error = result, None
+        self.finished_at = time.time()
+
+
+@st.cache_resource
+def get_mirror_sync() -> MirrorSync:
+    return MirrorSync()
+
+
+def show_sync_status():
+    # Sidebar note when the last sync with the spreadsheet failed or found
+    # conflicts; silent otherwise.
+    if STORAGE != "sqlite":
+        return
+    mirror = get_mirror_sync()
+    if mirror.last_error is not None:
+        st.sidebar.warning(
+            f"Could not sync with the spreadsheet: {mirror.last_error}."
+            " Edits are kept locally and retried."
+        )
+    elif mirror.last_result is not None and mirror.last_result.conflicts:
+        st.sidebar.warning(
+            "Edited both here and in the spreadsheet, not synced: "
+            f"{', '.join(mirror.last_result.conflicts)}."
+            " Run `python sqlstore.py import` to keep the spreadsheet's copy or"
+            " `python sqlstore.py sync --force` to keep this one."
+        )
+
+
+def get_connection() -> GSheetsConnection | sheets.SheetBackend:
+    if STORAGE != "sqlite":
+        return get_gsheet_connection()
+    backend = get_sqlite_backend()
+    get_mirror_sync().start()
+    return backend
+
+
+@cache.cached("sheets")
+def _read_cached_frame(path: str, mtime_ns: int) -> pd.DataFrame:
+    return pd.read_parquet(path)
+
+
+def _temp_path(path: Path) -> Path:
+    # unique per call: sessions and the loader pools share one process
+    return path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+
+
+def _write_cached_frame(worksheet: str, data: pd.DataFrame, token: str | None):
+    SHEET_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = SHEET_CACHE_DIR / f"{worksheet}.parquet"
+    tmp = _temp_path(path)
+    data.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+    _write_cache_meta(worksheet, {"token": token, "fetched_at": time.time()})
+
+
+def _write_cache_meta(worksheet: str, meta: dict):
+    path = SHEET_CACHE_DIR / f"{worksheet}.json"
+    tmp = _temp_path(path)
+    tmp.write_text(json.dumps(meta))
+    os.replace(tmp, path)
+
+
+def read_through(
+    conn: GSheetsConnection | sheets.SheetBackend,
+    worksheet: str,
+    load: Callable[[], pd.DataFrame],
+) -> pd.DataFrame:
+    with profiling.stage(f"read_through:{worksheet}") as current:
+        data = _read_through(get_sheet_backend(conn), worksheet, load, current)
+        current.rows = len(data)
+    return data
+
+
+def _read_through(
+    backend: sheets.SheetBackend,
+    worksheet: str,
+    load: Callable[[], pd.DataFrame],
+    current: profiling.Stage,
+) -> pd.DataFrame:
+    path = SHEET_CACHE_DIR / f"{worksheet}.parquet"
+    try:
+        meta = json.loads(path.with_suffix(".json").read_text())
+        mtime_ns = path.stat().st_mtime_ns
+    except (OSError, ValueError):
+        meta = None
+    if meta is not None:
+        fresh = time.time() - meta["fetched_at"] < SHEET_CACHE_TTL
+        if not fresh:
+            try:
+                token = backend.version(worksheet)
+            except Exception:
+                # offline or over quota: a stale copy beats no page
+                token = meta["token"]
+            fresh = token is not None and token == meta["token"]
+            if fresh:
+                _write_cache_meta(worksheet, {**meta, "fetched_at": time.time()})
+        if fresh:
+            current.cache = "hit"
+            return _read_cached_frame(str(path), mtime_ns)
+    current.cache = "miss"
+    try:
+        token = backend.version(worksheet)
+    except Exception:
+        token = None  # no token: the copy is re-read once the TTL is up
+    data = load().reset_index(drop=True)
+    _write_cached_frame(worksheet, data, token)
+    # read-only like a hit, so callers behave the same either way
+    return cache.share(cache.freeze(data))
+
+
+def invalidate_worksheet(worksheet: str):
+    # Only sheet copies go; derived tables are keyed on the data version and
+    # age out of the shared cache once nothing asks for the old one.
+    (SHEET_CACHE_DIR / f"{worksheet}.json").unlink(missing_ok=True)
+    cache.get_cache().invalidate("sheets")
+
+
+def _typed_chunk(rows: list[list], header: list, dtypes: dict) -> pd.DataFrame:
+    width = len(header)
+    frame = pd.DataFrame(
+        [row[:width] + [""] * (width - len(row)) for row in rows], columns=header
+    )[list(dtypes)]
+    frame = frame.mask(frame == "")
+    for col, dtype in dtypes.items():
+        if dtype.startswith("datetime"):
+            frame[col] = pd.to_datetime(frame[col], errors="coerce")
+        elif dtype.startswith(("int", "float")):
+            values = pd.to_numeric(frame[col], errors="coerce")
+            if dtype.startswith("int"):
+                values = values.fillna(0)
+            frame[col] = values.astype(dtype)
+    return frame
+
+
+def iter_worksheet(
+    conn: GSheetsConnection | sheets.SheetBackend,
+    worksheet: str,
+    dtypes: dict,
+    chunk_rows: int = SHEET_CHUNK_ROWS,
+) -> Iterator[pd.DataFrame]:
+    # Pages through the worksheet until a short block shows it is exhausted.
+    # Category columns are left as object here and unified in concat_chunks.
+    backend = get_sheet_backend(conn)
+    header = backend.header(worksheet)
+    start = 0
+    while True:
+        rows = backend.get_rows(worksheet, start, start + chunk_rows)
+        if rows:
+            yield _typed_chunk(rows, header, dtypes)
+        if len(rows) < chunk_rows:
+            return
+        start += chunk_rows
+
+
+def concat_chunks(chunks: Iterator[pd.DataFrame], dtypes: dict) -> pd.DataFrame:
+    frames = list(chunks)
+    if not frames:
+        return pd.DataFrame(
+            {col: pd.Series(dtype=dtype) for col, dtype in dtypes.items()}
+        )
+    columns = {}
+    for col, dtype in dtypes.items():
+        values = [chunk[col].to_numpy() for chunk in frames]
+        if dtype == "category":
+            columns[col] = pd.Categorical(np.concatenate(values))
+        else:
+            columns[col] = np.concatenate(values).astype(dtype)
+    return pd.DataFrame(columns)
+
+
+@profiling.profiled()
+def read_worksheet(
+    conn: GSheetsConnection | sheets.SheetBackend, worksheet: str, dtypes: dict
+) -> pd.DataFrame:
+    return concat_chunks(iter_worksheet(conn, worksheet, dtypes), dtypes)
+
+
+def get_player_list(conn: GSheetsConnection | sheets.SheetBackend) -> list:
+    backend = get_sheet_backend(conn)
+    players = read_through(
+        backend, "Players", lambda: read_worksheet(backend, "Players", player_dtypes)
     )
+    players = players.query("name.notnull()")["name"].tolist()
+    return sorted(players)
+
+
+def get_aliases(conn: GSheetsConnection | sheets.SheetBackend) -> dict:
+    # Optional "aliases" worksheet (alias, name) for nicknames fuzzy matching
+    # cannot guess. A missing worksheet is cached as empty like any other read.
+    backend = get_sheet_backend(conn)
+    try:
+        aliases = read_through(
+            backend, "aliases", lambda: read_worksheet(backend, "aliases", alias_dtypes)
+        )
+    except (KeyError, WorksheetNotFound):
+        aliases = pd.DataFrame(columns=list(alias_dtypes))
+        _write_cached_frame("aliases", aliases, None)
+    aliases = aliases.dropna()
+    return dict(zip(aliases["alias"], aliases["name"]))
+
+
+def read_match_data(conn: GSheetsConnection | sheets.SheetBackend) -> pd.DataFrame:
+    # game_data straight from the backend, rows without a name dropped
+    match_data = read_worksheet(conn, "game_data", match_dtypes)
+    return match_data.query("name.notnull()").reset_index(drop=True)
+
+
+def get_match_data(conn: GSheetsConnection | sheets.SheetBackend) -> pd.DataFrame:
+    backend = get_sheet_backend(conn)
+    return read_through(backend, "game_data", lambda: read_match_data(backend))
+
+
+def get_funds(conn: GSheetsConnection | sheets.SheetBackend) -> pd.DataFrame:
+    backend = get_sheet_backend(conn)
+
+    def load():
+        funds_data = read_worksheet(backend, "funds", funds_dtypes)
+        return funds_data.query("amount.notnull()")
+
+    return read_through(backend, "funds", load)
+
+
+class SheetBundle(NamedTuple):
+    # the worksheets a page asked load_sheets for, None for the rest
+    players: list | None = None
+    match_data: pd.DataFrame | None = None
+    funds: pd.DataFrame | None = None
+    aliases: dict | None = None
+
+
+sheet_loaders = {
+    "players": get_player_list,
+    "match_data": get_match_data,
+    "funds": get_funds,
+    "aliases": get_aliases,
+}
+
+
+def _is_transient(error: Exception) -> bool:
+    if isinstance(error, APIError):
+        return getattr(error.response, "status_code", None) in TRANSIENT_STATUS
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+
+def _with_retry(load: Callable, deadline: float):
+    # exponential backoff with jitter, as long as the next try fits the deadline
+    for attempt in range(SHEET_RETRIES + 1):
+        try:
+            return load()
+        except Exception as error:
+            delay = SHEET_BACKOFF * 2**attempt * random.uniform(0.5, 1.5)
+            if (
+                attempt == SHEET_RETRIES
+                or not _is_transient(error)
+                or time.monotonic() + delay > deadline
+            ):
+                raise
+            time.sleep(delay)
+
+
+def load_sheets(
+    conn: GSheetsConnection | sheets.SheetBackend,
+    names: tuple = ("players", "match_data"),
+    timeout: float = SHEET_TIMEOUT,
+) -> SheetBundle:
+    # Reads the worksheets concurrently, so a page waits for the slowest one
+    # rather than the sum. A worksheet that is still loading after timeout
+    # seconds raises TimeoutError; its thread is left to finish in the
+    # background and fill the cache.
+    backend = get_sheet_backend(conn)
+    deadline = time.monotonic() + timeout
+    with profiling.stage("load_sheets") as current:
+        current.rows = len(names)
+        pool = ThreadPoolExecutor(len(names), thread_name_prefix="sheets")
+        futures = {
+            name: pool.submit(
+                _with_retry, functools.partial(sheet_loaders[name], backend), deadline
+            )
+            for name in names
+        }
+        pool.shutdown(wait=False)
+        try:
+            loaded = {
+                name: future.result(timeout=max(deadline - time.monotonic(), 0))
+                for name, future in futures.items()
+            }
+        except TimeoutError:
+            slow = [name for name, future in futures.items() if not future.done()]
+            raise TimeoutError(f"Reading {', '.join(slow)} took over {timeout}s")
+    return SheetBundle(**loaded)
+
+
+@profiling.profiled()
+def get_player_totals(
+    conn: GSheetsConnection | sheets.SheetBackend,
+    start_date: pd.Timestamp | None = None,
+) -> pd.DataFrame:
+    backend = get_sheet_backend(conn)
+    if isinstance(backend, sqlstore.SQLiteBackend):
+        return backend.player_totals(start_date)
+    match_facts = get_match_facts(get_match_data(backend))
+    return facts.totals_between(match_facts.player_matches, start_date)
+
+
+@profiling.profiled()
+def get_match_outcome(
+    match_data: pd.DataFrame, since: str | pd.Timestamp | None = "2024-01-01"
+) -> pd.DataFrame:
+    # outcome is the match's A - B goal difference; sign is 1 / 0 / -1 for a
+    # win / draw / loss from the player's side.
+    md = match_data if since is None else match_data[match_data["date"] > since]
+    md = md.copy()
+    date_codes, _ = pd.factorize(md["date"])
+    team_flag = np.where(md["team"] == "A", 1, -1)
+    goal_difference = np.bincount(
+        date_codes, weights=team_flag * md["goals"].fillna(0).to_numpy()
+    ).astype(np.int64)
+    md["outcome"] = goal_difference[date_codes]
+    md["sign"] = (np.sign(md["outcome"].to_numpy()) * team_flag).astype(np.int8)
     return md
 
 
+@cache.cached("derived", latest="match_facts")
+@profiling.on_miss
+def _build_match_facts(version: str, _match_data: pd.DataFrame) -> facts.MatchFacts:
+    # starts from the last facts built, so an upload only appends its matches
+    return facts.build_match_facts(
+        get_match_outcome(_match_data), cache.get_cache().latest("match_facts")
+    )
+
+
+@profiling.profiled(cached=True)
+def get_match_facts(match_data: pd.DataFrame) -> facts.MatchFacts:
+    # Built once per content of the sheet, shared by every page and rerun.
+    return _build_match_facts(facts.data_version(match_data), match_data)
+
+
 def get_empty_team_sheet(match_date: pd.Timestamp) -> pd.DataFrame:
     team_sheet = pd.DataFrame(
         index=range(6), columns=["name", "goals", "date", "assists"]
@@ -83,15 +523,83 @@ def enrich_team_sheet(
     return team_sheet_df
 
 
-def upload_team_sheet(conn: GSheetsConnection, team_sheet: pd.DataFrame):
-    match_data = get_match_data(conn)
-    match_data = pd.concat(
-        [match_data[~match_data["date"].isin(team_sheet["date"].unique())], team_sheet],
-        ignore_index=True,
-    ).sort_values("date", ascending=False)
-    conn.update(data=match_data[column_names], worksheet="game_data")
+def team_sheet_problems(team_sheets: pd.DataFrame) -> list[str]:
+    # The edit form's checks over any number of matches at once: rows are
+    # date, team, name, goals and total_goals (the team's score), without the
+    # "Other" rows enrich_team_sheet adds. Without total_goals the score check
+    # is left out.
+    def listed(names: pd.Series) -> str:
+        return ", ".join(sorted(set(names.astype(str))))
+
+    problems = []
+    day = team_sheets["date"].dt.strftime("%Y-%m-%d")
+    players = team_sheets[team_sheets["name"] != "Other"]
+    repeated = players[players.duplicated(["date", "team", "name"], keep=False)]
+    for (date, team), names in repeated.groupby([day, "team"])["name"]:
+        problems.append(
+            f"{date}: team {team} contains duplicate players ({listed(names)})"
+        )
+    lineups = players.drop_duplicates(["date", "team", "name"])
+    both = lineups[lineups.duplicated(["date", "name"], keep=False)]
+    for date, names in both.groupby(day)["name"]:
+        problems.append(
+            f"{date}: the same player appears for both teams ({listed(names)})"
+        )
+    if "total_goals" not in team_sheets:
+        return problems
+    teams = players.groupby([day, "team"], observed=True).agg(
+        goals=("goals", "sum"), score=("total_goals", "first")
+    )
+    for (date, team), row in teams[teams["score"] < teams["goals"]].iterrows():
+        problems.append(
+            f"{date}: team {team} score {row['score']} must be greater than or "
+            f"equal to the sum of goals {row['goals']}"
+        )
+    return problems
+
+
+def match_version(match_data: pd.DataFrame, match_date: pd.Timestamp) -> str:
+    return sheets.fingerprint(match_data[match_data["date"] == match_date])
+
 
-    st.cache_data.clear()
+@profiling.profiled()
+def upload_team_sheet(
+    conn: GSheetsConnection | sheets.SheetBackend,
+    team_sheet: pd.DataFrame,
+    expected_version: str | None = None,
+):
+    # Only the rows of the edited match are rewritten. expected_version is the
+    # match_version the editor was rendered from; if the sheet no longer matches
+    # it, sheets.StaleDataError is raised instead of overwriting someone's edit.
+    backend = get_sheet_backend(conn)
+    try:
+        with backend.write_lock:
+            try:
+                for match_date, rows in team_sheet.groupby("date"):
+                    backend.replace_date_rows(
+                        "game_data", match_date, rows[column_names], expected_version
+                    )
+            except ValueError:
+                # dates not stored in contiguous blocks: fall back to a full
+                # rewrite, checked against expected_version the same way
+                invalidate_worksheet("game_data")
+                match_data = load_sheets(backend, ("match_data",)).match_data
+                assert match_data is not None
+                dates = team_sheet["date"].unique()
+                if expected_version is not None:
+                    for match_date in map(pd.Timestamp, dates):
+                        if match_version(match_data, match_date) != expected_version:
+                            raise sheets.StaleDataError(
+                                f"Match {match_date:%Y-%m-%d} was changed meanwhile"
+                            )
+                match_data = pd.concat(
+                    [match_data[~match_data["date"].isin(dates)], team_sheet],
+                    ignore_index=True,
+                ).sort_values("date", ascending=False)
+                backend.update("game_data", match_data[column_names])
+    finally:
+        # also after a conflict, so the retry starts from the sheet as it is
+        invalidate_worksheet("game_data")
 
 
 # extra_players = set(match_data["name"]).difference(set(players).union(set(["Other"])))
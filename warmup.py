@@ -0,0 +1,182 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, NamedTuple
+
+import pandas as pd
+import streamlit as st
+
+import facts
+import figures
+import ledger
+import profiling
+import services
+import utils
+
+WARMUP_WORKERS = 4
+DEFAULT_START = pd.Timestamp("2024-01-01")  # player stats page default
+
+
+class Task(NamedTuple):
+    name: str
+    run: Callable
+    after: tuple = ()  # tasks whose results are passed to run, in order
+
+
+class Warmup:
+    # Runs the tasks on a thread pool so the shared Streamlit caches are filled
+    # before anyone asks. Tasks are submitted in list order and only wait on
+    # earlier ones, so a small pool cannot deadlock. A start() during a run
+    # queues one more run for when it finishes.
+
+    def __init__(self, tasks: list[Task], workers: int = WARMUP_WORKERS):
+        self.tasks = tasks
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._running = False
+        self._pending: str | None = None
+        self._status: dict = {"reason": None, "started_at": None, "finished_at": None}
+        self._tasks: dict = {}
+
+    def start(self, reason: str) -> bool:
+        with self._lock:
+            if self._running:
+                self._pending = reason
+                return False
+            self._running = True
+        threading.Thread(
+            target=self._run, args=(reason,), name="warmup", daemon=True
+        ).start()
+        return True
+
+    def _set(self, name: str, **state):
+        with self._lock:
+            self._tasks[name] = {**self._tasks.get(name, {}), **state}
+
+    def _run_task(self, task: Task, futures: dict[str, Future], run: str):
+        profiling.page("warmup", run)
+        try:
+            inputs = [futures[name].result() for name in task.after]
+        except Exception:
+            self._set(task.name, state="skipped")
+            raise
+        self._set(task.name, state="running")
+        started = time.perf_counter()
+        try:
+            result = task.run(*inputs)
+        except Exception as error:
+            self._set(
+                task.name,
+                state="failed",
+                seconds=time.perf_counter() - started,
+                error=repr(error),
+            )
+            raise
+        self._set(task.name, state="done", seconds=time.perf_counter() - started)
+        return result
+
+    def _run(self, reason: str | None):
+        while reason is not None:
+            with self._lock:
+                self._status = {
+                    "reason": reason,
+                    "started_at": time.time(),
+                    "finished_at": None,
+                }
+                self._tasks = {task.name: {"state": "pending"} for task in self.tasks}
+            futures: dict = {}
+            run = profiling.new_run()
+            with ThreadPoolExecutor(self.workers, thread_name_prefix="warmup") as pool:
+                for task in self.tasks:
+                    futures[task.name] = pool.submit(self._run_task, task, futures, run)
+            with self._lock:
+                self._status["finished_at"] = time.time()
+                reason, self._pending = self._pending, None
+                self._running = reason is not None
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                **self._status,
+                "running": self._running,
+                "tasks": {name: dict(state) for name, state in self._tasks.items()},
+            }
+
+
+def _render_heatmap(match_facts: facts.MatchFacts) -> bytes:
+    heatmap_data = services.heatmap_matrix(match_facts, DEFAULT_START)
+    return figures.get_figure_cache().render(
+        "player_stats_results",
+        match_facts.version,
+        lambda: figures.draw_results_heatmap(heatmap_data),
+        start_date=DEFAULT_START,
+    )
+
+
+def _render_funds(funds_ledger: ledger.Ledger) -> bytes:
+    return figures.get_figure_cache().render(
+        "funds",
+        funds_ledger.version,
+        lambda: figures.draw_funds(funds_ledger.days),
+    )
+
+
+def page_tasks() -> list[Task]:
+    # What the pages load with their default widget values.
+    return [
+        Task("connection", utils.get_connection),
+        Task("game_data", utils.get_match_data, ("connection",)),
+        Task("Players", utils.get_player_list, ("connection",)),
+        Task("funds", utils.get_funds, ("connection",)),
+        Task("aliases", utils.get_aliases, ("connection",)),
+        Task("match_facts", utils.get_match_facts, ("game_data",)),
+        Task("funds_ledger", services.funds_ledger, ("funds",)),
+        Task("ratings", services.player_ratings, ("match_facts",)),
+        Task("rating_history", services.rating_history, ("match_facts",)),
+        Task("rating_timeseries", services.rating_timeseries, ("match_facts",)),
+        Task("split_features", services.split_features, ("match_facts",)),
+        Task("chemistry", services.pair_chemistry, ("match_facts",)),
+        Task("score_model", services.score_model, ("match_facts",)),
+        Task("name_index", services.name_index, ("Players", "match_facts", "aliases")),
+        Task(
+            "outcome_summary",
+            services.outcome_summary,
+            ("connection", "match_facts"),
+        ),
+        Task(
+            "appearances",
+            lambda conn, match_facts: services.appearances(
+                conn, match_facts, DEFAULT_START
+            ),
+            ("connection", "match_facts"),
+        ),
+        Task(
+            "featured_match",
+            lambda match_data: services.featured_match(match_data["date"].unique()[0]),
+            ("game_data",),
+        ),
+        Task("heatmap_figure", _render_heatmap, ("match_facts",)),
+        Task("funds_figure", _render_funds, ("funds_ledger",)),
+    ]
+
+
+@st.cache_resource
+def get_warmup() -> Warmup:
+    # one per server process, started by the first script run
+    warmup = Warmup(page_tasks())
+    warmup.start("server start")
+    return warmup
+
+
+def show_status(warmup: Warmup):
+    status = warmup.status()
+    tasks = pd.DataFrame.from_dict(status["tasks"], orient="index")
+    done = int((tasks.get("state") == "done").sum()) if not tasks.empty else 0
+    with st.sidebar:
+        if status["running"]:
+            st.progress(done / max(len(tasks), 1), f"Warming up: {done}/{len(tasks)}")
+        elif status["finished_at"] is not None:
+            took = status["finished_at"] - status["started_at"]
+            st.caption(f"Data warm ({status['reason']}, {took:.1f} s)")
+        with st.expander("Warm-up"):
+            st.dataframe(tasks, use_container_width=True)